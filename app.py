@@ -18,15 +18,15 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import (
     PAGE_CONFIG, THRESHOLDS, FEATURE_NAMES,
-    DATABASE_PATH, DATABASE_DIR, LINE_CONFIG
+    DATABASE_PATH, DATABASE_DIR, REPLICA_CONFIG
 )
 from core.db_manager import DBManager
 from core.data_fetcher import DataFetcher
 from core.feature_calculator import FeatureCalculator
 from core.model_loader import ModelLoader, TARGET_NAMES
-from core.signal_predictor import SignalPredictor
-from core.scheduler import DataScheduler
-from core.line_notifier import LineNotifier
+from core.signal_predictor import SignalPredictor, calc_row_lights
+from core.worker import start_services, startup_integrity_check, start_model_watcher
+from core.metrics import METRICS
 
 # =============================================================================
 # Page Config
@@ -222,66 +222,6 @@ def get_time_period_class(dt_val):
     return 'time-gray'
 
 
-# 指示燈閾值設定 (A-F 個別指標)
-INDICATOR_CHECKS = [
-    ('Engulfing_Strength', 1.3, 'both'),   # A
-    ('Kbar_Power', 0.17, 'both'),           # B
-    ('N_Pattern', 0, 'sign'),               # C: >0 red, <0 green
-    ('Three_Soldiers', 3.3, 'red'),         # D: red only
-    ('Shadow_Reversal', 3.5, 'both'),       # E
-    ('ThreeK_Reversal', 1.5, 'both'),       # F
-]
-
-
-def _count_signals(features_dict, multiplier=1.0):
-    """計算指定閾值倍率下的多空觸發數"""
-    bull, bear = 0, 0
-    for feat, th, mode in INDICATOR_CHECKS:
-        val = features_dict.get(feat, 0)
-        if val is None or (isinstance(val, float) and (np.isnan(val) or pd.isna(val))):
-            val = 0
-        scaled = th * multiplier
-        if mode == 'sign':
-            if val > 0: bull += 1
-            elif val < 0: bear += 1
-        elif mode == 'red':
-            if val >= max(scaled, 0.01): bull += 1
-        else:
-            if val >= max(scaled, 0.001): bull += 1
-            if val <= -max(scaled, 0.001): bear += 1
-    return bull, bear
-
-
-def calc_row_lights(features_dict):
-    """
-    計算每列4個指示燈顏色（多空分離）
-    燈1: 多單個別訊號 — A-F 任一觸發多單（全閾值）→ 紅燈
-    燈2: 空單個別訊號 — A-F 任一觸發空單（全閾值）→ 綠燈
-    燈3: 綜合多單 — H/I/J 任一達標 → 紅燈
-    燈4: 綜合空單 — H/I/J 任一達標 → 綠燈
-    """
-    # 個別指標 (full threshold)
-    b1, g1 = _count_signals(features_dict, 1.0)
-    
-    # 綜合訊號：任一層級達標即亮燈
-    # H: 2項以上 ×0.6 | I: 3項以上 ×0.3 | J: 4項以上 ×0.2
-    composite_bull = False
-    composite_bear = False
-    for mult, min_n in [(0.6, 2), (0.3, 3), (0.2, 4)]:
-        bc, gc = _count_signals(features_dict, mult)
-        if bc >= min_n:
-            composite_bull = True
-        if gc >= min_n:
-            composite_bear = True
-    
-    return [
-        'red' if b1 > 0 else 'gray',           # 燈1: 多單個別
-        'green' if g1 > 0 else 'gray',          # 燈2: 空單個別
-        'red' if composite_bull else 'gray',     # 燈3: 綜合多單
-        'green' if composite_bear else 'gray',   # 燈4: 綜合空單
-    ]
-
-
 def render_row_lights_html(lights):
     """渲染單列的4個指示燈"""
     dots = ''
@@ -291,30 +231,61 @@ def render_row_lights_html(lights):
     return dots
 
 
-def calc_predictions_for_day(day_df, predictor):
-    """計算一天的所有預測"""
+def calc_predictions_for_day(day_df, predictor, db=None):
+    """
+    計算一天的所有預測
+    
+    db 只在 day_df 的特徵與 DB 已存值一致時傳入（直接由 DB 載入，或重算後已寫回）：
+    先讀取目前模型組指紋的已存預測，只對沒有的 K 棒即時評分，DB 可寫時再把評分結果存回。
+    今日表合併了 API 最新 K 棒，特徵可能與已存值不同，不傳 db
+    """
     results = []
     targets = ['long_entry', 'short_entry', 'long_exit', 'short_exit']
-    for idx in day_df.index:
-        row_result = {'_idx': idx}
-        try:
-            feat_vals = day_df.loc[idx, FEATURE_NAMES].values
-            if not np.any(pd.isna(feat_vals)):
-                features = feat_vals.astype(float).reshape(1, -1)
-                for target in targets:
-                    prob = predictor.predict_single(features, target)
-                    # 確保回傳值有效（非 NaN）
-                    if prob is None or (isinstance(prob, float) and np.isnan(prob)):
-                        row_result[target] = None
-                    else:
-                        row_result[target] = prob
-            else:
+    scored = []
+    # 整天固定同一組模型（熱更新替換時不混用新舊模型）
+    with predictor.model_set() as fingerprint:
+        stored = pd.DataFrame()
+        if db is not None and fingerprint and 'timestamp' in day_df.columns:
+            stored = db.load_predictions(day_df['timestamp'].dropna(), fingerprint)
+        for idx in day_df.index:
+            row_result = {'_idx': idx}
+            ts = day_df.at[idx, 'timestamp'] if db is not None and 'timestamp' in day_df.columns else None
+            if not stored.empty and ts is not None and pd.notna(ts) and int(ts) in stored.index:
+                saved = stored.loc[int(ts)]
+                for t in targets:
+                    row_result[t] = None if pd.isna(saved[t]) else float(saved[t])
+                results.append(row_result)
+                continue
+            try:
+                feat_vals = day_df.loc[idx, FEATURE_NAMES].values
+                if not np.any(pd.isna(feat_vals)):
+                    features = feat_vals.astype(float).reshape(1, -1)
+                    for target in targets:
+                        prob = predictor.predict_single(features, target)
+                        # 確保回傳值有效（非 NaN）
+                        if prob is None or (isinstance(prob, float) and np.isnan(prob)):
+                            row_result[target] = None
+                        else:
+                            row_result[target] = prob
+                    if ts is not None and pd.notna(ts):
+                        scored.append(row_result)
+                else:
+                    for t in targets:
+                        row_result[t] = None
+            except Exception:
                 for t in targets:
                     row_result[t] = None
-        except Exception:
-            for t in targets:
-                row_result[t] = None
-        results.append(row_result)
+            results.append(row_result)
+        
+        # 存回本次評分的 K 棒，下次載入同一天（或背景重算）不必再評分
+        if scored and db is not None and fingerprint and not db.read_only:
+            try:
+                db.save_predictions(
+                    [int(day_df.at[r['_idx'], 'timestamp']) for r in scored],
+                    {t: [np.nan if r.get(t) is None else r[t] for r in scored] for t in targets},
+                    fingerprint)
+            except Exception as e:
+                print(f"[預測] 存回失敗: {e}")
     
     return pd.DataFrame(results).set_index('_idx')
 
@@ -538,63 +509,51 @@ def load_components():
     if not os.path.exists(DATABASE_DIR):
         os.makedirs(DATABASE_DIR)
     
-    db_manager = DBManager()
     data_fetcher = DataFetcher()
     feature_calculator = FeatureCalculator()
     model_loader = ModelLoader()
     model_loader.load_all()
     signal_predictor = SignalPredictor(model_loader)
     
-    # 啟動排程器
-    scheduler = DataScheduler(db_manager, data_fetcher, feature_calculator)
-    scheduler.start()
-    
-    # 啟動時資料完整性檢查（僅首次）
-    if 'integrity_checked' not in st.session_state:
-        _startup_integrity_check(db_manager, scheduler)
-        st.session_state.integrity_checked = True
-    
-    # LINE 通知
-    line_notifier = None
-    if LINE_CONFIG.get('enabled'):
-        line_notifier = LineNotifier(
-            channel_id=LINE_CONFIG['channel_id'],
-            channel_secret=LINE_CONFIG['channel_secret'],
-        )
-    
-    return {
-        'db_manager': db_manager,
+    components = {
         'data_fetcher': data_fetcher,
         'feature_calculator': feature_calculator,
         'model_loader': model_loader,
         'signal_predictor': signal_predictor,
-        'scheduler': scheduler,
-        'line_notifier': line_notifier,
     }
-
-
-def _startup_integrity_check(db_manager, scheduler):
-    """
-    應用啟動時的資料完整性防呆檢查。
     
-    檢查項目：
-      1. 資料缺口（時段缺失）：有日盤→必有夜盤
-      2. 特徵完整性（NULL 特徵）
-    若發現問題，嘗試從 API 補回。
-    """
-    try:
-        # 檢查資料缺口
-        gaps = db_manager.check_data_gaps()
-        feat_issues = db_manager.check_feature_completeness()
-        
-        if gaps or feat_issues:
-            print(f"[啟動檢查] 發現 {len(gaps)} 個資料缺口, {len(feat_issues)} 個特徵問題")
-            # 觸發排程器的修復流程
-            scheduler.validate_and_fill_gaps()
-        else:
-            print("[啟動檢查] 資料完整性OK")
-    except Exception as e:
-        print(f"[啟動檢查] 發生錯誤: {e}")
+    # 副本模式：寫入端（run_worker.py）獨佔主資料庫，UI 只讀副本、不排程不推播
+    if REPLICA_CONFIG.get('enabled'):
+        if not os.path.exists(REPLICA_CONFIG['path']):
+            st.error(f"找不到唯讀副本 {REPLICA_CONFIG['path']}，請先啟動 python run_worker.py")
+            st.stop()
+        db_manager = DBManager(REPLICA_CONFIG['path'], read_only=True)
+        components.update({
+            'db_manager': db_manager,
+            'scheduler': None,
+            'line_notifier': None,
+            'live_pipeline': None,
+            'multi_monitor': None,
+            'rescorer': None,
+            'resolution_feed': None,
+            'replica': None,
+        })
+        start_model_watcher(model_loader, signal_predictor, db_manager)
+        return components
+    
+    # 單一進程模式：排程器、推播與管線都在 UI 進程內
+    db_manager = DBManager()
+    components['db_manager'] = db_manager
+    components.update(start_services(db_manager, data_fetcher, feature_calculator,
+                                     model_loader, signal_predictor))
+    start_model_watcher(model_loader, signal_predictor, db_manager)
+    
+    # 啟動時資料完整性檢查（僅首次）
+    if 'integrity_checked' not in st.session_state:
+        startup_integrity_check(db_manager, components['scheduler'])
+        st.session_state.integrity_checked = True
+    
+    return components
 
 
 def fetch_and_process_data(components):
@@ -643,7 +602,12 @@ def get_day_data(full_df, target_date_str):
 
 
 def load_history_data(components, target_date):
-    """載入歷史日期資料（確保所有列的特徵都完整）"""
+    """
+    載入歷史日期資料（確保所有列的特徵都完整）
+    
+    Returns:
+        (資料, 特徵是否與 DB 已存值一致)
+    """
     db = components['db_manager']
     fc = components['feature_calculator']
     
@@ -657,13 +621,13 @@ def load_history_data(components, target_date):
             for f in FEATURE_NAMES
         )
         if features_complete:
-            return day_data
+            return day_data, True
     
     # 若有任何特徵 NULL，載入完整歷史重新計算
     # 使用 5 天完整資料確保 lookback 足夠（SMA20, CCI20, ADX14 等需要）
     all_data = db.load_ohlcv(days=5)
     if all_data.empty:
-        return pd.DataFrame()
+        return pd.DataFrame(), False
     
     processed = fc.calculate_all(all_data)
     processed['_date'] = processed['datetime'].dt.strftime('%Y-%m-%d')
@@ -671,10 +635,12 @@ def load_history_data(components, target_date):
     result = result.drop(columns=['_date'], errors='ignore')
     
     # 重算後存回 DB，修復 NULL 特徵（只存該日期的資料，避免覆寫其他日期）
-    if not result.empty:
+    # 唯讀副本不寫回，由寫入端的啟動檢查 / 補洞修復
+    if not result.empty and not db.read_only:
         db.save_ohlcv(result, include_features=True)
+        return result, True
     
-    return result
+    return result, False
 
 
 # =============================================================================
@@ -831,20 +797,46 @@ def display_control_panel(components):
         model_status = components['model_loader'].get_status()
         refresh_time = st.session_state.last_refresh.strftime('%H:%M:%S') if st.session_state.last_refresh else '--:--:--'
         scheduler = components['scheduler']
-        next_run = scheduler.get_next_run_time()
+        if scheduler is not None:
+            next_run = scheduler.get_next_run_time()
+        else:
+            # 副本模式：顯示副本發佈時間
+            replica_mtime = os.path.getmtime(components['db_manager'].db_path)
+            next_run = f"副本 {datetime.fromtimestamp(replica_mtime).strftime('%H:%M:%S')}"
+        
+        latency_str = '--'
+        live_pipeline = components.get('live_pipeline')
+        if live_pipeline:
+            latency = live_pipeline.get_latency_stats()
+            if latency['count']:
+                latency_str = f"{latency['last_total']:.1f}s"
+        
+        # 熱點耗時（中位數）
+        timing_parts = []
+        for name, label in (('fetch_raw', '抓取'), ('calculate_all', '特徵'), ('load_ohlcv', '讀DB')):
+            stats = METRICS.get_stats(name)
+            if stats['count']:
+                timing_parts.append(f"{label} {stats['p50'] * 1000:.0f}ms")
+        timing_str = ' / '.join(timing_parts) or '--'
         
         st.markdown(f"""
         <div class="status-bar">
             <span>{'  |  '.join(parts)}</span>
-            <span>模型: {'OK' if model_status['ready'] else 'X'} {model_status['total_models']}/20 | 
+            <span>模型: {'OK' if model_status['ready'] else 'X'} {model_status['total_models']}/20 {(model_status['fingerprint'] or '')[:8]} | 
                   更新: {refresh_time} | 
+                  訊號延遲: {latency_str} | 
+                  耗時: {timing_str} | 
                   排程: {next_run}</span>
         </div>
         """, unsafe_allow_html=True)
 
 
-def display_signal_section(day_df, components, section_key="today"):
-    """顯示完整訊號區塊（表格+指示燈+圖表）"""
+def display_signal_section(day_df, components, section_key="today", prediction_db=None):
+    """
+    顯示完整訊號區塊（表格+指示燈+圖表）
+    
+    prediction_db: day_df 特徵與其已存值一致時傳入，沿用 / 存回已存預測
+    """
     if day_df.empty:
         st.info("尚無資料")
         return
@@ -871,7 +863,7 @@ def display_signal_section(day_df, components, section_key="today"):
     
     # 計算預測
     predictor = components['signal_predictor']
-    preds_df = calc_predictions_for_day(day_df, predictor)
+    preds_df = calc_predictions_for_day(day_df, predictor, prediction_db)
     
     # LINE 通知 — 只對「已確認收盤」的 K 棒發送
     # 
@@ -951,12 +943,13 @@ def display_history_section(components):
     
     if selected_date:
         with st.spinner("載入歷史資料..."):
-            hist_data = load_history_data(components, selected_date)
+            hist_data, from_db = load_history_data(components, selected_date)
         
         if hist_data.empty:
             st.warning(f"{selected_date} 無資料")
         else:
-            display_signal_section(hist_data, components, section_key=f"hist_{selected_date}")
+            display_signal_section(hist_data, components, section_key=f"hist_{selected_date}",
+                                   prediction_db=db if from_db else None)
 
 
 # =============================================================================
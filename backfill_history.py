@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+API 分頁回補腳本
+API 單次只回傳 to 之前最後 1000 根；本腳本將 to 逐頁往回推，直到指定的起始日期：
+
+  1. 每頁以 save_ohlcv_bulk 直接寫入資料庫（單一交易、不算特徵）
+  2. 每頁寫入後更新檢查點（下一頁的 to），中斷後以相同參數重跑即從斷點續抓
+  3. 請求間隔依 rate_limit 節流；空回應以指數退避重試
+  4. 全部頁面完成後，依時間順序分批計算特徵（批次間保留暖機尾端）
+
+用法:
+  python backfill_history.py --start 2025-01-01 --db database/archive.db
+  python backfill_history.py --start 2025-06-01 --symbol TWF:MXF:FUTURES --rate 0.5
+  python backfill_history.py --start 2025-01-01 --db database/archive.db --restart
+
+注意：寫入主資料庫時，排程器每日仍會清理到 DB_CONFIG['max_days'] 個交易日，
+長期歷史請寫入獨立的 --db
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import API_CONFIG, BACKFILL_CONFIG, DATABASE_DIR, DATABASE_PATH, IMPORT_CONFIG
+from core.data_fetcher import DataFetcher
+from core.db_manager import DBManager
+from core.feature_calculator import FeatureCalculator
+
+# K 棒 datetime 為台灣時間（UTC+8），API 的 to / t 為 UTC epoch
+TW_OFFSET = 8 * 3600
+
+
+def date_to_epoch(date_str: str) -> int:
+    """台灣日期 00:00 → UTC epoch 秒"""
+    return int((pd.Timestamp(date_str) - pd.Timestamp('1970-01-01')).total_seconds()) - TW_OFFSET
+
+
+def default_checkpoint(symbol: str, resolution: str, db_path: str, end_ts: Optional[int]) -> str:
+    """依商品 / 週期 / 目標資料庫 / 截止點區分檔名，不同任務不會共用同一份檢查點"""
+    db_tag = hashlib.sha1(os.path.abspath(db_path).encode('utf-8')).hexdigest()[:8]
+    end_tag = end_ts if end_ts is not None else 'now'
+    return os.path.join(DATABASE_DIR, f"backfill_{symbol.replace(':', '_')}_{resolution}_{db_tag}_{end_tag}.json")
+
+
+class RateLimiter:
+    """固定最小間隔的節流（單執行緒依序呼叫）"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._last = 0.0
+    
+    def wait(self):
+        delay = self._last + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._last = time.monotonic()
+
+
+def load_checkpoint(path: str, symbol: str, resolution: str, db_path: str,
+                    start_ts: int, end_ts: Optional[int]) -> Optional[dict]:
+    """
+    讀取檢查點；商品 / 週期 / 資料庫 / 起點 / 截止點不同則視為新任務
+    
+    end_ts 為 None 表示截止於第一次執行的當下（未指定 --end），續抓時沿用
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    identity = (state.get('symbol'), state.get('resolution'), state.get('db_path'),
+                state.get('start_ts'), state.get('end_date_ts'))
+    if identity != (symbol, resolution, os.path.abspath(db_path), start_ts, end_ts):
+        print(f"  檢查點參數不同（{state.get('symbol')} / {state.get('resolution')} / {state.get('db_path')}），重新開始")
+        return None
+    return state
+
+
+def save_checkpoint(path: str, state: dict):
+    """先寫暫存檔再取代，中斷時不會留下半份檢查點"""
+    state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def fetch_page(fetcher: DataFetcher, limiter: RateLimiter, to_ts: int, limit: int) -> pd.DataFrame:
+    """抓取一頁；空回應（錯誤或已無更早資料）時退避重試"""
+    retries = BACKFILL_CONFIG['max_retries']
+    for attempt in range(retries + 1):
+        limiter.wait()
+        page = fetcher.fetch_raw(limit=limit, to_ts=to_ts)
+        if not page.empty:
+            return page
+        if attempt < retries:
+            delay = BACKFILL_CONFIG['retry_backoff'] * (2 ** attempt)
+            print(f"  空回應，{delay:.0f}s 後重試（{attempt + 1}/{retries}）")
+            time.sleep(delay)
+    return page
+
+
+def backfill(start_date: str, end_date: Optional[str] = None, db: DBManager = None,
+             fetcher: DataFetcher = None, checkpoint: Optional[str] = None,
+             rate: Optional[float] = None, limit: Optional[int] = None,
+             restart: bool = False) -> dict:
+    """
+    逐頁往回抓取 [start_date, end_date) 的 K 棒並寫入資料庫
+    
+    Returns:
+        檢查點內容（含 done / pages / rows / oldest_ts）
+    """
+    db = db or DBManager()
+    fetcher = fetcher or DataFetcher(symbol=db.symbol, resolution=db.resolution)
+    limit = limit or BACKFILL_CONFIG['page_limit']
+    limiter = RateLimiter(rate or BACKFILL_CONFIG['rate_limit'])
+    start_ts = date_to_epoch(start_date)
+    end_date_ts = date_to_epoch(end_date) if end_date else None
+    checkpoint = checkpoint or default_checkpoint(fetcher.symbol, str(fetcher.resolution), db.db_path, end_date_ts)
+    
+    state = None if restart else load_checkpoint(checkpoint, fetcher.symbol, str(fetcher.resolution),
+                                                 db.db_path, start_ts, end_date_ts)
+    if state and state.get('done'):
+        print(f"  檢查點顯示已完成（{state['pages']} 頁 / {state['rows']} 筆），如需重抓請加 --restart")
+        return state
+    if state:
+        print(f"  從檢查點續抓：第 {state['pages'] + 1} 頁，to={state['next_to']}")
+    else:
+        end_ts = end_date_ts if end_date_ts is not None else int(datetime.now().timestamp())
+        state = {
+            'symbol': fetcher.symbol, 'resolution': str(fetcher.resolution),
+            'db_path': os.path.abspath(db.db_path), 'end_date_ts': end_date_ts,
+            'start_ts': start_ts, 'end_ts': end_ts, 'next_to': end_ts,
+            'pages': 0, 'rows': 0, 'oldest_ts': None, 'done': False,
+        }
+    
+    t0 = time.perf_counter()
+    while state['next_to'] > start_ts:
+        page = fetch_page(fetcher, limiter, state['next_to'], limit)
+        if page.empty:
+            print("  API 無更早資料或連續失敗，暫停（可稍後以相同參數續抓）")
+            break
+        
+        oldest = int(page['timestamp'].min())
+        if oldest >= state['next_to']:
+            print("  API 回傳的資料未早於上一頁，停止")
+            break
+        # 不足一頁：API 已無更早資料，視同回補到起點
+        exhausted = len(page) < limit
+        page = page[(page['timestamp'] >= start_ts) & (page['timestamp'] < state['end_ts'])]
+        if not page.empty:
+            db.save_ohlcv_bulk(page, include_features=False)
+        
+        state['next_to'] = start_ts if exhausted else oldest - 1
+        state['pages'] += 1
+        state['rows'] += len(page)
+        state['oldest_ts'] = oldest
+        save_checkpoint(checkpoint, state)
+        
+        elapsed = time.perf_counter() - t0
+        print(f"  第 {state['pages']} 頁: {len(page)} 筆，已回補至 {page['datetime'].min() if not page.empty else start_date}"
+              f"（累計 {state['rows']} 筆，{elapsed:.1f}s）")
+        if exhausted:
+            print("  API 已無更早資料")
+    
+    state['done'] = state['next_to'] <= start_ts
+    save_checkpoint(checkpoint, state)
+    return state
+
+
+def compute_features(db: DBManager, start_date: str, end_date: Optional[str] = None,
+                     chunk_days: Optional[int] = None) -> int:
+    """
+    依時間順序分批重算特徵（回補是由新到舊寫入，必須等全部頁面完成才能算）
+    
+    批次間保留前一批尾端 lookback × warmup_multiplier 根作暖機，與整段計算一致
+    """
+    fc = FeatureCalculator()
+    warmup = fc.get_lookback_bars() * IMPORT_CONFIG['warmup_multiplier']
+    chunk_days = chunk_days or BACKFILL_CONFIG['feature_chunk_days']
+    
+    dates = sorted(d for d in db.get_trading_dates()
+                   if d >= start_date and (end_date is None or d < end_date))
+    tail = pd.DataFrame()
+    saved = 0
+    for i in range(0, len(dates), chunk_days):
+        chunk_dates = dates[i:i + chunk_days]
+        chunk = db.load_ohlcv(start_date=chunk_dates[0], end_date=chunk_dates[-1])
+        if chunk.empty:
+            continue
+        combined = pd.concat([tail, chunk], ignore_index=True) if not tail.empty else chunk
+        processed = fc.calculate_all(combined).iloc[len(tail):]
+        saved += db.save_ohlcv_bulk(processed, include_features=True)
+        tail = combined.tail(warmup).reset_index(drop=True)
+        print(f"  特徵: {chunk_dates[0]} ~ {chunk_dates[-1]}，{len(chunk)} 筆")
+    return saved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="鉅亨網 API 分頁回補歷史 K 棒")
+    parser.add_argument('--start', required=True, help="回補起始日期 YYYY-MM-DD（台灣時間）")
+    parser.add_argument('--end', default=None, help="截止日期 YYYY-MM-DD（不含，預設現在）")
+    parser.add_argument('--db', default=None, help="資料庫路徑（預設 config.DATABASE_PATH）")
+    parser.add_argument('--symbol', default=None, help=f"商品代碼（預設 {API_CONFIG['symbol']}）")
+    parser.add_argument('--resolution', default=None, help=f"週期分鐘數（預設 {API_CONFIG['resolution']}）")
+    parser.add_argument('--rate', type=float, default=None,
+                        help=f"每秒請求數上限（預設 {BACKFILL_CONFIG['rate_limit']}）")
+    parser.add_argument('--checkpoint', default=None, help="檢查點檔案路徑")
+    parser.add_argument('--restart', action='store_true', help="忽略檢查點，從頭回補")
+    parser.add_argument('--no-features', action='store_true', help="只回補 K 棒，不計算特徵")
+    args = parser.parse_args()
+    
+    db = DBManager(args.db or DATABASE_PATH, args.symbol, args.resolution)
+    fetcher = DataFetcher(symbol=db.symbol, resolution=db.resolution)
+    print(f"[1/2] 回補 {db.symbol} {db.resolution} 分 K：{args.start} ~ {args.end or '現在'}")
+    state = backfill(args.start, args.end, db, fetcher, args.checkpoint, args.rate,
+                     restart=args.restart)
+    
+    if args.no_features:
+        print("[2/2] 略過特徵計算")
+    elif not state['done']:
+        print("[2/2] 回補未完成，續抓完成後再計算特徵")
+    else:
+        print("[2/2] 計算特徵...")
+        saved = compute_features(db, args.start, args.end)
+        print(f"  已寫入 {saved} 筆特徵")
+    
+    print(f"\n完成：{state['pages']} 頁 / {state['rows']} 筆"
+          f"{'' if state['done'] else '（未完成，可重跑續抓）'}")
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+TX Models 效能基準測試
+執行: python benchmarks/run.py（詳見 run.py）
+"""
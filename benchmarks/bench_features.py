@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""特徵計算基準"""
+
+from benchmarks.fixtures import ohlcv
+from benchmarks.harness import benchmark
+from core.feature_calculator import FeatureCalculator
+
+
+@benchmark('features.calculate_all')
+def calculate_all(size, kind):
+    fc = FeatureCalculator()
+    df = ohlcv(size, kind)
+    return lambda: fc.calculate_all(df)
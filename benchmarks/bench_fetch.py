@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""API 回應解碼 / 解析基準（不連網，以 fixture K 棒組出回應 bytes）"""
+
+import json
+
+from benchmarks.fixtures import ohlcv
+from benchmarks.harness import benchmark
+from core.data_fetcher import DataFetcher, TW_OFFSET
+
+
+def _payload(size, kind) -> bytes:
+    bars = ohlcv(size, kind)
+    data = {
+        't': (bars['timestamp'] - TW_OFFSET).tolist(),
+        'o': bars['open'].tolist(),
+        'h': bars['high'].tolist(),
+        'l': bars['low'].tolist(),
+        'c': bars['close'].tolist(),
+        'v': bars['volume'].tolist(),
+    }
+    return json.dumps({'data': data}).encode()
+
+
+@benchmark('fetch.parse_response')
+def parse_response(size, kind):
+    fetcher = DataFetcher()
+    payload = _payload(size, kind)
+    return lambda: fetcher._parse_response(fetcher._decode(payload)['data'])
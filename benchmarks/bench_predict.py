@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+模型評分 / 訊號表基準
+逐列評分的項目（predict_dataframe、calc_predictions_for_day、訊號表 HTML）
+在 100k 會跑數分鐘，上限設為 10k
+"""
+
+import functools
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import featured
+from benchmarks.harness import benchmark, SkipBenchmark
+from config import FEATURE_NAMES
+
+
+@functools.lru_cache(maxsize=None)
+def _predictor():
+    from core.model_loader import ModelLoader
+    from core.signal_predictor import SignalPredictor
+    loader = ModelLoader()
+    loader.load_all()
+    if not loader.get_status()['total_models']:
+        raise SkipBenchmark("模型未載入")
+    return SignalPredictor(loader)
+
+
+def _app():
+    try:
+        import app
+    except ImportError as e:
+        raise SkipBenchmark(f"無法匯入 app.py: {e}")
+    return app
+
+
+@benchmark('predict.predict_dataframe', max_size=10000)
+def predict_dataframe(size, kind):
+    predictor = _predictor()
+    df = featured(size, kind)
+    return lambda: predictor.predict_dataframe(df)
+
+
+@benchmark('predict.predict_batch')
+def predict_batch(size, kind):
+    predictor = _predictor()
+    features = featured(min(size, 10000), kind)[FEATURE_NAMES].to_numpy()
+    # 大筆數以 10k 特徵重複拼接（只量評分本身）
+    reps = -(-size // len(features))
+    features = np.tile(features, (reps, 1))[:size]
+    return lambda: predictor.predict_batch(features, 'long_entry')
+
+
+@benchmark('app.calc_predictions_for_day', max_size=10000)
+def calc_predictions_for_day(size, kind):
+    app = _app()
+    predictor = _predictor()
+    df = featured(size, kind)
+    return lambda: app.calc_predictions_for_day(df, predictor)
+
+
+@benchmark('app.build_signal_table_html', max_size=10000)
+def build_signal_table_html(size, kind):
+    app = _app()
+    df = featured(size, kind)
+    preds = pd.DataFrame({t: 0.5 for t in ('long_entry', 'short_entry', 'long_exit', 'short_exit')},
+                         index=df.index)
+    return lambda: app.build_signal_table_html(df, preds, True, True)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""SQLite 讀寫 / 缺口檢查基準（每個基準使用獨立暫存 DB）"""
+
+import atexit
+import itertools
+import shutil
+import tempfile
+import os
+
+from benchmarks.fixtures import with_random_features
+from benchmarks.harness import benchmark
+from core.db_manager import DBManager
+
+_TMP_DIR = tempfile.mkdtemp(prefix="tx_bench_")
+atexit.register(shutil.rmtree, _TMP_DIR, ignore_errors=True)
+_counter = itertools.count()
+
+
+def _new_db_path() -> str:
+    return os.path.join(_TMP_DIR, f"bench_{next(_counter)}.db")
+
+
+def _filled_db(size, kind) -> DBManager:
+    db = DBManager(_new_db_path())
+    db.save_ohlcv(with_random_features(size, kind), include_features=True)
+    return db
+
+
+@benchmark('storage.save_ohlcv')
+def save_ohlcv(size, kind):
+    df = with_random_features(size, kind)
+    
+    def run():
+        # 每次寫入全新的 DB（量的是插入，而非 upsert 覆寫）
+        DBManager(_new_db_path()).save_ohlcv(df, include_features=True)
+    return run
+
+
+@benchmark('storage.load_ohlcv')
+def load_ohlcv(size, kind):
+    db = _filled_db(size, kind)
+    return lambda: db.load_ohlcv(include_features=True)
+
+
+@benchmark('storage.check_data_gaps')
+def check_data_gaps(size, kind):
+    db = _filled_db(size, kind)
+    return lambda: db.check_data_gaps()
+
+
+@benchmark('storage.load_compact')
+def load_compact(size, kind):
+    db = _filled_db(size, kind)
+    return lambda: db.load_compact(include_features=True)
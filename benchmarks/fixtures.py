@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+基準測試資料
+  synthetic: 隨機漫步量價，時間落在實際交易時段（日盤 + 夜盤、跳過週末）
+  recorded : 260207_history.csv 的真實 K 棒，不足時往後平移兩週重複拼接，
+             價格接續前一段收盤，時間戳保持唯一
+"""
+
+import functools
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import BASE_DIR, FEATURE_NAMES
+from core.feature_calculator import FeatureCalculator
+from core.feature_profiler import synthetic_bars
+from core.live_pipeline import is_trading_bar
+
+RECORDED_CSV = os.path.join(BASE_DIR, "260207_history.csv")
+KINDS = ('synthetic', 'recorded')
+
+
+def trading_datetimes(n: int, start: datetime = datetime(2025, 1, 6, 8, 45)) -> pd.DatetimeIndex:
+    """從 start 起依序產生 n 個交易時段內的 5 分 K 時間（週一日盤 ~ 週六凌晨夜盤）"""
+    out = []
+    dt = start
+    step = timedelta(minutes=5)
+    while len(out) < n:
+        # 週六 05:00 之後到週一 08:45 之前休市
+        weekday = dt.weekday()
+        closed = weekday == 6 or (weekday == 5 and dt.hour >= 5) or (weekday == 0 and dt.hour < 8)
+        if not closed and is_trading_bar(dt):
+            out.append(dt)
+        dt += step
+    return pd.DatetimeIndex(out)
+
+
+def _with_datetimes(bars: pd.DataFrame, dts: pd.DatetimeIndex) -> pd.DataFrame:
+    bars = bars.copy()
+    bars['datetime'] = dts
+    bars['timestamp'] = ((dts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype(int)
+    return bars
+
+
+@functools.lru_cache(maxsize=None)
+def _recorded_base() -> pd.DataFrame:
+    from import_history import read_history_csv
+    bars = read_history_csv(RECORDED_CSV)
+    return bars[['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume']]
+
+
+@functools.lru_cache(maxsize=None)
+def _ohlcv(size: int, kind: str) -> pd.DataFrame:
+    if kind == 'synthetic':
+        return _with_datetimes(synthetic_bars(size), trading_datetimes(size))
+    
+    base = _recorded_base()
+    parts = []
+    price_offset = 0.0
+    shift = timedelta(days=14)
+    copies = -(-size // len(base))
+    for i in range(copies):
+        part = base.copy()
+        part['datetime'] = part['datetime'] + shift * i
+        for col in ('open', 'high', 'low', 'close'):
+            part[col] = part[col] + price_offset
+        price_offset = part['close'].iloc[-1] - base['open'].iloc[0]
+        parts.append(part)
+    bars = pd.concat(parts, ignore_index=True).head(size)
+    return _with_datetimes(bars, pd.DatetimeIndex(bars['datetime']))
+
+
+def ohlcv(size: int, kind: str = 'synthetic') -> pd.DataFrame:
+    """size 根 OHLCV（回傳複本，可自由修改）"""
+    if kind not in KINDS:
+        raise ValueError(f"未知的資料種類: {kind}")
+    return _ohlcv(size, kind).copy()
+
+
+@functools.lru_cache(maxsize=None)
+def _featured(size: int, kind: str) -> pd.DataFrame:
+    # 多算一段暖機，避免前段特徵為 NaN
+    warmup = FeatureCalculator().get_lookback_bars() * 2
+    processed = FeatureCalculator().calculate_all(_ohlcv(size + warmup, kind))
+    return processed.tail(size).reset_index(drop=True)
+
+
+def featured(size: int, kind: str = 'synthetic') -> pd.DataFrame:
+    """size 根含 17 特徵的資料（回傳複本）"""
+    if kind not in KINDS:
+        raise ValueError(f"未知的資料種類: {kind}")
+    return _featured(size, kind).copy()
+
+
+def with_random_features(size: int, kind: str = 'synthetic', seed: int = 0) -> pd.DataFrame:
+    """size 根 OHLCV + 隨機特徵值（儲存類基準只在乎欄位與筆數，不必真的算特徵）"""
+    bars = ohlcv(size, kind)
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 1, (size, len(FEATURE_NAMES)))
+    for i, name in enumerate(FEATURE_NAMES):
+        bars[name] = values[:, i]
+    return bars
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+基準測試框架（asv 風格，僅用標準函式庫）
+
+每個基準以 @benchmark 註冊一個 setup 函式：
+  setup(size, kind) → 回傳無參數的 callable（只有 callable 會被計時）
+  無法執行時 raise SkipBenchmark(原因)，例如缺少模型或 streamlit
+"""
+
+import statistics
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+SIZES = (300, 1100, 10000, 100000)
+
+
+class SkipBenchmark(Exception):
+    """環境不足以執行此基準"""
+
+
+class Case:
+    """已註冊的基準"""
+    
+    def __init__(self, name: str, setup: Callable, sizes: Tuple[int, ...],
+                 max_size: Optional[int] = None):
+        self.name = name
+        self.setup = setup
+        self.sizes = sizes
+        self.max_size = max_size
+
+
+REGISTRY: List[Case] = []
+
+
+def benchmark(name: str, sizes: Tuple[int, ...] = SIZES, max_size: Optional[int] = None):
+    """
+    註冊基準
+    
+    Args:
+        name: 基準名稱（模組.項目）
+        sizes: 預設的輸入筆數
+        max_size: 超過此筆數不執行（逐列 Python 迴圈的項目在 100k 會跑數分鐘）
+    """
+    def decorator(setup):
+        REGISTRY.append(Case(name, setup, tuple(sizes), max_size))
+        return setup
+    return decorator
+
+
+def measure(func: Callable, min_repeat: int = 1, max_repeat: int = 5,
+            budget: float = 2.0) -> dict:
+    """
+    計時：先跑一次，再依耗時決定重複次數（總時間約 budget 秒）
+    
+    Returns:
+        {'repeat', 'min', 'median', 'mean', 'stdev'}（秒）
+    """
+    t0 = time.perf_counter()
+    func()
+    times = [time.perf_counter() - t0]
+    
+    extra = int(budget / times[0]) if times[0] > 0 else max_repeat
+    repeat = max(min_repeat, min(max_repeat, extra + 1))
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    
+    return {
+        'repeat': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
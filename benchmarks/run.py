@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+基準測試執行 / 比對
+
+用法:
+  python benchmarks/run.py                                  # 全部基準、全部筆數
+  python benchmarks/run.py --sizes 300,1100 --filter features
+  python benchmarks/run.py --kind recorded --output base.json
+  python benchmarks/run.py --compare base.json new.json     # 比對兩次結果
+
+結果以 JSON 存於 benchmarks/results/<commit>.json（含 commit、套件版本、機器資訊），
+比對時以 median 計算倍數，超過 --threshold 標記為退步
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.harness import REGISTRY, SIZES, SkipBenchmark, measure
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+MODULES = ['bench_features', 'bench_fetch', 'bench_predict', 'bench_storage']
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _environment() -> dict:
+    import numpy as np
+    import pandas as pd
+    env = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+    try:
+        import xgboost
+        env['xgboost'] = xgboost.__version__
+    except ImportError:
+        pass
+    return env
+
+
+def run(sizes=None, kind='synthetic', name_filter=None) -> dict:
+    """執行已註冊的基準，回傳結果字典"""
+    for module in MODULES:
+        importlib.import_module(f"benchmarks.{module}")
+    
+    results = []
+    for case in REGISTRY:
+        if name_filter and name_filter not in case.name:
+            continue
+        for size in (sizes or case.sizes):
+            if case.max_size and size > case.max_size:
+                continue
+            label = f"{case.name} [{size}]"
+            try:
+                func = case.setup(size, kind)
+            except SkipBenchmark as e:
+                print(f"  SKIP  {label}: {e}")
+                results.append({'name': case.name, 'size': size, 'skipped': str(e)})
+                break
+            stats = measure(func)
+            stats['rows_per_sec'] = size / stats['median'] if stats['median'] else None
+            results.append({'name': case.name, 'size': size, **stats})
+            print(f"  {stats['median'] * 1000:10.2f} ms  (x{stats['repeat']})  {label}")
+    
+    return {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'fixture': kind,
+        'environment': _environment(),
+        'results': results,
+    }
+
+
+def compare(base_path: str, new_path: str, threshold: float = 1.10) -> int:
+    """比對兩份結果，回傳退步項目數"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    
+    base_map = {(r['name'], r['size']): r for r in base['results'] if 'median' in r}
+    print(f"{base['commit']} → {new['commit']}  (median 倍數，>{threshold:.2f} 視為退步)")
+    if base.get('fixture') != new.get('fixture'):
+        print(f"  注意: 測試資料種類不同 ({base.get('fixture')} / {new.get('fixture')})")
+    regressions = 0
+    for r in new['results']:
+        key = (r['name'], r['size'])
+        if 'median' not in r or key not in base_map:
+            continue
+        ratio = r['median'] / base_map[key]['median']
+        mark = ""
+        if ratio > threshold:
+            mark = "  << 退步"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            mark = "  >> 改善"
+        print(f"  {ratio:6.2f}x  {base_map[key]['median'] * 1000:10.2f} → "
+              f"{r['median'] * 1000:10.2f} ms  {r['name']} [{r['size']}]{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TX Models 效能基準")
+    parser.add_argument('--sizes', default=None,
+                        help=f"輸入筆數，逗號分隔（預設 {','.join(map(str, SIZES))}）")
+    parser.add_argument('--kind', default='synthetic', choices=['synthetic', 'recorded'],
+                        help="測試資料種類")
+    parser.add_argument('--filter', default=None, help="只執行名稱含此字串的基準")
+    parser.add_argument('--output', default=None, help="結果 JSON 路徑（預設 results/<commit>.json）")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="比對兩份結果 JSON")
+    parser.add_argument('--threshold', type=float, default=1.10, help="退步判定倍數")
+    args = parser.parse_args()
+    
+    if args.compare:
+        regressions = compare(*args.compare, threshold=args.threshold)
+        sys.exit(1 if regressions else 0)
+    
+    sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else None
+    report = run(sizes, args.kind, args.filter)
+    
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已存: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+特徵數值一致性檢查
+以 golden/ 下凍結的 calculate_all 輸出，逐特徵比對任一特徵引擎
+
+用法:
+  python check_feature_parity.py --freeze                 # 以目前 FeatureCalculator 重建 golden
+  python check_feature_parity.py                          # 檢查目前 FeatureCalculator
+  python check_feature_parity.py --engine mypkg.fast:FastCalculator
+  python check_feature_parity.py --atol 1e-6 --rtol 1e-6  # 放寬全部特徵的容許誤差
+
+--engine 指向「模組:名稱」，可為具 calculate_all 方法的類別 / 物件，或 df → df 的函式
+有任何特徵超出容許誤差時以 exit code 1 結束
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import FEATURE_NAMES
+from core.parity import GOLDEN_DIR, check_engine, freeze
+
+
+def load_engine(spec: str):
+    """「模組:名稱」→ df → df 的 callable"""
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"引擎格式應為 模組:名稱，收到: {spec}")
+    target = getattr(importlib.import_module(module_name), attr)
+    if isinstance(target, type):
+        target = target()
+    return getattr(target, 'calculate_all', target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="特徵引擎數值一致性檢查")
+    parser.add_argument('--engine', default='core.feature_calculator:FeatureCalculator',
+                        help="待檢查的引擎（模組:名稱）")
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR, help="golden 檔目錄")
+    parser.add_argument('--freeze', action='store_true', help="以 --engine 重建 golden 檔")
+    parser.add_argument('--atol', type=float, default=None, help="覆寫全部特徵的絕對誤差")
+    parser.add_argument('--rtol', type=float, default=None, help="覆寫全部特徵的相對誤差")
+    args = parser.parse_args()
+    
+    engine = load_engine(args.engine)
+    
+    if args.freeze:
+        freeze(engine, golden_dir=args.golden_dir)
+        return
+    
+    if not os.path.isdir(args.golden_dir):
+        print(f"找不到 golden 目錄: {args.golden_dir}（先執行 --freeze）")
+        sys.exit(2)
+    
+    tolerances = None
+    if args.atol is not None or args.rtol is not None:
+        tolerances = {f: (args.atol or 0.0, args.rtol or 0.0) for f in FEATURE_NAMES}
+    
+    reports = check_engine(engine, args.golden_dir, tolerances)
+    pd.set_option('display.width', 200)
+    failed = 0
+    for name, report in reports.items():
+        bad = report[report['mismatches'] > 0]
+        status = "OK" if bad.empty else f"{len(bad)} 個特徵不一致"
+        print(f"\n=== {name}: {status} ===")
+        print(report[['feature', 'mismatches', 'max_abs', 'max_rel']]
+              .to_string(index=False, float_format=lambda v: f"{v:.3g}"))
+        for _, row in bad.iterrows():
+            if row.get('missing'):
+                print(f"  {row['feature']}: 引擎輸出缺少此欄")
+            elif 'first_index' in row and pd.notna(row['first_index']):
+                print(f"  {row['feature']}: 第一個分歧於第 {int(row['first_index'])} 根 "
+                      f"({row['first_datetime']})  golden={row['first_reference']!r}  "
+                      f"engine={row['first_candidate']!r}")
+            else:
+                print(f"  {row['feature']}: 輸出長度不符")
+        failed += len(bad)
+    
+    print(f"\n{'全部一致' if not failed else f'共 {failed} 項不一致'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
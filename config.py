@@ -34,10 +34,13 @@ MODEL_FILES = {
 # =============================================================================
 API_CONFIG = {
     "symbol": "TWF:TXF:FUTURES",
-    "base_url": "https://ws.api.cnyes.com/ws/api/v1/charting/history",
+    # 設定 TX_API_BASE_URL 可改連本機替身伺服器（run_chart_server.py）
+    "base_url": os.environ.get("TX_API_BASE_URL",
+                               "https://ws.api.cnyes.com/ws/api/v1/charting/history"),
     "resolution": "5",  # 5分K
     "limit": 1000,
     "timeout": 8,
+    "max_concurrency": 4,  # 並行抓取（core/async_fetcher.py）同時請求數上限
     "headers": {
         "User-Agent": "Mozilla/5.0",
         "Referer": "https://stock.cnyes.com/market/TWF:TXF:FUTURES"
@@ -49,6 +52,8 @@ API_CONFIG = {
 # =============================================================================
 DB_CONFIG = {
     "max_days": 5,  # 最多保留5個交易日的資料
+    "archive": True,  # 過期交易日先搬到月份歸檔檔再刪除（False 則直接刪除）
+    "archive_dir": os.path.join(DATABASE_DIR, "archive"),
 }
 
 # =============================================================================
@@ -67,6 +72,17 @@ THRESHOLDS = {
     }
 }
 
+# =============================================================================
+# 回測設定
+# =============================================================================
+BACKTEST_CONFIG = {
+    "max_hold_bars": 12,     # 最長持有 K 棒數（未觸發出場門檻時強制出場）
+    "horizon_bars": 12,      # 計算 RECALL 的前瞻 K 棒數
+    "target_points": 30,     # 前瞻期間最大順向波動 >= 此點數視為「機會」
+    "cost_points": 2,        # 每筆交易來回成本（點）
+    "session_gap_minutes": 10,  # 相鄰 K 棒間隔超過此值視為換盤（當沖強制平倉）
+}
+
 # =============================================================================
 # 技術指標參數
 # =============================================================================
@@ -91,6 +107,144 @@ LINE_CONFIG = {
     "channel_id": "2009071761",
     "channel_secret": "08dcb989245efea962fb870961cca995",
     "enabled": True,  # 開關
+    "queue_size": 100,      # 發送佇列上限
+    "max_retries": 3,       # 推播失敗重試次數
+    "retry_backoff": 1.0,   # 重試退避基數（秒），1s → 2s → 4s
+    "dedup_ttl": 2 * 86400, # 已發送紀錄保留時間（秒）
+    "dedup_cache_size": 500,  # 本機快取筆數
+}
+
+# =============================================================================
+# 即時管線設定（伺服器端 K 棒收盤觸發）
+# =============================================================================
+LIVE_CONFIG = {
+    "enabled": True,
+    "trigger_offset": 0.2,     # 5分K邊界後幾秒開始輪詢
+    "poll_interval": 0.5,      # 輪詢間隔（秒）
+    "max_wait": 30,            # 最長等待新 K 棒（秒）
+    "poll_limit": 5,           # 輪詢時每次抓取筆數
+    "feature_tail_bars": 200,  # 增量特徵計算使用的尾端 K 棒數
+    "latency_history": 288,    # 保留最近 N 筆延遲紀錄（約一日）
+    "persist": False,          # 收盤 K 棒 + 特徵是否即時寫入 DB（主商品由 DataScheduler 存檔）
+}
+
+# =============================================================================
+# 多商品監控設定
+# =============================================================================
+SYMBOL_LABELS = {
+    "TWF:TXF:FUTURES": "台指期",
+    "TWF:MXF:FUTURES": "小台指",
+}
+
+MONITOR_CONFIG = {
+    # 監控的商品代碼（第一個以外的商品由 MultiSymbolMonitor 處理）
+    # 近 / 遠月合約請填入鉅亨網對應代碼，並在 SYMBOL_LABELS 加上顯示名稱
+    "symbols": ["TWF:TXF:FUTURES"],
+    "max_workers": 4,          # 同時執行抓取 / 評分的商品數上限（含主商品）
+    "keep_days": 5,            # 其他商品保留的交易日數（每日清理）
+}
+
+# =============================================================================
+# 多週期彙總設定（1 分 K 為唯一來源，彙總為各週期資料表）
+# =============================================================================
+RESOLUTION_CONFIG = {
+    "enabled": False,
+    "base": "1",                   # 抓取 / 儲存的最細週期（分鐘）
+    "rollups": ["5", "15", "60"],  # 彙總週期（各自寫入 ohlcv_{N}m；5 分為 ohlcv_5m，不與 ohlcv_data 共用）
+    "poll_limit": 30,              # 每分鐘輪詢抓取的基礎 K 棒數
+    "trigger_offset": 1.0,         # 基礎週期邊界後幾秒輪詢
+    "feature_tail_bars": 200,      # 各週期增量特徵計算使用的尾端 K 棒數
+}
+
+# =============================================================================
+# 回放模擬設定
+# =============================================================================
+REPLAY_CONFIG = {
+    "speed": 1000,              # 虛擬時鐘倍速（等待 / 輪詢的實際耗時 = 虛擬秒 / speed）
+    "publish_delay": 1.0,       # 替身 API 在 K 棒開始後幾秒才提供該 K 棒（虛擬秒）
+    "warmup_bars": 200,         # 回放前保留作為歷史的 K 棒數
+    "idle_skip_seconds": 600,   # 超過此虛擬秒數的空檔（休市）直接跳過不等待
+    "parity_tolerance": 1e-4,   # 與批次回測的機率容許誤差
+}
+
+# =============================================================================
+# 本機 API 替身伺服器設定
+# =============================================================================
+CHART_SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "path": "/ws/api/v1/charting/history",
+    "latency": 0.0,             # 每次回應的固定延遲（秒）
+    "jitter": 0.0,              # 額外隨機延遲上限（秒）
+    "error_rate": 0.0,          # 隨機回傳 HTTP 500 / 429 的比例
+    "partial_bars": True,       # 形成中的 K 棒只提供已經過時間比例的量價
+}
+
+# =============================================================================
+# 效能量測設定
+# =============================================================================
+METRICS_CONFIG = {
+    "enabled": True,
+    "textfile": os.path.join(DATABASE_DIR, "metrics.prom"),  # Prometheus textfile（None 不寫檔）
+    "write_interval": 15,       # 寫檔間隔（秒）
+    "http_port": None,          # 設定埠號則提供 HTTP /metrics
+}
+
+# =============================================================================
+# 精簡記憶體模式（回測 / 門檻掃描讀取長期資料時使用）
+# =============================================================================
+COMPACT_CONFIG = {
+    "enabled": False,           # True 時 backtester / sweep_thresholds 預設使用 CompactBars
+    "fetch_chunk": 20000,       # load_compact 每批 fetchmany 筆數
+}
+
+# =============================================================================
+# 歷史 CSV 匯入設定
+# =============================================================================
+IMPORT_CONFIG = {
+    "chunksize": 50000,         # 每批讀取 / 計算 / 寫入的列數
+    "warmup_multiplier": 10,    # 批次間保留 lookback × 此倍數根作暖機（遞迴平滑的殘差 < 1e-12）
+    "sniff_bytes": 65536,       # 判斷編碼時讀取的位元組數
+}
+
+# =============================================================================
+# API 分頁回補設定（backfill_history.py）
+# =============================================================================
+BACKFILL_CONFIG = {
+    "page_limit": 1000,         # 每頁 K 棒數（API 單次上限）
+    "rate_limit": 1.0,          # 每秒請求數上限
+    "max_retries": 3,           # 單頁抓取失敗（空回應）重試次數
+    "retry_backoff": 2.0,       # 重試退避基數（秒），2s → 4s → 8s
+    "feature_chunk_days": 20,   # 回補後分批計算特徵的交易日數
+}
+
+# =============================================================================
+# 模型熱更新設定（輪詢模型檔，驗證通過後整組替換，不需重啟服務）
+# =============================================================================
+MODEL_RELOAD_CONFIG = {
+    "enabled": True,
+    "poll_interval": 30,        # 檢查模型檔 mtime / 大小的間隔（秒）；連續兩次相同才載入
+    "canary_rows": 200,         # 驗證新模型用的最近 K 棒數
+}
+
+# =============================================================================
+# 預測重算設定（模型組指紋變更後，背景重算已存 K 棒的預測）
+# =============================================================================
+RESCORE_CONFIG = {
+    "enabled": True,
+    "batch_size": 500,          # 每批評分的 K 棒數
+    "time_budget": 2.0,         # 每輪最多佔用排程執行緒的秒數，超過則留到下一輪
+    "interval": 300,            # 執行間隔（秒）
+    "offset": 150,              # 觸發偏移：落在 5 分 K 中段，避開收盤管線
+}
+
+# =============================================================================
+# 唯讀副本設定（寫入端 run_worker.py 發佈快照，UI 只讀副本）
+# =============================================================================
+REPLICA_CONFIG = {
+    "enabled": False,           # True 時 app.py 只開啟副本（唯讀），排程 / 通知 / 寫入交給 run_worker.py
+    "path": os.path.join(DATABASE_DIR, "tx_data_replica.db"),
+    "publish_interval": 30,     # 發佈間隔（秒），主檔未變動時略過
 }
 
 # =============================================================================
@@ -10,6 +10,7 @@ from .feature_calculator import FeatureCalculator
 from .model_loader import ModelLoader
 from .signal_predictor import SignalPredictor
 from .scheduler import DataScheduler
+from .job_scheduler import JobScheduler
 
 __all__ = [
     "DBManager",
@@ -18,4 +19,5 @@ __all__ = [
     "ModelLoader",
     "SignalPredictor",
     "DataScheduler",
+    "JobScheduler",
 ]
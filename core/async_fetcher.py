@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+非同步資料抓取模組
+同時送出多個 charting 查詢（不同 to 視窗 / 商品 / 週期），以 semaphore 限制並行數：
+
+  歷史區間 → 由 end 往回切成 limit 根一頁的 to 視窗 → 並行抓取 → 合併去重
+  多商品    → 各商品同時抓最新 limit 根
+
+安裝 httpx 時使用 httpx.AsyncClient（單一連線池）；
+未安裝則以執行緒執行既有的 requests 抓取，行為相同只是連線不共用
+
+既有同步呼叫端使用 fetch_range() / fetch_symbols() 即可，不需處理事件迴圈
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import pandas as pd
+import os
+import sys
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import API_CONFIG
+from core.data_fetcher import DataFetcher
+from core.metrics import METRICS
+
+
+def run_sync(coro):
+    """在同步程式中執行 coroutine；呼叫端已在事件迴圈內時改用獨立執行緒"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def stitch_pages(pages: List[pd.DataFrame]) -> pd.DataFrame:
+    """合併多頁 K 棒：依 timestamp 去重（保留較新的一頁）並排序"""
+    pages = [p for p in pages if not p.empty]
+    if not pages:
+        return pd.DataFrame()
+    combined = pd.concat(pages, ignore_index=True)
+    combined = combined.drop_duplicates(subset=['timestamp'], keep='first')
+    return combined.sort_values('timestamp').reset_index(drop=True)
+
+
+class AsyncDataFetcher:
+    """鉅亨網 API 並行抓取器"""
+    
+    def __init__(self, base_url: Optional[str] = None, symbol: Optional[str] = None,
+                 resolution: Optional[str] = None, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            base_url / symbol / resolution: 同 DataFetcher
+            max_concurrency: 同時進行的請求數上限，預設 API_CONFIG['max_concurrency']
+        """
+        self.fetcher = DataFetcher(base_url, symbol, resolution)
+        self.max_concurrency = max_concurrency or API_CONFIG['max_concurrency']
+    
+    @classmethod
+    def from_fetcher(cls, fetcher: DataFetcher, max_concurrency: Optional[int] = None) -> 'AsyncDataFetcher':
+        """沿用既有 DataFetcher 的 API 位址 / 商品 / 週期"""
+        return cls(fetcher.base_url, fetcher.symbol, fetcher.resolution, max_concurrency)
+    
+    @property
+    def bar_seconds(self) -> int:
+        resolution = str(self.fetcher.resolution)
+        return int(resolution) * 60 if resolution.isdigit() else 86400
+    
+    # =========================================================================
+    # 單一請求
+    # =========================================================================
+    
+    async def _fetch(self, client, semaphore: asyncio.Semaphore, to_ts: int,
+                     limit: Optional[int] = None) -> pd.DataFrame:
+        """抓取 to_ts 之前最後 limit 根；失敗時回傳空表（與 DataFetcher.fetch_raw 相同）"""
+        f = self.fetcher
+        async with semaphore:
+            if client is None:
+                return await asyncio.to_thread(f.fetch_raw, limit, to_ts)
+            
+            params = {
+                "symbol": f.symbol,
+                "resolution": f.resolution,
+                "to": int(to_ts),
+                "limit": limit or f.limit,
+            }
+            try:
+                with METRICS.timer('fetch_raw_async'):
+                    res = await client.get(f.base_url, params=params, headers=f.headers)
+                if res.status_code != 200:
+                    print(f"API 回應錯誤: HTTP {res.status_code}")
+                    METRICS.inc('api_errors', reason=f"http_{res.status_code}")
+                    return pd.DataFrame()
+                return f._parse_response(f._decode(res.content).get('data', {}))
+            except httpx.TimeoutException:
+                print("API 連線逾時")
+                METRICS.inc('api_errors', reason='timeout')
+            except httpx.TransportError:
+                print("API 連線失敗")
+                METRICS.inc('api_errors', reason='connection')
+            except Exception as e:
+                print(f"鉅亨網連線錯誤: {e}")
+                METRICS.inc('api_errors', reason='other')
+            return pd.DataFrame()
+    
+    def _client(self):
+        if httpx is None:
+            return None
+        return httpx.AsyncClient(
+            timeout=self.fetcher.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+        )
+    
+    async def _gather(self, calls) -> list:
+        """calls: [(AsyncDataFetcher, to_ts, limit)]，共用一個連線池與 semaphore"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        client = self._client()
+        try:
+            return await asyncio.gather(*(fetcher._fetch(client, semaphore, to_ts, limit)
+                                          for fetcher, to_ts, limit in calls))
+        finally:
+            if client is not None:
+                await client.aclose()
+    
+    # =========================================================================
+    # 非同步介面
+    # =========================================================================
+    
+    async def fetch_windows_async(self, to_list: List[int], limit: Optional[int] = None) -> pd.DataFrame:
+        """並行抓取多個 to 視窗並合併去重"""
+        pages = await self._gather([(self, to_ts, limit) for to_ts in to_list])
+        return stitch_pages(pages)
+    
+    async def fetch_range_async(self, start_ts: int, end_ts: Optional[int] = None,
+                                limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        抓取 [start_ts, end_ts] 之間的 K 棒（UTC epoch 秒）
+        
+        每頁 limit 根至少涵蓋 limit × 週期 秒，視窗以此間隔往回切，
+        休市時段只會讓相鄰頁重疊（合併時去重），不會漏資料
+        """
+        end_ts = int(end_ts or datetime.now().timestamp())
+        limit = limit or self.fetcher.limit
+        step = limit * self.bar_seconds
+        windows = list(range(end_ts, int(start_ts) - 1, -step)) or [end_ts]
+        
+        df = await self.fetch_windows_async(windows, limit)
+        if df.empty:
+            return df
+        return df[df['timestamp'] >= start_ts].reset_index(drop=True)
+    
+    async def fetch_symbols_async(self, symbols: List[str], limit: Optional[int] = None,
+                                  to_ts: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """各商品同時抓取最新 limit 根"""
+        to_ts = int(to_ts or datetime.now().timestamp())
+        fetchers = [AsyncDataFetcher(self.fetcher.base_url, s, self.fetcher.resolution,
+                                     self.max_concurrency) for s in symbols]
+        pages = await self._gather([(f, to_ts, limit) for f in fetchers])
+        return dict(zip(symbols, pages))
+    
+    # =========================================================================
+    # 同步包裝（既有呼叫端使用）
+    # =========================================================================
+    
+    def fetch_windows(self, to_list: List[int], limit: Optional[int] = None) -> pd.DataFrame:
+        return run_sync(self.fetch_windows_async(to_list, limit))
+    
+    def fetch_range(self, start_ts: int, end_ts: Optional[int] = None,
+                    limit: Optional[int] = None) -> pd.DataFrame:
+        return run_sync(self.fetch_range_async(start_ts, end_ts, limit))
+    
+    def fetch_symbols(self, symbols: List[str], limit: Optional[int] = None,
+                      to_ts: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        return run_sync(self.fetch_symbols_async(symbols, limit, to_ts))
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+回測模組
+以已存的 OHLCV + 17 特徵批次評分，向量化模擬各門檻的進出場，
+重新計算 config.THRESHOLDS 註解中的勝率 / RECALL
+
+交易規則（當沖）：
+  進場: 空手時 entry 機率 > 進場門檻，以該 K 棒收盤價進場
+  出場: 之後第一根 exit 機率 > 出場門檻 / 持有滿 max_hold_bars / 該盤最後一根，取最早者
+  PnL : 方向 × (出場收盤 - 進場收盤) - 來回成本
+  勝率: PnL > 0 的交易比例
+  RECALL: 「機會」K 棒中有進場訊號的比例；
+          機會 = 之後 horizon_bars 內（同一盤）最大順向波動 >= target_points
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import BACKTEST_CONFIG, THRESHOLDS, FEATURE_NAMES, COMPACT_CONFIG
+from core.compact import CompactBars
+
+
+# 方向 → (進場目標, 出場目標, 正負號)
+DIRECTIONS = {
+    'long': ('long_entry', 'long_exit', 1),
+    'short': ('short_entry', 'short_exit', -1),
+}
+
+
+# =============================================================================
+# 向量化基礎運算（純 numpy，可供平行掃描共用）
+# =============================================================================
+
+def session_end_index(datetimes: np.ndarray, gap_minutes: float) -> np.ndarray:
+    """每列所屬盤別的最後一列索引（相鄰間隔超過 gap_minutes 即換盤）"""
+    n = len(datetimes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    dt = np.asarray(datetimes, dtype='datetime64[s]').astype(np.int64)
+    is_last = np.ones(n, dtype=bool)
+    is_last[:-1] = np.diff(dt) > gap_minutes * 60
+    last_idx = np.where(is_last, np.arange(n), n)
+    # 反向累積最小值 → 自己或之後最近的盤尾
+    return np.minimum.accumulate(last_idx[::-1])[::-1]
+
+
+def opportunity_mask(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                     session_end: np.ndarray, horizon: int, target: float,
+                     direction: int) -> np.ndarray:
+    """前瞻 horizon 根（同一盤）內最大順向波動 >= target 的 K 棒"""
+    n = len(close)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    ref = high if direction > 0 else -low
+    padded = np.concatenate([ref[1:], np.full(horizon, -np.inf)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, horizon)[:n]
+    future_idx = np.arange(n)[:, None] + 1 + np.arange(horizon)[None, :]
+    windows = np.where(future_idx <= session_end[:, None], windows, -np.inf)
+    best = windows.max(axis=1)
+    return (best - direction * close) >= target
+
+
+def next_true_index(mask: np.ndarray) -> np.ndarray:
+    """每列之後（不含自己）第一個 True 的索引，無則為 n"""
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    from_here = np.minimum.accumulate(idx[::-1])[::-1]
+    return np.append(from_here[1:], n)
+
+
+def simulate(close: np.ndarray, session_end: np.ndarray,
+             entry_prob: np.ndarray, exit_prob: np.ndarray, direction: int,
+             entry_th: float, exit_th: float, max_hold: int,
+             cost: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    模擬單一方向、單一門檻組合的交易
+    
+    Returns:
+        {'entry_idx', 'exit_idx', 'pnl'}（依進場時間排序）
+    """
+    n = len(close)
+    entry_sig = np.nan_to_num(entry_prob, nan=0.0) > entry_th
+    exit_sig = np.nan_to_num(exit_prob, nan=0.0) > exit_th
+    
+    exit_idx = np.minimum(next_true_index(exit_sig), np.arange(n) + max_hold)
+    exit_idx = np.minimum(exit_idx, session_end)
+    candidates = np.flatnonzero(entry_sig & (exit_idx > np.arange(n)))
+    
+    # 持單期間不重複進場：依序跳到上一筆出場後的第一個候選
+    entries = []
+    pos = 0
+    while True:
+        k = np.searchsorted(candidates, pos)
+        if k >= len(candidates):
+            break
+        i = candidates[k]
+        entries.append(i)
+        pos = exit_idx[i] + 1
+    
+    entries = np.asarray(entries, dtype=np.int64)
+    exits = exit_idx[entries]
+    pnl = direction * (close[exits] - close[entries]) - cost
+    return {'entry_idx': entries, 'exit_idx': exits, 'pnl': pnl}
+
+
+def summarize(pnl: np.ndarray, entry_sig: np.ndarray, opportunity: np.ndarray) -> dict:
+    """彙總交易統計"""
+    trades = len(pnl)
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:]
+    n_opp = int(opportunity.sum())
+    return {
+        'trades': trades,
+        'wins': int((pnl > 0).sum()),
+        'win_rate': float((pnl > 0).mean()) if trades else 0.0,
+        'signals': int(entry_sig.sum()),
+        'recall': float((entry_sig & opportunity).sum() / n_opp) if n_opp else 0.0,
+        'total_pnl': float(pnl.sum()),
+        'avg_pnl': float(pnl.mean()) if trades else 0.0,
+        'max_drawdown': float((peak - equity).max()) if trades else 0.0,
+    }
+
+
+# =============================================================================
+# 回測器
+# =============================================================================
+
+class Backtester:
+    """歷史資料向量化回測器"""
+    
+    def __init__(self, signal_predictor=None, config: dict = None,
+                 thresholds: dict = None):
+        """
+        Args:
+            signal_predictor: 已載入模型的 SignalPredictor（僅 score 需要）
+            config: 覆寫 BACKTEST_CONFIG 的參數
+            thresholds: 覆寫 THRESHOLDS
+        """
+        self.predictor = signal_predictor
+        self.config = {**BACKTEST_CONFIG, **(config or {})}
+        self.thresholds = thresholds or THRESHOLDS
+    
+    @staticmethod
+    def feature_matrix(df) -> np.ndarray:
+        """評分用的 float32 特徵矩陣（df 可為 DataFrame 或 CompactBars）"""
+        if isinstance(df, CompactBars):
+            return df.features
+        return df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    
+    def score(self, df) -> Dict[str, np.ndarray]:
+        """以 20 個模型批次評分，回傳 {target: 機率陣列}（df 可為 DataFrame 或 CompactBars）"""
+        features = self.feature_matrix(df)
+        return {
+            target: self.predictor.predict_batch(features, target)
+            for pair in DIRECTIONS.values() for target in pair[:2]
+        }
+    
+    def prepare_market(self, df) -> Dict[str, np.ndarray]:
+        """整理回測所需的價格陣列、盤尾索引與機會標記"""
+        cfg = self.config
+        close = np.asarray(df['close'], dtype=np.float64)
+        high = np.asarray(df['high'], dtype=np.float64)
+        low = np.asarray(df['low'], dtype=np.float64)
+        session_end = session_end_index(np.asarray(df['datetime']), cfg['session_gap_minutes'])
+        market = {'close': close, 'session_end': session_end}
+        for name, (_, _, sign) in DIRECTIONS.items():
+            market[f'{name}_opportunity'] = opportunity_mask(
+                close, high, low, session_end,
+                cfg['horizon_bars'], cfg['target_points'], sign)
+        return market
+    
+    def run(self, df,
+            probs: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+        """
+        執行回測
+        
+        Args:
+            df: 依時間排序、含 OHLCV + 17 特徵的 DataFrame 或 CompactBars
+            probs: 已計算的機率（未提供則呼叫 score）
+        
+        Returns:
+            各方向 × 進場門檻的績效表
+        """
+        if not isinstance(df, CompactBars):
+            df = df.reset_index(drop=True)
+        if probs is None:
+            probs = self.score(df)
+        market = self.prepare_market(df)
+        exit_th = self.thresholds['exit']['level_1']
+        
+        rows = []
+        for name, (entry_t, exit_t, sign) in DIRECTIONS.items():
+            for level, entry_th in sorted(self.thresholds['entry'].items()):
+                trades = simulate(
+                    market['close'], market['session_end'],
+                    probs[entry_t], probs[exit_t], sign,
+                    entry_th, exit_th,
+                    self.config['max_hold_bars'], self.config['cost_points'])
+                entry_sig = np.nan_to_num(probs[entry_t], nan=0.0) > entry_th
+                stats = summarize(trades['pnl'], entry_sig, market[f'{name}_opportunity'])
+                rows.append({'direction': name, 'level': level,
+                             'entry_th': entry_th, 'exit_th': exit_th, **stats})
+        return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from core.db_manager import DBManager
+    from core.model_loader import ModelLoader
+    from core.signal_predictor import SignalPredictor
+    
+    db = DBManager()
+    if COMPACT_CONFIG['enabled']:
+        data = db.load_compact().dropna_features()
+    else:
+        data = db.load_ohlcv(include_features=True).dropna(subset=FEATURE_NAMES)
+    print(f"回測資料: {len(data)} 筆")
+    if data.empty:
+        sys.exit(0)
+    
+    loader = ModelLoader()
+    loader.load_all()
+    bt = Backtester(SignalPredictor(loader))
+    
+    t0 = time.time()
+    scored = bt.score(data)
+    t1 = time.time()
+    report = bt.run(data, scored)
+    t2 = time.time()
+    
+    pd.set_option('display.width', 200)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"\n評分 {t1 - t0:.2f}s / 模擬 {t2 - t1:.3f}s")
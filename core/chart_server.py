@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+鉅亨網 charting API 本機替身
+以歷史 K 棒提供與正式 API 相同的 {data: {t,o,h,l,c,v}} 格式，
+供離線的回放、壓力測試使用（API_CONFIG['base_url'] 指向此伺服器即可）
+
+支援：
+  to / limit / resolution 查詢參數（resolution 為基礎週期的整數倍，或 D）
+  固定 + 隨機延遲、隨機 HTTP 500 / 429、形成中 K 棒的部分量價
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import CHART_SERVER_CONFIG
+
+
+# K 棒 datetime 為台灣時間（UTC+8），API 的 t 為 UTC epoch
+TW_OFFSET = 8 * 3600
+
+
+def wall_to_epoch(dt: datetime) -> int:
+    """台灣時間（naive）→ UTC epoch 秒"""
+    return int((dt - datetime(1970, 1, 1)).total_seconds()) - TW_OFFSET
+
+
+class ArchiveChartSource:
+    """charting history 查詢邏輯（資料來自歷史 K 棒，與傳輸方式無關）"""
+    
+    def __init__(self, bars: pd.DataFrame, publish_delay: float = 1.0,
+                 partial_bars: bool = False):
+        """
+        Args:
+            bars: 含 datetime(台灣時間) / open / high / low / close / volume 的 K 棒
+            publish_delay: K 棒開始後幾秒才出現在 API
+            partial_bars: 形成中的 K 棒是否只提供已經過時間比例的量價
+        """
+        bars = bars.sort_values('datetime').drop_duplicates(subset=['datetime'])
+        wall = bars['datetime'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        self.t = wall - TW_OFFSET
+        self.o = bars['open'].to_numpy(dtype=np.float64)
+        self.h = bars['high'].to_numpy(dtype=np.float64)
+        self.l = bars['low'].to_numpy(dtype=np.float64)
+        self.c = bars['close'].to_numpy(dtype=np.float64)
+        self.v = bars['volume'].to_numpy(dtype=np.float64)
+        self.bar_seconds = int(np.median(np.diff(self.t))) if len(self.t) > 1 else 300
+        self.publish_delay = publish_delay
+        self.partial_bars = partial_bars
+        self.requests = 0
+        
+        # resolution → 每個聚合 K 棒在基礎陣列中的起始索引
+        self._bucket_starts = {}
+        self._bucket_lock = threading.Lock()
+    
+    def _get_bucket_starts(self, resolution: str) -> Optional[np.ndarray]:
+        """取得聚合週期的分組起點；不支援的週期回傳 None"""
+        with self._bucket_lock:
+            if resolution in self._bucket_starts:
+                return self._bucket_starts[resolution]
+            
+            if resolution.upper() == 'D':
+                # 以台灣日期分組
+                keys = (self.t + TW_OFFSET) // 86400
+            else:
+                try:
+                    seconds = int(resolution) * 60
+                except ValueError:
+                    return None
+                if seconds < self.bar_seconds or seconds % self.bar_seconds:
+                    return None
+                keys = (self.t + TW_OFFSET) // seconds
+            
+            changed = np.ones(len(keys), dtype=bool)
+            changed[1:] = keys[1:] != keys[:-1]
+            starts = np.flatnonzero(changed)
+            self._bucket_starts[resolution] = starts
+            return starts
+    
+    def history(self, to: int, limit: int, resolution: Optional[str] = None) -> Optional[dict]:
+        """
+        回傳 to 時間點已出現的最後 limit 根 K 棒（API 的 data 欄位格式）
+        
+        正在形成的 K 棒在開始後 publish_delay 秒即會出現，與正式 API 相同
+        
+        Returns:
+            data 字典，resolution 不支援時為 None
+        """
+        self.requests += 1
+        resolution = str(resolution or self.bar_seconds // 60)
+        starts = self._get_bucket_starts(resolution)
+        if starts is None:
+            return None
+        
+        end = int(np.searchsorted(self.t, to - self.publish_delay, side='right'))
+        k = int(np.searchsorted(starts, end, side='left'))
+        first = starts[max(k - int(limit), 0)] if k else end
+        
+        o = self.o[first:end]
+        h = self.h[first:end]
+        l = self.l[first:end]
+        c = self.c[first:end]
+        v = self.v[first:end]
+        
+        # 形成中的 K 棒：依經過時間比例縮放
+        if self.partial_bars and end > first:
+            elapsed = to - self.t[end - 1]
+            if elapsed < self.bar_seconds:
+                frac = max(elapsed, 0) / self.bar_seconds
+                h, l, c, v = h.copy(), l.copy(), c.copy(), v.copy()
+                c[-1] = round(o[-1] + (c[-1] - o[-1]) * frac)
+                h[-1] = max(o[-1], c[-1], o[-1] + (h[-1] - o[-1]) * frac)
+                l[-1] = min(o[-1], c[-1], o[-1] - (o[-1] - l[-1]) * frac)
+                v[-1] = np.floor(v[-1] * frac)
+        
+        if len(o) == 0:
+            t_out = o
+        elif resolution == str(self.bar_seconds // 60):
+            t_out = self.t[first:end]
+        else:
+            idx = starts[max(k - int(limit), 0):k] - first
+            t_out = self.t[first:end][idx]
+            o = o[idx]
+            h = np.maximum.reduceat(h, idx)
+            l = np.minimum.reduceat(l, idx)
+            c = c[np.append(idx[1:], len(c)) - 1]
+            v = np.add.reduceat(v, idx)
+        
+        return {
+            's': 'ok',
+            't': t_out.tolist(),
+            'o': o.tolist(),
+            'h': h.tolist(),
+            'l': l.tolist(),
+            'c': c.tolist(),
+            'v': v.tolist(),
+        }
+
+
+class _ChartHandler(BaseHTTPRequestHandler):
+    """HTTP 請求處理（設定由 server 物件提供）"""
+    
+    protocol_version = "HTTP/1.1"
+    # keep-alive 下標頭與內容分開寫出，關閉 Nagle 以免每次多等 40ms 的延遲 ACK
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        server = self.server.chart_server
+        url = urlparse(self.path)
+        if url.path != server.path:
+            self._reply(404, {'statusCode': 404, 'message': 'not found'})
+            return
+        
+        server.count('requests')
+        delay = server.latency + (random.random() * server.jitter if server.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        
+        if server.error_rate and random.random() < server.error_rate:
+            server.count('errors')
+            status = random.choice((429, 500))
+            self._reply(status, {'statusCode': status, 'message': 'injected error'})
+            return
+        
+        query = parse_qs(url.query)
+        try:
+            to = int(query['to'][0]) if 'to' in query else int(time.time())
+            limit = int(query['limit'][0]) if 'limit' in query else 1000
+        except ValueError:
+            self._reply(400, {'statusCode': 400, 'message': 'invalid parameter'})
+            return
+        resolution = query.get('resolution', [None])[0]
+        
+        data = server.source.history(to, limit, resolution)
+        if data is None:
+            self._reply(400, {'statusCode': 400, 'message': f'unsupported resolution: {resolution}'})
+            return
+        self._reply(200, {'statusCode': 200, 'message': 'OK', 'data': data})
+    
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        # 高頻請求下不逐筆輸出
+        pass
+
+
+class ChartServer:
+    """本機 charting API 替身伺服器（每個連線一個執行緒）"""
+    
+    def __init__(self, source: ArchiveChartSource, config: dict = None):
+        """
+        Args:
+            source: 提供資料的 ArchiveChartSource
+            config: 覆寫 CHART_SERVER_CONFIG 的參數（port=0 表示自動選擇）
+        """
+        cfg = {**CHART_SERVER_CONFIG, **(config or {})}
+        self.source = source
+        self.host = cfg['host']
+        self.port = cfg['port']
+        self.path = cfg['path']
+        self.latency = cfg['latency']
+        self.jitter = cfg['jitter']
+        self.error_rate = cfg['error_rate']
+        
+        self.stats = {'requests': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
+    
+    def count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def start(self):
+        """在背景執行緒啟動伺服器"""
+        if self._httpd is not None:
+            return
+        httpd = ThreadingHTTPServer((self.host, self.port), _ChartHandler)
+        httpd.daemon_threads = True
+        httpd.request_queue_size = 128
+        httpd.chart_server = self
+        self.port = httpd.server_address[1]
+        self._httpd = httpd
+        self._thread = threading.Thread(target=httpd.serve_forever,
+                                        name="chart-server", daemon=True)
+        self._thread.start()
+        print(f"[替身API] 啟動: {self.url}")
+    
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        self._thread = None
+        print(f"[替身API] 已停止（請求 {self.stats['requests']} 次，注入錯誤 {self.stats['errors']} 次）")
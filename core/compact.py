@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+精簡記憶體表示（compact mode，選用）
+長期歸檔回測 / 掃描時，以 numpy 陣列取代 float64 DataFrame：
+  價格: int32（台指期為整數點；有小數時退回 float32）
+  成交量: int32
+  時間: timestamp int64 + datetime64[s]
+  特徵: 連續 float32 (n, 17) 陣列，與 XGBoost 內部精度相同，
+        直接交給 DMatrix，不需每次評分再轉型複製
+
+特徵仍以 float64 計算（見 core/parity.py 的 golden 檢查），只在存放 / 評分時降為 float32
+"""
+
+from typing import Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FEATURE_NAMES
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def price_dtype(*columns: np.ndarray) -> type:
+    """價格全為整數且在 int32 範圍內 → int32，否則 float32"""
+    for values in columns:
+        values = np.asarray(values)
+        if values.size == 0:
+            continue
+        if np.issubdtype(values.dtype, np.integer):
+            if np.abs(values).max() > INT32_MAX:
+                return np.float32
+            continue
+        if not np.isfinite(values).all() or (values != np.round(values)).any():
+            return np.float32
+        if np.abs(values).max() > INT32_MAX:
+            return np.float32
+    return np.int32
+
+
+class CompactBars:
+    """
+    K 棒 + 特徵的欄式精簡容器
+    
+    以 bars['close']、bars['datetime'] 取得欄位陣列；bars.features 為 (n, 17) float32
+    """
+    
+    def __init__(self, timestamp: np.ndarray, datetime: np.ndarray,
+                 open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray,
+                 features: Optional[np.ndarray] = None):
+        n = len(timestamp)
+        dtype = price_dtype(open, high, low, close)
+        self.timestamp = np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.datetime = np.asarray(datetime, dtype='datetime64[s]')
+        self.open = np.ascontiguousarray(open, dtype=dtype)
+        self.high = np.ascontiguousarray(high, dtype=dtype)
+        self.low = np.ascontiguousarray(low, dtype=dtype)
+        self.close = np.ascontiguousarray(close, dtype=dtype)
+        self.volume = np.ascontiguousarray(volume, dtype=np.int32)
+        if features is not None:
+            features = np.ascontiguousarray(features, dtype=np.float32)
+            if features.shape != (n, len(FEATURE_NAMES)):
+                raise ValueError(f"特徵陣列形狀應為 ({n}, {len(FEATURE_NAMES)})，收到 {features.shape}")
+        self.features = features
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'CompactBars':
+        """由 DataFrame 轉換（含全部 17 特徵欄時一併轉為 float32 陣列）"""
+        features = None
+        if all(f in df.columns for f in FEATURE_NAMES):
+            features = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+        return cls(
+            df['timestamp'].to_numpy(), pd.to_datetime(df['datetime']).to_numpy(),
+            *(df[c].to_numpy() for c in PRICE_COLUMNS),
+            df['volume'].to_numpy(), features)
+    
+    def to_dataframe(self) -> pd.DataFrame:
+        """轉回 DataFrame（價格 float64，與 load_ohlcv 欄位一致）"""
+        df = pd.DataFrame({
+            'timestamp': self.timestamp,
+            'datetime': pd.to_datetime(self.datetime),
+            **{c: getattr(self, c).astype(np.float64) for c in PRICE_COLUMNS},
+            'volume': self.volume.astype(np.int64),
+        })
+        if self.features is not None:
+            for i, name in enumerate(FEATURE_NAMES):
+                df[name] = self.features[:, i].astype(np.float64)
+        return df
+    
+    def __len__(self) -> int:
+        return len(self.timestamp)
+    
+    def __getitem__(self, column: str) -> np.ndarray:
+        if column in FEATURE_NAMES:
+            if self.features is None:
+                raise KeyError(column)
+            return self.features[:, FEATURE_NAMES.index(column)]
+        if column not in ('timestamp', 'datetime', 'volume') + PRICE_COLUMNS:
+            raise KeyError(column)
+        return getattr(self, column)
+    
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+    
+    def take(self, rows) -> 'CompactBars':
+        """依布林遮罩 / 索引 / slice 取子集（特徵陣列保持連續）"""
+        return CompactBars(
+            self.timestamp[rows], self.datetime[rows],
+            *(getattr(self, c)[rows] for c in PRICE_COLUMNS),
+            self.volume[rows],
+            None if self.features is None else self.features[rows])
+    
+    def valid_mask(self) -> np.ndarray:
+        """特徵完整（無 NaN）的列"""
+        if self.features is None:
+            return np.zeros(len(self), dtype=bool)
+        return ~np.isnan(self.features).any(axis=1)
+    
+    def dropna_features(self) -> 'CompactBars':
+        """去除特徵含 NaN 的列（等同 df.dropna(subset=FEATURE_NAMES)）"""
+        mask = self.valid_mask()
+        return self if mask.all() else self.take(mask)
+    
+    @property
+    def nbytes(self) -> int:
+        """陣列實際佔用位元組"""
+        arrays = [self.timestamp, self.datetime, self.volume] + [getattr(self, c) for c in PRICE_COLUMNS]
+        if self.features is not None:
+            arrays.append(self.features)
+        return sum(a.nbytes for a in arrays)
@@ -2,45 +2,76 @@
 """
 資料抓取模組
 負責從鉅亨網 API 抓取台指期即時資料
+
+回應解析：JSON 陣列直接轉為具型別的 numpy 陣列（有安裝 orjson 時以其解碼），
+時區以 int64 秒數加減處理，已排序時不再排序
 """
 
+import json
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Optional
 import os
 import sys
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import API_CONFIG
+from core.metrics import METRICS, timed
+
+# K 棒 datetime 為台灣時間（UTC+8），API 的 t 為 UTC epoch
+TW_OFFSET = 8 * 3600
 
 
 class DataFetcher:
     """鉅亨網 API 資料抓取器"""
     
-    def __init__(self):
-        """初始化資料抓取器"""
-        self.symbol = API_CONFIG['symbol']
-        self.base_url = API_CONFIG['base_url']
-        self.resolution = API_CONFIG['resolution']
+    def __init__(self, base_url: Optional[str] = None, symbol: Optional[str] = None,
+                 resolution: Optional[str] = None):
+        """
+        初始化資料抓取器
+        
+        Args:
+            base_url: 覆寫 API_CONFIG['base_url']（例如本機替身伺服器）
+            symbol: 商品代碼，預設 API_CONFIG['symbol']
+            resolution: K 棒週期（分鐘），預設 API_CONFIG['resolution']
+        """
+        self.symbol = symbol or API_CONFIG['symbol']
+        self.base_url = base_url or API_CONFIG['base_url']
+        self.resolution = str(resolution or API_CONFIG['resolution'])
         self.limit = API_CONFIG['limit']
         self.timeout = API_CONFIG['timeout']
-        self.headers = API_CONFIG['headers']
+        self.headers = dict(API_CONFIG['headers'])
+        self.headers['Referer'] = f"https://stock.cnyes.com/market/{self.symbol}"
     
-    def fetch_raw(self) -> pd.DataFrame:
+    @timed('fetch_raw')
+    def fetch_raw(self, limit: Optional[int] = None,
+                  to_ts: Optional[int] = None) -> pd.DataFrame:
         """
         從鉅亨網 API 抓取原始 OHLCV 資料
         
+        Args:
+            limit: 筆數上限，預設為 API_CONFIG['limit']（輪詢新 K 棒時只需少量）
+            to_ts: 查詢截止時間 (UTC epoch 秒)，預設為現在
+        
         Returns:
             包含 OHLCV 資料的 DataFrame
         """
-        to_ts = int(datetime.now().timestamp())
+        if to_ts is None:
+            to_ts = int(datetime.now().timestamp())
         params = {
             "symbol": self.symbol,
             "resolution": self.resolution,
             "to": to_ts,
-            "limit": self.limit
+            "limit": limit or self.limit
         }
         
         try:
@@ -52,22 +83,32 @@ class DataFetcher:
             )
             
             if res.status_code == 200:
-                data = res.json().get('data', {})
+                data = self._decode(res.content).get('data', {})
                 return self._parse_response(data)
             else:
                 print(f"API 回應錯誤: HTTP {res.status_code}")
+                METRICS.inc('api_errors', reason=f"http_{res.status_code}")
                 return pd.DataFrame()
-                
+        
         except requests.exceptions.Timeout:
             print("API 連線逾時")
+            METRICS.inc('api_errors', reason='timeout')
             return pd.DataFrame()
         except requests.exceptions.ConnectionError:
             print("API 連線失敗")
+            METRICS.inc('api_errors', reason='connection')
             return pd.DataFrame()
         except Exception as e:
             print(f"鉅亨網連線錯誤: {e}")
+            METRICS.inc('api_errors', reason='other')
             return pd.DataFrame()
     
+    @staticmethod
+    def _decode(content: bytes) -> dict:
+        """解碼 API 回應（orjson 可用時直接由 bytes 解析）"""
+        return _json_loads(content)
+    
+    @timed('parse_response')
     def _parse_response(self, data: dict) -> pd.DataFrame:
         """
         解析 API 回應資料
@@ -84,34 +125,28 @@ class DataFetcher:
         try:
             # 鉅亨網 API 回傳格式
             timestamps = data.get('t', [])
-            opens = data.get('o', [])
-            highs = data.get('h', [])
-            lows = data.get('l', [])
-            closes = data.get('c', [])
-            volumes = data.get('v', [])
-            
             if not timestamps:
                 return pd.DataFrame()
             
-            df = pd.DataFrame({
-                'timestamp': timestamps,
-                'open': opens,
-                'high': highs,
-                'low': lows,
-                'close': closes,
-                'volume': volumes
-            })
+            t = np.asarray(timestamps, dtype=np.int64)
+            columns = {'timestamp': t}
+            for key, name in (('o', 'open'), ('h', 'high'), ('l', 'low'), ('c', 'close')):
+                columns[name] = np.asarray(data.get(key, []), dtype=np.float64)
+            volume = np.asarray(data.get('v', []), dtype=np.float64)
+            columns['volume'] = volume if np.isnan(volume).any() else volume.astype(np.int64)
+            if any(len(values) != len(t) for values in columns.values()):
+                raise ValueError("各欄位長度不一致")
             
-            # 轉換時間戳為日期時間
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
-            # 轉換為台灣時區 (UTC+8)
-            df['datetime'] = df['datetime'] + pd.Timedelta(hours=8)
+            # 轉換為台灣時區 (UTC+8)：直接在 epoch 秒數上加減
+            columns['datetime'] = (t + TW_OFFSET).astype('datetime64[s]').astype('datetime64[us]')
             
-            # 排序 (由舊到新)
-            df = df.sort_values('timestamp').reset_index(drop=True)
-            
-            return df
+            # 排序 (由舊到新)；API 通常已排序，只在需要時重排
+            if len(t) > 1 and (np.diff(t) < 0).any():
+                order = np.argsort(t, kind='stable')
+                columns = {k: v[order] for k, v in columns.items()}
             
+            return pd.DataFrame(columns)
+        
         except Exception as e:
             print(f"解析資料時發生錯誤: {e}")
             return pd.DataFrame()
@@ -128,10 +163,12 @@ class DataFetcher:
         if df.empty:
             return df
         
-        # 過濾今日資料
+        # 過濾今日資料：以今日 00:00（台灣時間）的 epoch 秒數區間篩選
         today = datetime.now().strftime('%Y-%m-%d')
-        df['date'] = df['datetime'].dt.strftime('%Y-%m-%d')
-        today_df = df[df['date'] == today].copy()
+        start = int((np.datetime64(today, 's') - np.datetime64(0, 's')).astype(np.int64)) - TW_OFFSET
+        t = df['timestamp'].to_numpy()
+        today_df = df[(t >= start) & (t < start + 86400)].copy()
+        today_df['date'] = today
         
         return today_df
     
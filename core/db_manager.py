@@ -2,9 +2,26 @@
 """
 資料庫管理模組 V2
 支援 OHLCV + 17特徵的儲存、按交易日清理
+
+多商品：ohlcv_data 以 (symbol, timestamp) 為唯一鍵，
+每個 DBManager 綁定一個商品（預設 API_CONFIG['symbol']），所有查詢只看該商品；
+for_symbol() 取得同一 DB 檔的其他商品視圖
+
+多週期：API_CONFIG['resolution']（5 分）沿用 ohlcv_data，
+其他週期各自一張同結構的資料表 ohlcv_{N}m（見 core/resolution.py 的彙總）；
+由 1 分 K 彙總的 5 分 K（rollup=True）另存 ohlcv_5m，不與 API 抓取的 ohlcv_data 互相覆寫
+
+保留策略：只留最近 DB_CONFIG['max_days'] 個交易日，過期資料搬到 archive_dir 下的月份歸檔檔，
+空頁以增量 auto_vacuum 回收
+
+唯讀模式：read_only=True 以 SQLite URI mode=ro 開啟（UI 讀取 core/replica.py 發佈的副本），
+不建表、不遷移，任何寫入都會由 SQLite 拒絕
 """
 
 import sqlite3
+from urllib.parse import quote
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Optional, List
@@ -12,53 +29,104 @@ import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import DATABASE_PATH, DATABASE_DIR, DB_CONFIG, FEATURE_NAMES
+from config import DATABASE_PATH, DATABASE_DIR, DB_CONFIG, FEATURE_NAMES, COMPACT_CONFIG, API_CONFIG
+from core.metrics import METRICS, timed
+
+DEFAULT_SYMBOL = API_CONFIG['symbol']
+DEFAULT_RESOLUTION = str(API_CONFIG['resolution'])
+PREDICTION_TARGETS = ('long_entry', 'long_exit', 'short_entry', 'short_exit')
+
+
+def table_for_resolution(resolution, rollup: bool = False) -> str:
+    """週期（分鐘）→ 資料表名稱；預設週期為 ohlcv_data（彙總而來的預設週期為 ohlcv_{N}m）"""
+    resolution = str(resolution)
+    if resolution == DEFAULT_RESOLUTION and not rollup:
+        return "ohlcv_data"
+    if not resolution.isdigit():
+        raise ValueError(f"不支援的週期: {resolution}")
+    return f"ohlcv_{resolution}m"
 
 
 class DBManager:
     """SQLite 資料庫管理器 V2"""
     
-    def __init__(self, db_path: str = DATABASE_PATH):
+    def __init__(self, db_path: str = DATABASE_PATH, symbol: Optional[str] = None,
+                 resolution=None, read_only: bool = False, rollup: bool = False):
         self.db_path = db_path
-        self._ensure_db_dir()
-        self._init_db()
+        self.symbol = symbol or DEFAULT_SYMBOL
+        self.resolution = str(resolution or DEFAULT_RESOLUTION)
+        self.rollup = rollup
+        self.table = table_for_resolution(self.resolution, rollup)
+        # predictions 表的週期鍵：同週期但不同資料表（彙總的 5 分 K）以表名區分，寫入時不會互相作廢預測
+        self.prediction_key = self.resolution if self.table == table_for_resolution(self.resolution) else self.table
+        self.read_only = read_only
+        if not read_only:
+            self._ensure_db_dir()
+            self._init_db()
+    
+    def for_symbol(self, symbol: str) -> 'DBManager':
+        """同一 DB 檔、綁定另一個商品的 DBManager"""
+        return DBManager(self.db_path, symbol, self.resolution, self.read_only, self.rollup)
+    
+    def for_resolution(self, resolution, rollup: bool = False) -> 'DBManager':
+        """同一 DB 檔、同商品、另一個週期資料表的 DBManager（rollup 見 table_for_resolution）"""
+        return DBManager(self.db_path, self.symbol, resolution, self.read_only, rollup)
     
     def _ensure_db_dir(self):
         db_dir = os.path.dirname(self.db_path)
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
     
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            # 每次查詢重新開啟，副本被原子替換後即讀到新快照
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            return sqlite3.connect(uri, uri=True)
+        return sqlite3.connect(self.db_path)
+    
     def _get_connection(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         conn.row_factory = sqlite3.Row
         return conn
     
     def _init_db(self):
         """初始化資料庫（含17特徵欄位）"""
         conn = self._get_connection()
+        # 新檔案使用增量 auto_vacuum（只在建表前設定才生效），清理後不必重寫整個檔案
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         cursor = conn.cursor()
         
         # 建立包含特徵的資料表
         feature_cols = ", ".join([f'"{f}" REAL' for f in FEATURE_NAMES])
         
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS ohlcv_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp INTEGER UNIQUE NOT NULL,
-                datetime TEXT NOT NULL,
-                date TEXT NOT NULL,
-                open REAL NOT NULL,
-                high REAL NOT NULL,
-                low REAL NOT NULL,
-                close REAL NOT NULL,
-                volume INTEGER NOT NULL,
-                {feature_cols},
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
+        cursor.execute(self._ohlcv_table_sql("ohlcv_data", feature_cols))
+        
+        # 已發送通知的去重表（多進程共用，依 sent_at 做 TTL 清理）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sent_notifications (
+                timestamp INTEGER NOT NULL,
+                signal_type TEXT NOT NULL,
+                sent_at REAL NOT NULL,
+                PRIMARY KEY (timestamp, signal_type)
+            ) WITHOUT ROWID
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sent_at ON sent_notifications(sent_at)")
         
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ohlcv_timestamp ON ohlcv_data(timestamp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ohlcv_date ON ohlcv_data(date)")
+        # 已存預測（fingerprint 為產生該預測的模型組指紋，見 ModelLoader.fingerprint）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                symbol TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                long_entry REAL,
+                long_exit REAL,
+                short_entry REAL,
+                short_exit REAL,
+                fingerprint TEXT NOT NULL,
+                scored_at REAL NOT NULL,
+                PRIMARY KEY (symbol, resolution, timestamp)
+            ) WITHOUT ROWID
+        """)
         
         # 嘗試添加特徵欄位（如果舊表缺少）
         try:
@@ -69,9 +137,52 @@ class DBManager:
         except:
             pass
         
+        # 舊版單商品表（timestamp UNIQUE、無 symbol 欄）→ 重建為 (symbol, timestamp) 唯一鍵
+        existing = [row[1] for row in cursor.execute("PRAGMA table_info(ohlcv_data)").fetchall()]
+        if 'symbol' not in existing:
+            self._migrate_add_symbol(cursor, existing, feature_cols)
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ohlcv_symbol_date ON ohlcv_data(symbol, date)")
+        
+        if self.table != "ohlcv_data":
+            cursor.execute(self._ohlcv_table_sql(self.table, feature_cols))
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_symbol_date ON {self.table}(symbol, date)")
+        
         conn.commit()
         conn.close()
     
+    @staticmethod
+    def _ohlcv_table_sql(table: str, feature_cols: str) -> str:
+        return f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL DEFAULT '{DEFAULT_SYMBOL}',
+                timestamp INTEGER NOT NULL,
+                datetime TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume INTEGER NOT NULL,
+                {feature_cols},
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (symbol, timestamp)
+            )
+        """
+    
+    def _migrate_add_symbol(self, cursor: sqlite3.Cursor, existing: list, feature_cols: str):
+        """舊資料全部歸屬預設商品；SQLite 無法移除 UNIQUE 約束，只能重建資料表"""
+        print(f"[DB] 升級資料表：加入 symbol 欄位（既有資料歸屬 {DEFAULT_SYMBOL}）")
+        cols = ", ".join(f'"{c}"' for c in existing)
+        cursor.execute("ALTER TABLE ohlcv_data RENAME TO ohlcv_data_v1")
+        cursor.execute(self._ohlcv_table_sql("ohlcv_data", feature_cols))
+        cursor.execute(f"INSERT INTO ohlcv_data ({cols}) SELECT {cols} FROM ohlcv_data_v1")
+        cursor.execute("DROP TABLE ohlcv_data_v1")
+        cursor.execute("DROP INDEX IF EXISTS idx_ohlcv_timestamp")
+        cursor.execute("DROP INDEX IF EXISTS idx_ohlcv_date")
+    
+    @timed('save_ohlcv')
     def save_ohlcv(self, df: pd.DataFrame, include_features: bool = True) -> int:
         """儲存 OHLCV + 特徵"""
         if df.empty:
@@ -80,7 +191,7 @@ class DBManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        base_cols = ['timestamp', 'datetime', 'date', 'open', 'high', 'low', 'close', 'volume']
+        base_cols = ['symbol', 'timestamp', 'datetime', 'date', 'open', 'high', 'low', 'close', 'volume']
         feat_cols = [f for f in FEATURE_NAMES if f in df.columns] if include_features else []
         all_cols = base_cols + feat_cols
         
@@ -97,7 +208,7 @@ class DBManager:
                 date_str = dt_str[:10] if isinstance(dt_str, str) else str(dt_str)[:10]
                 
                 values = [
-                    int(row['timestamp']), dt_str, date_str,
+                    self.symbol, int(row['timestamp']), dt_str, date_str,
                     float(row['open']), float(row['high']), float(row['low']),
                     float(row['close']), int(row['volume'])
                 ]
@@ -107,37 +218,81 @@ class DBManager:
                     values.append(float(val) if pd.notna(val) else None)
                 
                 # UPSERT: 如有重複timestamp則更新
-                update_cols = ", ".join([f'"{c}"=excluded."{c}"' for c in all_cols if c != 'timestamp'])
+                update_cols = ", ".join([f'"{c}"=excluded."{c}"' for c in all_cols
+                                         if c not in ('symbol', 'timestamp')])
                 cursor.execute(f"""
-                    INSERT INTO ohlcv_data ({col_names})
+                    INSERT INTO {self.table} ({col_names})
                     VALUES ({placeholders})
-                    ON CONFLICT(timestamp) DO UPDATE SET {update_cols}
+                    ON CONFLICT(symbol, timestamp) DO UPDATE SET {update_cols}
                 """, values)
                 
                 inserted_count += 1
             except Exception as e:
                 continue
         
+        if feat_cols:
+            self._invalidate_predictions(conn, df['timestamp'].astype('int64').tolist())
         conn.commit()
         conn.close()
+        METRICS.inc('rows_saved', inserted_count)
         return inserted_count
     
-    def load_ohlcv(self, days: Optional[int] = None,
-                   start_date: Optional[str] = None,
-                   end_date: Optional[str] = None,
-                   include_features: bool = False) -> pd.DataFrame:
-        """載入 OHLCV（可含特徵）"""
-        conn = self._get_connection()
+    @timed('save_ohlcv_bulk')
+    def save_ohlcv_bulk(self, df: pd.DataFrame, include_features: bool = True) -> int:
+        """
+        批次儲存 OHLCV + 特徵（欄位整批轉換後 executemany，單一交易）
         
-        if include_features:
-            feat_select = ", ".join([f'"{f}"' for f in FEATURE_NAMES])
-            cols = f"timestamp, datetime, date, open, high, low, close, volume, {feat_select}"
-        else:
-            cols = "timestamp, datetime, date, open, high, low, close, volume"
+        與 save_ohlcv 相同的 UPSERT 語意，但不逐列 iterrows；
+        任一列寫入失敗則整批 rollback 並拋出例外
+        """
+        if df.empty:
+            return 0
+        
+        base_cols = ['symbol', 'timestamp', 'datetime', 'date', 'open', 'high', 'low', 'close', 'volume']
+        feat_cols = [f for f in FEATURE_NAMES if f in df.columns] if include_features else []
+        all_cols = base_cols + feat_cols
+        
+        dt = pd.to_datetime(df['datetime'])
+        columns = [
+            [self.symbol] * len(df),
+            df['timestamp'].astype('int64').tolist(),
+            dt.dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+            dt.dt.strftime('%Y-%m-%d').tolist(),
+        ]
+        columns += [df[c].astype('float64').tolist() for c in ('open', 'high', 'low', 'close')]
+        columns.append(df['volume'].astype('int64').tolist())
+        for f in feat_cols:
+            values = df[f].astype('float64')
+            columns.append(values.astype(object).where(values.notna(), None).tolist())
+        
+        placeholders = ", ".join(["?"] * len(all_cols))
+        col_names = ", ".join([f'"{c}"' for c in all_cols])
+        update_cols = ", ".join([f'"{c}"=excluded."{c}"' for c in all_cols
+                                 if c not in ('symbol', 'timestamp')])
         
-        query = f"SELECT {cols} FROM ohlcv_data"
-        conditions = []
-        params = []
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.executemany(f"""
+                    INSERT INTO {self.table} ({col_names})
+                    VALUES ({placeholders})
+                    ON CONFLICT(symbol, timestamp) DO UPDATE SET {update_cols}
+                """, zip(*columns))
+                if feat_cols:
+                    self._invalidate_predictions(conn, columns[1])
+        finally:
+            conn.close()
+        
+        METRICS.inc('rows_saved', len(df))
+        return len(df)
+    
+    def _build_load_query(self, conn: sqlite3.Connection, cols: str,
+                          days: Optional[int], start_date: Optional[str],
+                          end_date: Optional[str]) -> tuple:
+        """組出 load_ohlcv / load_compact 共用的 SELECT 與參數（不含 ORDER BY）"""
+        query = f"SELECT {cols} FROM {self.table}"
+        conditions = ["symbol = ?"]
+        params = [self.symbol]
         
         if start_date:
             conditions.append("date >= ?")
@@ -147,17 +302,33 @@ class DBManager:
             params.append(end_date)
         if days and not start_date:
             # 用交易日邏輯：取最近N個不同日期
-            date_query = "SELECT DISTINCT date FROM ohlcv_data ORDER BY date DESC LIMIT ?"
+            date_query = f"SELECT DISTINCT date FROM {self.table} WHERE symbol = ? ORDER BY date DESC LIMIT ?"
             cursor = conn.cursor()
-            cursor.execute(date_query, (days,))
+            cursor.execute(date_query, (self.symbol, days))
             dates = [r[0] for r in cursor.fetchall()]
             if dates:
                 cutoff = min(dates)
                 conditions.append("date >= ?")
                 params.append(cutoff)
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+        query += " WHERE " + " AND ".join(conditions)
+        return query, params
+    
+    @timed('load_ohlcv')
+    def load_ohlcv(self, days: Optional[int] = None,
+                   start_date: Optional[str] = None,
+                   end_date: Optional[str] = None,
+                   include_features: bool = False) -> pd.DataFrame:
+        """載入 OHLCV（可含特徵）"""
+        conn = self._get_connection()
+        
+        if include_features:
+            feat_select = ", ".join([f'"{f}"' for f in FEATURE_NAMES])
+            cols = f"timestamp, datetime, date, open, high, low, close, volume, {feat_select}"
+        else:
+            cols = "timestamp, datetime, date, open, high, low, close, volume"
+        
+        query, params = self._build_load_query(conn, cols, days, start_date, end_date)
         query += " ORDER BY timestamp ASC"
         
         df = pd.read_sql_query(query, conn, params=params)
@@ -168,6 +339,66 @@ class DBManager:
         
         return df
     
+    @timed('load_compact')
+    def load_compact(self, days: Optional[int] = None,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     include_features: bool = True,
+                     chunk_size: int = None):
+        """
+        載入為 CompactBars（精簡模式）
+        
+        先 COUNT 預先配置陣列，再以 fetchmany 分批填入，
+        不經過 float64 DataFrame，峰值記憶體約為最終陣列大小加一批資料
+        """
+        from core.compact import CompactBars
+        chunk_size = chunk_size or COMPACT_CONFIG['fetch_chunk']
+        
+        conn = self._connect()
+        feat_cols = [f'"{f}"' for f in FEATURE_NAMES] if include_features else []
+        # datetime 由 SQLite 轉為秒數，避免在 Python 端逐筆解析字串
+        cols = ", ".join(["timestamp", "CAST(strftime('%s', datetime) AS INTEGER)",
+                          "open", "high", "low", "close", "volume"] + feat_cols)
+        query, params = self._build_load_query(conn, cols, days, start_date, end_date)
+        
+        count_query = query.replace(f"SELECT {cols}", "SELECT COUNT(*)", 1)
+        n = conn.execute(count_query, params).fetchone()[0]
+        
+        # 每列對應的結構化 dtype（NULL 特徵轉為 NaN）
+        row_dtype = np.dtype(
+            [('timestamp', 'i8'), ('datetime', 'i8')]
+            + [(c, 'f8') for c in ('open', 'high', 'low', 'close')]
+            + [('volume', 'i8')]
+            + [(f'f{i}', 'f8') for i in range(len(feat_cols))])
+        feat_fields = [f'f{i}' for i in range(len(feat_cols))]
+        
+        timestamp = np.empty(n, dtype=np.int64)
+        datetimes = np.empty(n, dtype=np.int64)
+        prices = np.empty((4, n), dtype=np.float64)
+        volume = np.empty(n, dtype=np.int32)
+        features = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32) if include_features else None
+        
+        cursor = conn.execute(query + " ORDER BY timestamp ASC", params)
+        pos = 0
+        while pos < n:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            block = np.fromiter(rows, dtype=row_dtype, count=len(rows))
+            end = pos + len(rows)
+            timestamp[pos:end] = block['timestamp']
+            datetimes[pos:end] = block['datetime']
+            for i, c in enumerate(('open', 'high', 'low', 'close')):
+                prices[i, pos:end] = block[c]
+            volume[pos:end] = block['volume']
+            if include_features:
+                features[pos:end] = structured_to_unstructured(block[feat_fields], dtype=np.float32)
+            pos = end
+        conn.close()
+        
+        return CompactBars(timestamp[:pos], datetimes[:pos].astype('datetime64[s]'), *prices[:, :pos], volume[:pos],
+                           None if features is None else features[:pos])
+    
     def load_by_date(self, target_date: str, include_features: bool = True) -> pd.DataFrame:
         """載入指定日期資料"""
         return self.load_ohlcv(start_date=target_date, end_date=target_date, include_features=include_features)
@@ -176,40 +407,77 @@ class DBManager:
         """取得資料庫中所有交易日期"""
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT date FROM ohlcv_data ORDER BY date DESC")
+        cursor.execute(f"SELECT DISTINCT date FROM {self.table} WHERE symbol = ? ORDER BY date DESC",
+                       (self.symbol,))
         dates = [row[0] for row in cursor.fetchall()]
         conn.close()
         return dates
     
-    def cleanup_by_trading_days(self, keep_days: int = 5) -> int:
-        """按交易日清理（保留最近N個交易日）"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 取得所有交易日
-        cursor.execute("SELECT DISTINCT date FROM ohlcv_data ORDER BY date DESC")
-        all_dates = [row[0] for row in cursor.fetchall()]
-        
-        if len(all_dates) <= keep_days:
-            conn.close()
-            return 0
-        
-        # 保留最近 keep_days 個交易日
-        dates_to_delete = all_dates[keep_days:]
+    def cleanup_by_trading_days(self, keep_days: int = 5, archive: Optional[bool] = None) -> int:
+        """
+        按交易日清理（保留最近N個交易日）
         
-        if not dates_to_delete:
+        只取第 keep_days+1 個交易日作為截止日（走 (symbol, date) 索引，不掃全部日期），
+        截止日以前的資料先搬到月份歸檔檔（DB_CONFIG['archive']），再以索引範圍刪除
+        """
+        archive = DB_CONFIG.get('archive', False) if archive is None else archive
+        conn = self._get_connection()
+        try:
+            row = conn.execute(
+                f"SELECT DISTINCT date FROM {self.table} WHERE symbol = ? ORDER BY date DESC LIMIT 1 OFFSET ?",
+                (self.symbol, keep_days)).fetchone()
+            if row is None:
+                return 0
+            cutoff = row[0]
+            
+            if archive:
+                self._archive_until(conn, cutoff)
+            
+            conn.execute(
+                f"DELETE FROM predictions WHERE symbol = ? AND resolution = ? AND timestamp IN ("
+                f"SELECT timestamp FROM {self.table} WHERE symbol = ? AND date <= ?)",
+                (self.symbol, self.prediction_key, self.symbol, cutoff))
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE symbol = ? AND date <= ?",
+                                  (self.symbol, cutoff))
+            conn.commit()
+            return cursor.rowcount
+        finally:
             conn.close()
-            return 0
-        
-        placeholders = ",".join(["?"] * len(dates_to_delete))
-        cursor.execute(f"SELECT COUNT(*) FROM ohlcv_data WHERE date IN ({placeholders})", dates_to_delete)
-        count = cursor.fetchone()[0]
-        
-        cursor.execute(f"DELETE FROM ohlcv_data WHERE date IN ({placeholders})", dates_to_delete)
-        conn.commit()
-        conn.close()
-        
-        return count
+    
+    def archive_path(self, month: str) -> str:
+        """月份（YYYY-MM）→ 歸檔檔路徑；結構與主資料庫相同，可直接以 DBManager 開啟"""
+        name = os.path.splitext(os.path.basename(self.db_path))[0]
+        return os.path.join(DB_CONFIG['archive_dir'], f"{name}_{month}.db")
+    
+    def _archive_until(self, conn: sqlite3.Connection, cutoff: str):
+        """將截止日（含）以前的資料複製到各月份歸檔檔（重複執行以唯一鍵略過）"""
+        months = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT substr(date, 1, 7) FROM {self.table} WHERE symbol = ? AND date <= ?",
+            (self.symbol, cutoff)).fetchall()]
+        cols = ", ".join(f'"{r[1]}"' for r in conn.execute(f"PRAGMA table_info({self.table})").fetchall()
+                         if r[1] != 'id')
+        
+        for month in months:
+            path = self.archive_path(month)
+            # 建立同結構的資料表與索引
+            DBManager(path, self.symbol, self.resolution, rollup=self.rollup)
+            conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                params = (self.symbol, cutoff, month)
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO archive.{self.table} ({cols}) SELECT {cols} FROM {self.table} "
+                    f"WHERE symbol = ? AND date <= ? AND substr(date, 1, 7) = ?", params)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO archive.predictions SELECT * FROM predictions "
+                    f"WHERE symbol = ? AND resolution = ? AND timestamp IN ("
+                    f"SELECT timestamp FROM {self.table} WHERE symbol = ? AND date <= ? AND substr(date, 1, 7) = ?)",
+                    (self.symbol, self.prediction_key) + params)
+                conn.commit()
+                print(f"[DB] 歸檔 {self.symbol} {month}: {cursor.rowcount} 筆 → {path}")
+            finally:
+                # 寫入失敗時交易仍開著，DETACH 會因 archive 被鎖定而失敗並蓋掉原本的錯誤
+                conn.rollback()
+                conn.execute("DETACH DATABASE archive")
     
     # 保留舊方法的兼容性
     def cleanup_old_data(self, max_days: int = None) -> int:
@@ -222,7 +490,7 @@ class DBManager:
     def get_latest_timestamp(self) -> Optional[int]:
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT MAX(timestamp) FROM ohlcv_data")
+        cursor.execute(f"SELECT MAX(timestamp) FROM {self.table} WHERE symbol = ?", (self.symbol,))
         result = cursor.fetchone()[0]
         conn.close()
         return result
@@ -231,12 +499,13 @@ class DBManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         stats = {}
-        cursor.execute("SELECT COUNT(*) FROM ohlcv_data")
+        cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE symbol = ?", (self.symbol,))
         stats['total_records'] = cursor.fetchone()[0]
-        cursor.execute("SELECT MIN(date), MAX(date) FROM ohlcv_data")
+        cursor.execute(f"SELECT MIN(date), MAX(date) FROM {self.table} WHERE symbol = ?", (self.symbol,))
         row = cursor.fetchone()
         stats['date_range'] = {'min': row[0], 'max': row[1]}
-        cursor.execute("SELECT date, COUNT(*) as count FROM ohlcv_data GROUP BY date ORDER BY date DESC")
+        cursor.execute(f"SELECT date, COUNT(*) as count FROM {self.table} WHERE symbol = ? "
+                       "GROUP BY date ORDER BY date DESC", (self.symbol,))
         stats['daily_counts'] = {row[0]: row[1] for row in cursor.fetchall()}
         conn.close()
         return stats
@@ -268,15 +537,16 @@ class DBManager:
         cursor = conn.cursor()
         
         # 取得每個日期各時段的筆數
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT date,
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) < 6 THEN 1 ELSE 0 END) as night_early,
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) BETWEEN 8 AND 13 THEN 1 ELSE 0 END) as day_session,
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) >= 15 THEN 1 ELSE 0 END) as night_late
-            FROM ohlcv_data
+            FROM {self.table}
+            WHERE symbol = ?
             GROUP BY date
             ORDER BY date ASC
-        """)
+        """, (self.symbol,))
         
         date_sessions = {}
         for row in cursor.fetchall():
@@ -369,15 +639,15 @@ class DBManager:
         
         issues = []
         dates = [r[0] for r in cursor.execute(
-            "SELECT DISTINCT date FROM ohlcv_data ORDER BY date ASC"
+            f"SELECT DISTINCT date FROM {self.table} WHERE symbol = ? ORDER BY date ASC", (self.symbol,)
         ).fetchall()]
         
         for d in dates:
             for f in FEATURE_NAMES:
                 cursor.execute(f"""
-                    SELECT COUNT(*) FROM ohlcv_data
-                    WHERE date = ? AND ("{f}" IS NULL)
-                """, (d,))
+                    SELECT COUNT(*) FROM {self.table}
+                    WHERE symbol = ? AND date = ? AND ("{f}" IS NULL)
+                """, (self.symbol, d))
                 null_count = cursor.fetchone()[0]
                 if null_count > 0:
                     issues.append({
@@ -396,16 +666,17 @@ class DBManager:
         """
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT date,
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) < 6 THEN 1 ELSE 0 END),
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) BETWEEN 8 AND 13 THEN 1 ELSE 0 END),
                    SUM(CASE WHEN CAST(strftime('%H', datetime) AS INT) >= 15 THEN 1 ELSE 0 END),
                    COUNT(*)
-            FROM ohlcv_data
+            FROM {self.table}
+            WHERE symbol = ?
             GROUP BY date
             ORDER BY date ASC
-        """)
+        """, (self.symbol,))
         
         result = {}
         for row in cursor.fetchall():
@@ -416,7 +687,160 @@ class DBManager:
         conn.close()
         return result
     
+    # =========================================================================
+    # 已存預測（模型組指紋）
+    # =========================================================================
+    
+    def save_predictions(self, timestamps, probs: dict, fingerprint: str) -> int:
+        """
+        寫入預測（同一根 K 棒以新指紋覆寫）
+        
+        Args:
+            timestamps: K 棒 timestamp 序列
+            probs: {target: 機率陣列}，NaN 存為 NULL
+            fingerprint: 模型組指紋
+        """
+        scored_at = datetime.now().timestamp()
+        columns = [np.asarray(probs[t], dtype=float) for t in PREDICTION_TARGETS]
+        rows = [
+            (self.symbol, self.prediction_key, int(ts),
+             *[None if np.isnan(col[i]) else float(col[i]) for col in columns],
+             fingerprint, scored_at)
+            for i, ts in enumerate(timestamps)
+        ]
+        if not rows:
+            return 0
+        conn = self._get_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (symbol, resolution, timestamp, "
+                + ", ".join(PREDICTION_TARGETS)
+                + ", fingerprint, scored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    
+    def _invalidate_predictions(self, conn: sqlite3.Connection, timestamps):
+        """特徵被改寫的 K 棒刪除已存預測，交由重算工作以新特徵評分"""
+        conn.executemany(
+            "DELETE FROM predictions WHERE symbol = ? AND resolution = ? AND timestamp = ?",
+            ((self.symbol, self.prediction_key, int(ts)) for ts in timestamps))
+    
+    def load_predictions(self, timestamps, fingerprint: Optional[str] = None) -> pd.DataFrame:
+        """
+        讀取指定 K 棒的已存預測（index 為 timestamp）
+        
+        Args:
+            fingerprint: 只取此指紋的預測（其餘視為過期），None 則全部
+        """
+        columns = ['timestamp', *PREDICTION_TARGETS, 'fingerprint']
+        timestamps = [int(t) for t in timestamps]
+        if not timestamps:
+            return pd.DataFrame(columns=columns).set_index('timestamp')
+        query = (f"SELECT {', '.join(columns)} FROM predictions WHERE symbol = ? AND resolution = ? "
+                 f"AND timestamp BETWEEN ? AND ?")
+        params = [self.symbol, self.prediction_key, min(timestamps), max(timestamps)]
+        if fingerprint is not None:
+            query += " AND fingerprint = ?"
+            params.append(fingerprint)
+        conn = self._get_connection()
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        except sqlite3.OperationalError:
+            # 舊版副本 / 歸檔檔沒有 predictions 表
+            df = pd.DataFrame(columns=columns)
+        finally:
+            conn.close()
+        df = df[df['timestamp'].isin(timestamps)]
+        return df.set_index('timestamp')
+    
+    def _stale_where(self) -> str:
+        features_ready = " AND ".join(f'o."{f}" IS NOT NULL' for f in FEATURE_NAMES)
+        return (f"FROM {self.table} o LEFT JOIN predictions p "
+                f"ON p.symbol = o.symbol AND p.resolution = ? AND p.timestamp = o.timestamp "
+                f"WHERE o.symbol = ? AND {features_ready} "
+                f"AND (p.fingerprint IS NULL OR p.fingerprint != ?)")
+    
+    def load_stale_bars(self, fingerprint: str, limit: int) -> pd.DataFrame:
+        """特徵完整但沒有此指紋預測的 K 棒（由新到舊，最多 limit 根）"""
+        feat_cols = ", ".join(f'o."{f}"' for f in FEATURE_NAMES)
+        conn = self._get_connection()
+        try:
+            return pd.read_sql_query(
+                f"SELECT o.timestamp, {feat_cols} {self._stale_where()} ORDER BY o.timestamp DESC LIMIT ?",
+                conn, params=(self.prediction_key, self.symbol, fingerprint, int(limit)))
+        finally:
+            conn.close()
+    
+    def count_stale_predictions(self, fingerprint: str) -> int:
+        conn = self._get_connection()
+        try:
+            return conn.execute(f"SELECT COUNT(*) {self._stale_where()}",
+                                (self.prediction_key, self.symbol, fingerprint)).fetchone()[0]
+        finally:
+            conn.close()
+    
+    # =========================================================================
+    # 通知去重
+    # =========================================================================
+    
+    def claim_notification(self, timestamp: int, signal_type: str) -> bool:
+        """
+        嘗試登記一筆通知（INSERT OR IGNORE，主鍵查找）
+        
+        多個進程同時登記同一 (timestamp, signal_type) 時只有一個會成功。
+        
+        Returns:
+            True = 首次登記，應發送；False = 已發送過
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO sent_notifications (timestamp, signal_type, sent_at) "
+                "VALUES (?, ?, ?)",
+                (int(timestamp), signal_type, datetime.now().timestamp())
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    def release_notification(self, timestamp: int, signal_type: str):
+        """撤銷一筆通知登記（訊息未送出時呼叫，之後可再次登記發送）"""
+        conn = self._get_connection()
+        try:
+            conn.execute("DELETE FROM sent_notifications WHERE timestamp = ? AND signal_type = ?",
+                         (int(timestamp), signal_type))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def cleanup_notifications(self, ttl_seconds: float) -> int:
+        """刪除超過 TTL 的通知紀錄（走 sent_at 索引）"""
+        cutoff = datetime.now().timestamp() - ttl_seconds
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute("DELETE FROM sent_notifications WHERE sent_at < ?", (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
     def vacuum(self):
+        """
+        回收已刪除資料的空頁
+        
+        auto_vacuum=INCREMENTAL 時只釋放 freelist 頁，不重寫整個檔案；
+        舊檔第一次執行時需要一次完整 VACUUM 才能切換模式
+        """
         conn = self._get_connection()
-        conn.execute("VACUUM")
-        conn.close()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            else:
+                # execute() 對無欄位的 PRAGMA 只 step 一次（只釋放一頁），executescript 會執行到完成
+                conn.executescript("PRAGMA incremental_vacuum;")
+        finally:
+            conn.close()
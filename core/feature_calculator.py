@@ -13,6 +13,7 @@ import sys
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import INDICATOR_PARAMS, FEATURE_NAMES
+from core.metrics import METRICS, timed
 
 
 class FeatureCalculator:
@@ -26,6 +27,7 @@ class FeatureCalculator:
         self.params = INDICATOR_PARAMS
         self.feature_names = FEATURE_NAMES
     
+    @timed('calculate_all')
     def calculate_all(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         計算所有 17 個特徵
@@ -44,23 +46,31 @@ class FeatureCalculator:
         result = df.copy()
         
         # 先計算基礎指標 (後續特徵會用到)
-        result = self._calc_sma(result)
-        result = self._calc_volume_ma(result)
-        result = self._calc_atr(result)
-        result = self._calc_parkinson_volatility(result)
+        with METRICS.timer('feature', feature='_sma'):
+            result = self._calc_sma(result)
+        with METRICS.timer('feature', feature='_volume_ma'):
+            result = self._calc_volume_ma(result)
+        with METRICS.timer('feature', feature='_atr'):
+            result = self._calc_atr(result)
+        with METRICS.timer('feature', feature='_parkinson'):
+            result = self._calc_parkinson_volatility(result)
         
         # 計算 17 個特徵 (順序必須一致)
         # 1. RSI14
-        result['RSI14'] = self._calc_rsi(result['close'], self.params['rsi_period'])
+        with METRICS.timer('feature', feature='RSI14'):
+            result['RSI14'] = self._calc_rsi(result['close'], self.params['rsi_period'])
         
         # 2. ADX14
-        result['ADX14'] = self._calc_adx(result, self.params['adx_period'])
+        with METRICS.timer('feature', feature='ADX14'):
+            result['ADX14'] = self._calc_adx(result, self.params['adx_period'])
         
         # 3. CCI20
-        result['CCI20'] = self._calc_cci(result, self.params['cci_period'])
+        with METRICS.timer('feature', feature='CCI20'):
+            result['CCI20'] = self._calc_cci(result, self.params['cci_period'])
         
         # 4. OSC (MACD Histogram) - 使用加權收盤價
-        result['OSC'] = self._calc_macd_histogram(result)
+        with METRICS.timer('feature', feature='OSC'):
+            result['OSC'] = self._calc_macd_histogram(result)
         
         # 5. ATR14 (已計算，需 fillna 補 warmup 期)
         result['ATR14'] = result['_atr'].fillna(0)
@@ -69,38 +79,48 @@ class FeatureCalculator:
         result['Parkinson_Volatility'] = result['_parkinson'].fillna(0)
         
         # 7. Cost Deviation (成本乖離力)
-        result['Cost_Deviation'] = self._calc_cost_deviation(result)
+        with METRICS.timer('feature', feature='Cost_Deviation'):
+            result['Cost_Deviation'] = self._calc_cost_deviation(result)
         
         # 8. RSI Normalized (RSI標準化)
         # 注意：RSI14 已是 0~1 範圍，需乘100再標準化
         result['RSI_Normalized'] = (result['RSI14'] * 100 - 50) / 50
         
         # 9. SMA5 Slope (5MA斜率)
-        result['SMA5_Slope'] = self._calc_sma5_slope(result)
+        with METRICS.timer('feature', feature='SMA5_Slope'):
+            result['SMA5_Slope'] = self._calc_sma5_slope(result)
         
         # 10. Channel Position (通道位置/布林%B)
-        result['Channel_Position'] = self._calc_channel_position(result)
+        with METRICS.timer('feature', feature='Channel_Position'):
+            result['Channel_Position'] = self._calc_channel_position(result)
         
         # 11. Volume Ratio (交易量能)
-        result['Volume_Ratio'] = self._calc_volume_ratio(result)
+        with METRICS.timer('feature', feature='Volume_Ratio'):
+            result['Volume_Ratio'] = self._calc_volume_ratio(result)
         
         # 12. Engulfing Strength (吞噬強度)
-        result['Engulfing_Strength'] = self._calc_engulfing_strength(result)
+        with METRICS.timer('feature', feature='Engulfing_Strength'):
+            result['Engulfing_Strength'] = self._calc_engulfing_strength(result)
         
         # 13. Kbar Power (K棒力道)
-        result['Kbar_Power'] = self._calc_kbar_power(result)
+        with METRICS.timer('feature', feature='Kbar_Power'):
+            result['Kbar_Power'] = self._calc_kbar_power(result)
         
         # 14. N Pattern (N型態)
-        result['N_Pattern'] = self._calc_n_pattern(result)
+        with METRICS.timer('feature', feature='N_Pattern'):
+            result['N_Pattern'] = self._calc_n_pattern(result)
         
         # 15. Three Soldiers (三兵)
-        result['Three_Soldiers'] = self._calc_three_soldiers(result)
+        with METRICS.timer('feature', feature='Three_Soldiers'):
+            result['Three_Soldiers'] = self._calc_three_soldiers(result)
         
         # 16. Shadow Reversal (影線反轉)
-        result['Shadow_Reversal'] = self._calc_shadow_reversal(result)
+        with METRICS.timer('feature', feature='Shadow_Reversal'):
+            result['Shadow_Reversal'] = self._calc_shadow_reversal(result)
         
         # 17. ThreeK Reversal (3K反轉)
-        result['ThreeK_Reversal'] = self._calc_threek_reversal(result)
+        with METRICS.timer('feature', feature='ThreeK_Reversal'):
+            result['ThreeK_Reversal'] = self._calc_threek_reversal(result)
         
         # 清理輔助欄位
         aux_cols = [col for col in result.columns if col.startswith('_')]
@@ -108,6 +128,21 @@ class FeatureCalculator:
         
         return result
     
+    def get_lookback_bars(self) -> int:
+        """
+        取得單根 K 棒變動時，其後可能受影響的 K 棒數
+        
+        取各指標最長的依賴長度：CCI (SMA20 再取 MAD20)、MACD (26 + 9)、
+        ADX (Wilder 兩層平滑) 與 20 期視窗類特徵
+        """
+        p = self.params
+        return max(
+            p['cci_period'] * 2,
+            p['macd_slow'] + p['macd_signal'],
+            p['adx_period'] * 2,
+            p['lookback_window'] + 1,
+        )
+    
     def get_feature_array(self, df: pd.DataFrame, row_idx: int = -1) -> Optional[np.ndarray]:
         """
         取得指定列的特徵陣列 (用於模型預測)
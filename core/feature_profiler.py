@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+特徵計算剖析模組（選用，不影響正式流程）
+逐一包裝 FeatureCalculator 的 _calc_* 方法，依輸入筆數記錄：
+  wall   : 執行時間（不開 tracemalloc 的獨立一輪，避免追蹤成本灌水）
+  peak   : tracemalloc 量到的方法內峰值配置
+  net    : 方法結束時仍存活的配置（通常為回傳的欄位）
+可輸出可排序報表，或以 cProfile 產生 pstats 檔供 snakeviz 等工具檢視
+"""
+
+import cProfile
+import functools
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.feature_calculator import FeatureCalculator
+
+
+# _calc_* 方法 → 產出的特徵 / 輔助欄位
+METHOD_OUTPUTS = {
+    '_calc_sma': '_sma5 / _sma20',
+    '_calc_volume_ma': '_volume_ma5',
+    '_calc_atr': '_atr',
+    '_calc_parkinson_volatility': '_parkinson',
+    '_calc_rsi': 'RSI14',
+    '_calc_adx': 'ADX14',
+    '_calc_cci': 'CCI20',
+    '_calc_macd_histogram': 'OSC',
+    '_calc_cost_deviation': 'Cost_Deviation',
+    '_calc_sma5_slope': 'SMA5_Slope',
+    '_calc_channel_position': 'Channel_Position',
+    '_calc_volume_ratio': 'Volume_Ratio',
+    '_calc_engulfing_strength': 'Engulfing_Strength',
+    '_calc_kbar_power': 'Kbar_Power',
+    '_calc_n_pattern': 'N_Pattern',
+    '_calc_three_soldiers': 'Three_Soldiers',
+    '_calc_shadow_reversal': 'Shadow_Reversal',
+    '_calc_threek_reversal': 'ThreeK_Reversal',
+}
+
+REPORT_COLUMNS = ['size', 'method', 'output', 'calls', 'wall', 'wall_per_bar_us',
+                  'share', 'peak_kb', 'net_kb']
+
+
+def synthetic_bars(n: int, seed: int = 0, start: str = "2026-01-05 08:45") -> pd.DataFrame:
+    """
+    產生 n 根隨機漫步 5 分 K（價位 / 量級接近台指期），供大筆數剖析與基準測試
+    """
+    rng = np.random.default_rng(seed)
+    close = 32000 + np.cumsum(rng.normal(0, 15, n)).round()
+    open_ = np.concatenate([[close[0]], close[:-1]]) + rng.normal(0, 3, n).round()
+    spread = np.abs(rng.normal(0, 12, (2, n))).round()
+    high = np.maximum(open_, close) + spread[0]
+    low = np.minimum(open_, close) - spread[1]
+    volume = rng.integers(200, 4000, n)
+    dt = pd.date_range(start, periods=n, freq="5min")
+    return pd.DataFrame({
+        'timestamp': ((dt - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype(int),
+        'datetime': dt,
+        'open': open_, 'high': high, 'low': low, 'close': close,
+        'volume': volume,
+    })
+
+
+class FeatureProfiler:
+    """FeatureCalculator 逐方法剖析"""
+    
+    def __init__(self, feature_calculator: Optional[FeatureCalculator] = None):
+        self.fc = feature_calculator or FeatureCalculator()
+        self.records: List[dict] = []
+    
+    def _method_names(self) -> List[str]:
+        return sorted(name for name in dir(self.fc) if name.startswith('_calc_'))
+    
+    def _run_instrumented(self, df: pd.DataFrame, trace_memory: bool) -> tuple:
+        """
+        以實例屬性暫時覆蓋 _calc_* 後執行 calculate_all
+        
+        Returns:
+            (總耗時, {方法: {'calls', 'wall', 'peak', 'net'}})
+        """
+        stats = defaultdict(lambda: {'calls': 0, 'wall': 0.0, 'peak': 0, 'net': 0})
+        
+        def _wrap(name, func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                entry = stats[name]
+                if trace_memory:
+                    before, _ = tracemalloc.get_traced_memory()
+                    tracemalloc.reset_peak()
+                t0 = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    entry['wall'] += time.perf_counter() - t0
+                    entry['calls'] += 1
+                    if trace_memory:
+                        current, peak = tracemalloc.get_traced_memory()
+                        entry['peak'] = max(entry['peak'], peak - before)
+                        entry['net'] += current - before
+            return wrapper
+        
+        names = self._method_names()
+        for name in names:
+            setattr(self.fc, name, _wrap(name, getattr(self.fc, name)))
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            t0 = time.perf_counter()
+            self.fc.calculate_all(df)
+            total = time.perf_counter() - t0
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            for name in names:
+                # 移除實例屬性，恢復類別方法
+                self.fc.__dict__.pop(name, None)
+        return total, dict(stats)
+    
+    def profile(self, df: pd.DataFrame, sizes: Optional[Iterable[int]] = None,
+                repeat: int = 3, trace_memory: bool = True) -> pd.DataFrame:
+        """
+        依輸入筆數剖析各 _calc_* 方法
+        
+        Args:
+            df: OHLCV 資料（各 size 取尾端 size 根）
+            sizes: 輸入筆數列表，預設為 len(df)
+            repeat: 計時輪數（取各方法最短時間，降低雜訊）
+            trace_memory: 是否另跑一輪 tracemalloc 量測配置
+        
+        Returns:
+            報表（同 report()）
+        """
+        sizes = list(sizes) if sizes else [len(df)]
+        for size in sizes:
+            data = df.tail(size).reset_index(drop=True)
+            
+            best_total, best = float('inf'), {}
+            for _ in range(max(repeat, 1)):
+                total, stats = self._run_instrumented(data, trace_memory=False)
+                best_total = min(best_total, total)
+                for name, entry in stats.items():
+                    if name not in best or entry['wall'] < best[name]['wall']:
+                        best[name] = entry
+            memory = self._run_instrumented(data, trace_memory=True)[1] if trace_memory else {}
+            
+            for name, entry in best.items():
+                mem = memory.get(name, {})
+                self.records.append({
+                    'size': len(data),
+                    'method': name,
+                    'output': METHOD_OUTPUTS.get(name, ''),
+                    'calls': entry['calls'],
+                    'wall': entry['wall'],
+                    'total': best_total,
+                    'peak': mem.get('peak', 0),
+                    'net': mem.get('net', 0),
+                })
+            # calculate_all 內未包在 _calc_* 的部分（複製、fillna、清理輔助欄位）
+            self.records.append({
+                'size': len(data), 'method': '(other)', 'output': '', 'calls': 1,
+                'wall': max(best_total - sum(e['wall'] for e in best.values()), 0.0),
+                'total': best_total, 'peak': 0, 'net': 0,
+            })
+            print(f"[剖析] {len(data)} 根: calculate_all {best_total:.3f}s")
+        
+        return self.report()
+    
+    def report(self, sort_by: str = 'wall', ascending: bool = False) -> pd.DataFrame:
+        """
+        可排序報表
+        
+        Args:
+            sort_by: 排序欄位（wall / share / peak_kb / net_kb / wall_per_bar_us ...）
+        """
+        if not self.records:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        df = pd.DataFrame(self.records)
+        df['wall_per_bar_us'] = df['wall'] / df['size'] * 1e6
+        df['share'] = df['wall'] / df['total']
+        df['peak_kb'] = df['peak'] / 1024
+        df['net_kb'] = df['net'] / 1024
+        return (df[REPORT_COLUMNS]
+                .sort_values(['size', sort_by], ascending=[True, ascending])
+                .reset_index(drop=True))
+    
+    def scaling(self) -> pd.DataFrame:
+        """各方法耗時隨筆數的變化（列：方法，欄：筆數）"""
+        report = self.report()
+        if report.empty:
+            return report
+        return report.pivot_table(index='method', columns='size', values='wall',
+                                  aggfunc='min').sort_values(report['size'].max(), ascending=False)
+    
+    def cprofile(self, df: pd.DataFrame, path: Optional[str] = None,
+                 sort: str = 'cumulative', top: int = 25) -> pstats.Stats:
+        """
+        以 cProfile 跑一次 calculate_all
+        
+        Args:
+            path: 指定時輸出 .pstats 檔
+            sort: 排序鍵（cumulative / tottime / ncalls ...）
+            top: 輸出前幾名
+        """
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            self.fc.calculate_all(df)
+        finally:
+            profiler.disable()
+        stats = pstats.Stats(profiler)
+        if path:
+            stats.dump_stats(path)
+            print(f"[剖析] pstats 已輸出: {path}")
+        stats.sort_stats(sort).print_stats(top)
+        return stats
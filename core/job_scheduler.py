@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+事件驅動排程模組
+單一執行緒 + 下次觸發時間 heap，精準睡到下一個工作，不再每分鐘輪詢
+
+支援工作類型：
+  每日定時 → add_daily(name, func, hour, minute)    例：06:00 / 14:00 存檔
+  固定間隔 → add_interval(name, func, seconds)       例：每 5 分 K 收盤處理
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+
+class Job:
+    """排程工作（含執行統計）"""
+    
+    def __init__(self, name: str, func: Callable, next_fire: Callable[[float], float],
+                 label: str = ""):
+        """
+        Args:
+            name: 工作名稱（唯一）
+            func: 要執行的函式（無參數）
+            next_fire: 給定目前 epoch 秒，回傳下一次觸發的 epoch 秒
+            label: 顯示用描述
+        """
+        self.name = name
+        self.func = func
+        self.next_fire = next_fire
+        self.label = label
+        self.scheduled_at: Optional[float] = None
+        self.cancelled = False
+        
+        # 執行統計
+        self.runs = 0
+        self.errors = 0
+        self.last_start: Optional[float] = None
+        self.last_duration = 0.0
+        self.last_lateness = 0.0
+        self.max_duration = 0.0
+        self.max_lateness = 0.0
+        self.total_duration = 0.0
+    
+    def get_stats(self) -> dict:
+        """取得執行統計（秒）"""
+        return {
+            'name': self.name,
+            'label': self.label,
+            'runs': self.runs,
+            'errors': self.errors,
+            'next_run': datetime.fromtimestamp(self.scheduled_at) if self.scheduled_at else None,
+            'last_run': datetime.fromtimestamp(self.last_start) if self.last_start else None,
+            'last_duration': self.last_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else 0.0,
+            'max_duration': self.max_duration,
+            'last_lateness': self.last_lateness,
+            'max_lateness': self.max_lateness,
+        }
+
+
+def daily_at(hour: int, minute: int) -> Callable[[float], float]:
+    """每日 HH:MM 觸發（本地時間）"""
+    def _next(now: float) -> float:
+        now_dt = datetime.fromtimestamp(now)
+        target = now_dt.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target.timestamp() <= now:
+            target += timedelta(days=1)
+        return target.timestamp()
+    return _next
+
+
+def every(seconds: float, offset: float = 0.0) -> Callable[[float], float]:
+    """
+    固定間隔觸發，對齊本地時間的整數倍
+    例：every(300, offset=1) → 每個 5 分 K 邊界後 1 秒
+    """
+    def _next(now: float) -> float:
+        utc_offset = datetime.fromtimestamp(now).astimezone().utcoffset().total_seconds()
+        local = now + utc_offset - offset
+        return (local // seconds + 1) * seconds - utc_offset + offset
+    return _next
+
+
+class JobScheduler:
+    """
+    Heap 排程器
+    
+    heap 內容為 (觸發時間, 序號, Job)，背景執行緒以 Condition.wait
+    睡到最早的觸發時間；新增/移除工作或停止時會立即喚醒重新計算。
+    工作依序在同一執行緒執行，前一個工作超時會反映在後續工作的 lateness。
+    """
+    
+    def __init__(self, name: str = "job-scheduler"):
+        self.name = name
+        self._heap: List[tuple] = []
+        self._jobs: Dict[str, Job] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.on_error: Optional[Callable[[Job, Exception], None]] = None
+    
+    # =========================================================================
+    # 工作註冊
+    # =========================================================================
+    
+    def add_job(self, name: str, func: Callable, next_fire: Callable[[float], float],
+                label: str = "") -> Job:
+        """註冊工作（同名工作會被取代）"""
+        job = Job(name, func, next_fire, label)
+        with self._cond:
+            if name in self._jobs:
+                self._jobs[name].cancelled = True
+            self._jobs[name] = job
+            self._push(job, time.time())
+            self._cond.notify()
+        return job
+    
+    def add_daily(self, name: str, func: Callable, hour: int, minute: int,
+                  label: str = "") -> Job:
+        return self.add_job(name, func, daily_at(hour, minute), label)
+    
+    def add_interval(self, name: str, func: Callable, seconds: float,
+                     offset: float = 0.0, label: str = "") -> Job:
+        return self.add_job(name, func, every(seconds, offset), label)
+    
+    def remove_job(self, name: str):
+        """移除工作（heap 中的項目延遲刪除）"""
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            if job:
+                job.cancelled = True
+                self._cond.notify()
+    
+    def _push(self, job: Job, now: float):
+        job.scheduled_at = job.next_fire(now)
+        heapq.heappush(self._heap, (job.scheduled_at, next(self._seq), job))
+    
+    # =========================================================================
+    # 執行迴圈
+    # =========================================================================
+    
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+    
+    def is_running(self) -> bool:
+        return self._running
+    
+    def _loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while self._running:
+                    # 丟棄已取消的工作
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    fire_at = self._heap[0][0]
+                    delay = fire_at - time.time()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    _, _, job = heapq.heappop(self._heap)
+                    break
+                if not self._running:
+                    return
+            
+            self._run_job(job, fire_at)
+            
+            with self._cond:
+                if not job.cancelled:
+                    # 以「排程時間」與「現在」較晚者計算下一次，避免補跑連發
+                    self._push(job, max(time.time(), fire_at))
+    
+    def _run_job(self, job: Job, fire_at: float):
+        start = time.time()
+        job.last_start = start
+        job.last_lateness = start - fire_at
+        job.max_lateness = max(job.max_lateness, job.last_lateness)
+        try:
+            job.func()
+        except Exception as e:
+            job.errors += 1
+            if self.on_error:
+                self.on_error(job, e)
+            else:
+                print(f"[排程] 工作 {job.name} 失敗: {e}")
+        finally:
+            job.last_duration = time.time() - start
+            job.max_duration = max(job.max_duration, job.last_duration)
+            job.total_duration += job.last_duration
+            job.runs += 1
+    
+    # =========================================================================
+    # 查詢
+    # =========================================================================
+    
+    def get_next_job(self, names: Optional[List[str]] = None) -> Optional[Job]:
+        """取得下一個將觸發的工作（可限定名稱）"""
+        with self._cond:
+            candidates = [j for n, j in self._jobs.items()
+                          if (names is None or n in names) and j.scheduled_at]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda j: j.scheduled_at)
+    
+    def get_stats(self) -> List[dict]:
+        """取得所有工作的執行統計（依下次觸發時間排序）"""
+        with self._cond:
+            jobs = list(self._jobs.values())
+        return sorted((j.get_stats() for j in jobs),
+                      key=lambda s: s['next_run'] or datetime.max)
@@ -2,14 +2,23 @@
 """
 LINE Bot 通知模組
 當買進訊號信心度 > 60% 時，推播訊息給所有好友
+
+推播走非同步佇列：呼叫端只負責放入佇列（不等待網路），
+由背景 worker 取出發送，失敗時以指數退避重試
 """
 
+import queue
+import threading
+from collections import OrderedDict
+import time
 import requests
 from datetime import datetime
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import API_CONFIG, SYMBOL_LABELS
+from core.metrics import METRICS, timed
 
 
 class LineNotifier:
@@ -18,40 +27,86 @@ class LineNotifier:
     OAUTH_URL = "https://api.line.me/v2/oauth/accessToken"
     BROADCAST_URL = "https://api.line.me/v2/bot/message/broadcast"
     
-    def __init__(self, channel_id: str, channel_secret: str):
+    # Token 到期前提早更新的緩衝（秒）
+    TOKEN_REFRESH_MARGIN = 300
+    
+    def __init__(self, channel_id: str, channel_secret: str,
+                 queue_size: int = 100, max_retries: int = 3,
+                 retry_backoff: float = 1.0, db_manager=None,
+                 dedup_ttl: float = 2 * 86400, dedup_cache_size: int = 500):
+        """
+        Args:
+            db_manager: 提供 claim_notification 的 DBManager；
+                        有提供時去重紀錄存於 SQLite（重啟不遺失、多進程共用）
+            dedup_ttl: 去重紀錄保留秒數
+            dedup_cache_size: 本機快取筆數上限
+        """
         self.channel_id = channel_id
         self.channel_secret = channel_secret
         self._access_token = None
-        self._sent_keys = set()  # 避免同一訊號重複發送（key = timestamp_target）
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        
+        # 避免同一訊號重複發送：key = (timestamp, signal_type) → 登記時間
+        # 本機快取依登記順序排列，超過 TTL / 容量從最舊端淘汰
+        self.db = db_manager
+        self.dedup_ttl = dedup_ttl
+        self.dedup_cache_size = dedup_cache_size
+        self._sent_keys = OrderedDict()
+        self._dedup_lock = threading.Lock()
+        self._last_db_cleanup = 0.0
+        
+        # 非同步發送佇列
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'dropped': 0}
     
     def _get_access_token(self) -> str:
-        """用 Channel ID + Secret 取得短期 Access Token"""
-        if self._access_token:
-            return self._access_token
-        
-        try:
-            resp = requests.post(self.OAUTH_URL, data={
-                "grant_type": "client_credentials",
-                "client_id": self.channel_id,
-                "client_secret": self.channel_secret,
-            }, timeout=10)
-            
-            if resp.status_code == 200:
-                self._access_token = resp.json().get("access_token")
+        """用 Channel ID + Secret 取得短期 Access Token（依 expires_in 快取）"""
+        with self._token_lock:
+            if self._access_token and time.time() < self._token_expires_at:
                 return self._access_token
-            else:
-                print(f"[LINE] 取得 Token 失敗: {resp.status_code} {resp.text}")
+            
+            try:
+                resp = requests.post(self.OAUTH_URL, data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.channel_id,
+                    "client_secret": self.channel_secret,
+                }, timeout=10)
+                
+                if resp.status_code == 200:
+                    body = resp.json()
+                    self._access_token = body.get("access_token")
+                    expires_in = float(body.get("expires_in", 0) or 0)
+                    self._token_expires_at = time.time() + max(
+                        expires_in - self.TOKEN_REFRESH_MARGIN, 0)
+                    return self._access_token
+                else:
+                    print(f"[LINE] 取得 Token 失敗: {resp.status_code} {resp.text}")
+                    return None
+            except Exception as e:
+                print(f"[LINE] Token 請求錯誤: {e}")
                 return None
-        except Exception as e:
-            print(f"[LINE] Token 請求錯誤: {e}")
-            return None
     
-    def broadcast(self, message: str) -> bool:
-        """推播文字訊息給所有好友"""
+    def _invalidate_token(self):
+        with self._token_lock:
+            self._access_token = None
+            self._token_expires_at = 0.0
+    
+    def _send(self, message: str) -> tuple:
+        """
+        發送一次推播
+        
+        Returns:
+            (是否成功, 是否值得重試)
+        """
         token = self._get_access_token()
         if not token:
             print("[LINE] 無法取得 Access Token，跳過推播")
-            return False
+            return False, True
         
         try:
             resp = requests.post(
@@ -68,17 +123,98 @@ class LineNotifier:
             
             if resp.status_code == 200:
                 print(f"[LINE] 推播成功")
-                return True
-            else:
-                print(f"[LINE] 推播失敗: {resp.status_code} {resp.text}")
-                return False
+                return True, False
+            
+            print(f"[LINE] 推播失敗: {resp.status_code} {resp.text}")
+            if resp.status_code == 401:
+                # Token 失效，重新取得後重試
+                self._invalidate_token()
+                return False, True
+            return False, resp.status_code == 429 or resp.status_code >= 500
         except Exception as e:
             print(f"[LINE] 推播錯誤: {e}")
+            return False, True
+    
+    @timed('line_broadcast')
+    def broadcast(self, message: str) -> bool:
+        """推播文字訊息給所有好友（同步，含重試）"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            ok, retryable = self._send(message)
+            if ok:
+                self.stats['sent'] += 1
+                METRICS.inc('line_messages', result='sent')
+                return True
+            if not retryable:
+                break
+        self.stats['failed'] += 1
+        METRICS.inc('line_messages', result='failed')
+        return False
+    
+    # =========================================================================
+    # 非同步佇列
+    # =========================================================================
+    
+    def enqueue(self, message: str, dedup_key: tuple = None) -> bool:
+        """
+        將訊息放入發送佇列後立即返回（不做任何網路請求）
+        
+        Args:
+            dedup_key: 已登記的去重鍵 (timestamp, signal_type)；丟棄或最終發送失敗時撤銷登記
+        
+        Returns:
+            是否成功放入（佇列已滿則丟棄）
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((message, dedup_key))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            print("[LINE] 發送佇列已滿，丟棄訊息")
+            self._release(dedup_key)
             return False
+        self.stats['queued'] += 1
+        return True
+    
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._drain, name="line-notifier", daemon=True)
+                self._worker.start()
+    
+    def _drain(self):
+        """背景 worker：依序取出佇列訊息發送"""
+        while True:
+            message, dedup_key = self._queue.get()
+            sent = False
+            try:
+                sent = self.broadcast(message)
+            finally:
+                if not sent:
+                    self._release(dedup_key)
+                self._queue.task_done()
+    
+    def flush(self, timeout: float = None) -> bool:
+        """等待佇列清空（測試 / 關閉時使用）"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    def get_queue_stats(self) -> dict:
+        return {**self.stats, 'pending': self._queue.qsize()}
     
     def format_signal_message(self, time_str: str, close: float,
                                lights: list,
-                               long_entry_prob, short_entry_prob) -> str:
+                               long_entry_prob, short_entry_prob,
+                               symbol: str = None) -> str:
         """
         格式化訊號推播訊息
         
@@ -88,6 +224,7 @@ class LineNotifier:
             lights: 4個燈號顏色 ['red','gray','green','gray']
             long_entry_prob: 多單買進機率
             short_entry_prob: 空單買進機率
+            symbol: 商品代碼（非預設商品時於標題顯示 SYMBOL_LABELS 名稱）
         """
         # 燈號
         light_icons = []
@@ -104,8 +241,12 @@ class LineNotifier:
         long_str = self._format_prob(long_entry_prob, "多")
         short_str = self._format_prob(short_entry_prob, "空")
         
+        title = "📊 TX 訊號通知"
+        if symbol and symbol != API_CONFIG['symbol']:
+            title = f"📊 {SYMBOL_LABELS.get(symbol, symbol)} 訊號通知"
+        
         lines = [
-            "📊 TX 訊號通知",
+            title,
             f"⏰ {time_str}  |  收盤 {close:.0f}",
             f"🚦 {lights_str}",
             "",
@@ -133,12 +274,14 @@ class LineNotifier:
     def check_and_notify(self, time_str: str, close: float,
                           lights: list,
                           long_entry_prob, short_entry_prob,
-                          timestamp_key: int = None):
+                          timestamp_key: int = None, symbol: str = None):
         """
-        檢查是否需要發送通知（信心度 > 60%）
+        檢查是否需要發送通知（信心度 > 60%），符合則放入發送佇列
         
         Args:
             timestamp_key: 用來避免重複發送的唯一識別碼
+            symbol: 商品代碼；非預設商品的去重鍵加上商品前綴，
+                    避免同一根 K 棒的不同商品互相擋掉
         """
         # 檢查是否有 > 60% 的訊號
         has_long = long_entry_prob is not None and long_entry_prob > 0.60
@@ -148,25 +291,78 @@ class LineNotifier:
             return False
         
         # 避免重複發送
+        dedup_key = None
         if timestamp_key:
             sig_type = ""
             if has_long:
                 sig_type += "L"
             if has_short:
                 sig_type += "S"
-            key = f"{timestamp_key}_{sig_type}"
-            if key in self._sent_keys:
+            if symbol and symbol != API_CONFIG['symbol']:
+                sig_type = f"{symbol}:{sig_type}"
+            dedup_key = (int(timestamp_key), sig_type)
+            if not self._claim(*dedup_key):
                 return False
-            self._sent_keys.add(key)
-            # 只保留最近 500 筆
-            if len(self._sent_keys) > 500:
-                self._sent_keys = set(list(self._sent_keys)[-300:])
         
-        # 組合訊息並發送
+        # 組合訊息並放入發送佇列
         msg = self.format_signal_message(
-            time_str, close, lights, long_entry_prob, short_entry_prob
+            time_str, close, lights, long_entry_prob, short_entry_prob, symbol
         )
-        return self.broadcast(msg)
+        return self.enqueue(msg, dedup_key)
+    
+    def _claim(self, timestamp: int, signal_type: str) -> bool:
+        """
+        登記 (timestamp, signal_type)，已登記過則返回 False
+        
+        先查本機快取（O(1)），未命中再交由 DB 的主鍵 INSERT OR IGNORE 判定，
+        讓重啟後或其他進程已發送的訊號不會重發。
+        登記在放入佇列前完成；訊息被丟棄或重試後仍失敗時由 _release 撤銷。
+        """
+        key = (timestamp, signal_type)
+        now = time.time()
+        with self._dedup_lock:
+            self._evict(now)
+            if key in self._sent_keys:
+                return False
+            
+            if self.db is not None:
+                try:
+                    claimed = self.db.claim_notification(timestamp, signal_type)
+                except Exception as e:
+                    print(f"[LINE] 去重紀錄寫入失敗，改用本機快取: {e}")
+                    claimed = True
+                if now - self._last_db_cleanup > 3600:
+                    self._last_db_cleanup = now
+                    try:
+                        self.db.cleanup_notifications(self.dedup_ttl)
+                    except Exception:
+                        pass
+            else:
+                claimed = True
+            
+            self._sent_keys[key] = now
+            return claimed
+    
+    def _release(self, key: tuple):
+        """撤銷登記（本機快取 + DB），讓未送出的訊號之後仍可發送"""
+        if key is None:
+            return
+        with self._dedup_lock:
+            self._sent_keys.pop(key, None)
+        if self.db is not None:
+            try:
+                self.db.release_notification(*key)
+            except Exception as e:
+                print(f"[LINE] 撤銷去重紀錄失敗: {e}")
+    
+    def _evict(self, now: float):
+        """從最舊端淘汰過期或超出容量的快取"""
+        cutoff = now - self.dedup_ttl
+        while self._sent_keys:
+            sent_at = next(iter(self._sent_keys.values()))
+            if sent_at >= cutoff and len(self._sent_keys) < self.dedup_cache_size:
+                break
+            self._sent_keys.popitem(last=False)
     
     def send_test(self) -> bool:
         """發送測試訊息"""
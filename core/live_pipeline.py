@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+即時訊號管線模組
+伺服器端在每根 5 分 K 收盤後觸發，不依賴瀏覽器刷新
+
+流程：
+  K 棒邊界後 → 短間隔輪詢 API 直到新 K 棒出現
+            → 合併工作資料 → 尾端增量計算特徵 → 模型評分 → LINE 通知
+  每一輪記錄「K 棒收盤 → 訊號送出」的端到端延遲
+
+排程執行緒只負責觸發（trigger），輪詢等待在管線自己的執行緒進行，
+不會讓同一排程器上的其他工作排在最長 max_wait 的等待之後
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FEATURE_NAMES, LIVE_CONFIG
+from core.signal_predictor import calc_row_lights
+
+
+BAR_SECONDS = 300
+# 各時段收盤前最後一根（之後不會再有新 K 棒）
+SESSION_FINAL_BARS = ((13, 40), (4, 55))
+
+
+class SystemClock:
+    """系統時鐘（回放模式可替換為虛擬時鐘）"""
+    
+    def now(self) -> datetime:
+        return datetime.now()
+    
+    def time(self) -> float:
+        return time.time()
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+def get_last_bar_boundary(now: Optional[datetime] = None) -> datetime:
+    """取得最近一個 5 分 K 邊界（即剛收盤 K 棒的收盤時間）"""
+    now = now or datetime.now()
+    return now.replace(minute=(now.minute // 5) * 5, second=0, microsecond=0)
+
+
+def is_trading_bar(bar_dt: datetime) -> bool:
+    """
+    判斷 K 棒時間是否在交易時段內
+      日盤: 08:45 ~ 13:40 (最後一根 13:40 於 13:45 收盤)
+      夜盤: 15:00 ~ 隔日 04:55
+    """
+    t_min = bar_dt.hour * 60 + bar_dt.minute
+    if 8 * 60 + 45 <= t_min <= 13 * 60 + 40:
+        return True
+    return t_min >= 15 * 60 or t_min <= 4 * 60 + 55
+
+
+def is_session_final_bar(bar_dt: datetime) -> bool:
+    """是否為日盤 / 夜盤收盤前最後一根 K 棒"""
+    return (bar_dt.hour, bar_dt.minute) in SESSION_FINAL_BARS
+
+
+class LivePipeline:
+    """5 分 K 收盤觸發的即時管線"""
+    
+    def __init__(self, db_manager, data_fetcher, feature_calculator,
+                 signal_predictor, line_notifier=None, config: dict = None,
+                 clock=None, symbol: Optional[str] = None):
+        self.db = db_manager
+        self.fetcher = data_fetcher
+        self.fc = feature_calculator
+        self.predictor = signal_predictor
+        self.notifier = line_notifier
+        self.config = {**LIVE_CONFIG, **(config or {})}
+        self.clock = clock or SystemClock()
+        self.symbol = symbol or getattr(data_fetcher, 'symbol', None)
+        
+        # 工作資料（只保留尾端 feature_tail_bars 根）
+        self._frame = pd.DataFrame()
+        self._lock = threading.Lock()
+        
+        self.latencies = deque(maxlen=self.config['latency_history'])
+        self.last_result: Optional[dict] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def register(self, jobs):
+        """註冊到 JobScheduler：每個 5 分 K 邊界後觸發（在管線自己的執行緒處理）"""
+        jobs.add_interval('bar_close', self.trigger, BAR_SECONDS,
+                          offset=self.config['trigger_offset'], label='5分K收盤')
+    
+    def trigger(self, boundary: Optional[datetime] = None) -> Future:
+        """
+        由排程執行緒呼叫：邊界時間在觸發當下決定，處理交給單一工作執行緒後立即返回
+        
+        Returns:
+            on_bar_close 的 Future
+        """
+        boundary = boundary or get_last_bar_boundary(self.clock.now())
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"live-{self.symbol}")
+        future = self._executor.submit(self.on_bar_close, boundary)
+        future.add_done_callback(self._log_failure)
+        return future
+    
+    def _log_failure(self, future: Future):
+        e = future.exception()
+        if e is not None:
+            print(f"[即時] {self.symbol} 管線失敗: {e}")
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    # =========================================================================
+    # 主流程
+    # =========================================================================
+    
+    def on_bar_close(self, boundary: Optional[datetime] = None) -> Optional[dict]:
+        """
+        處理剛收盤的 K 棒
+        
+        Args:
+            boundary: K 棒邊界時間，預設為目前時間所在的邊界
+        
+        Returns:
+            本輪結果（含各階段延遲），非交易時段或無資料則為 None
+        """
+        boundary = boundary or get_last_bar_boundary(self.clock.now())
+        closed_dt = boundary - timedelta(seconds=BAR_SECONDS)
+        if not is_trading_bar(closed_dt):
+            return None
+        
+        with self._lock:
+            close_ts = boundary.timestamp()
+            
+            # Step 1: 輪詢直到新 K 棒出現
+            bars = self._wait_for_bar(boundary, closed_dt)
+            if bars is None:
+                print(f"[即時] {closed_dt.strftime('%H:%M')} 等待逾時，API 無新 K 棒")
+                return None
+            wait = self.clock.time() - close_ts
+            t_available = time.perf_counter()
+            
+            # Step 2: 合併工作資料 + 尾端特徵計算
+            self._update_frame(bars)
+            processed = self.fc.calculate_all(self._frame)
+            row = processed[processed['datetime'] == closed_dt]
+            if row.empty or not all(f in row.columns for f in FEATURE_NAMES):
+                print(f"[即時] {closed_dt.strftime('%H:%M')} 無對應 K 棒或特徵")
+                return None
+            row = row.iloc[-1]
+            t_features = time.perf_counter()
+            
+            # Step 3: 模型評分
+            features = row[FEATURE_NAMES].values.astype(float).reshape(1, -1)
+            if np.any(np.isnan(features)):
+                return None
+            with self.predictor.model_set():
+                long_prob = self.predictor.predict_single(features, 'long_entry')
+                short_prob = self.predictor.predict_single(features, 'short_entry')
+            t_scored = time.perf_counter()
+            
+            # 收盤 K 棒 + 特徵寫入 DB（沒有 DataScheduler 存檔的商品）
+            if self.config['persist']:
+                try:
+                    self.db.save_ohlcv_bulk(row.to_frame().T)
+                except Exception as e:
+                    print(f"[即時] {self.symbol} K 棒寫入失敗: {e}")
+            
+            # Step 4: LINE 通知
+            lights = calc_row_lights({f: float(row[f]) for f in FEATURE_NAMES})
+            notified = False
+            if self.notifier:
+                notified = self.notifier.check_and_notify(
+                    time_str=closed_dt.strftime('%H:%M'), close=float(row['close']),
+                    lights=lights,
+                    long_entry_prob=long_prob, short_entry_prob=short_prob,
+                    timestamp_key=int(row['timestamp']), symbol=self.symbol,
+                )
+            t_done = time.perf_counter()
+        
+        # 等待時間以時鐘計（回放時為虛擬秒），處理階段以實際耗時計
+        processing = t_done - t_available
+        result = {
+            'symbol': self.symbol,
+            'bar': closed_dt,
+            'timestamp': int(row['timestamp']),
+            'close': float(row['close']),
+            'long_entry': long_prob,
+            'short_entry': short_prob,
+            'lights': lights,
+            'notified': bool(notified),
+            # 延遲（秒）
+            'wait': wait,
+            'features': t_features - t_available,
+            'scoring': t_scored - t_features,
+            'notify': t_done - t_scored,
+            'processing': processing,
+            'total': wait + processing,
+        }
+        self.last_result = result
+        self.latencies.append(result)
+        print(f"[即時] {closed_dt.strftime('%H:%M')} 多 {long_prob:.0%} / 空 {short_prob:.0%} "
+              f"| 收盤→訊號 {result['total']:.2f}s (處理 {result['processing']:.2f}s)")
+        return result
+    
+    def _wait_for_bar(self, boundary: datetime, closed_dt: datetime) -> Optional[pd.DataFrame]:
+        """
+        短間隔輪詢 API，直到出現邊界後的新 K 棒（代表 closed_dt 已定案）
+        
+        收盤前最後一根（13:40 / 04:55）之後不會有新 K 棒，出現即視為定案；
+        其他 K 棒等到 max_wait 仍只看到 closed_dt 時才視為定案。
+        """
+        deadline = self.clock.time() + self.config['max_wait']
+        latest_df = None
+        while True:
+            df = self.fetcher.fetch_raw(limit=self.config['poll_limit'])
+            if not df.empty:
+                latest = df['datetime'].iloc[-1]
+                if latest >= boundary:
+                    return df
+                latest_df = df
+                if latest == closed_dt and is_session_final_bar(closed_dt):
+                    return df
+                # 最新 K 棒遠早於收盤 K 棒 → 休市，不再等待
+                if latest < closed_dt - timedelta(hours=1):
+                    return None
+            if self.clock.time() >= deadline:
+                if latest_df is not None and latest_df['datetime'].iloc[-1] == closed_dt:
+                    return latest_df
+                return None
+            self.clock.sleep(self.config['poll_interval'])
+    
+    def _update_frame(self, bars: pd.DataFrame):
+        """將輪詢到的 K 棒併入工作資料；與工作資料無重疊時重新載入"""
+        if self._frame.empty or bars['timestamp'].min() > self._frame['timestamp'].iloc[-1]:
+            self._bootstrap()
+        
+        combined = pd.concat([self._frame, bars], ignore_index=True)
+        combined = combined.drop_duplicates(subset=['timestamp'], keep='last')
+        combined = combined.sort_values('timestamp').reset_index(drop=True)
+        self._frame = combined.tail(self.config['feature_tail_bars']).reset_index(drop=True)
+    
+    def _bootstrap(self):
+        """以 DB 歷史 + 完整 API 資料建立工作資料"""
+        db_data = self.db.load_ohlcv(days=5)
+        api_data = self.fetcher.fetch_raw()
+        frames = [f for f in (db_data, api_data) if not f.empty]
+        if not frames:
+            self._frame = pd.DataFrame()
+            return
+        combined = pd.concat(frames, ignore_index=True)
+        combined = combined.drop_duplicates(subset=['timestamp'], keep='last')
+        self._frame = combined.sort_values('timestamp').reset_index(drop=True)
+    
+    # =========================================================================
+    # 延遲統計
+    # =========================================================================
+    
+    def get_latency_stats(self) -> dict:
+        """取得端到端延遲統計（秒）"""
+        if not self.latencies:
+            return {'count': 0}
+        totals = np.array([r['total'] for r in self.latencies])
+        processing = np.array([r['processing'] for r in self.latencies])
+        return {
+            'count': len(totals),
+            'last_total': float(totals[-1]),
+            'last_processing': float(processing[-1]),
+            'p50_total': float(np.percentile(totals, 50)),
+            'p95_total': float(np.percentile(totals, 95)),
+            'p50_processing': float(np.percentile(processing, 50)),
+            'p95_processing': float(np.percentile(processing, 95)),
+        }
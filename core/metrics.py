@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+效能量測模組
+以 context manager 計時熱點（API 抓取、解析、DB 讀寫、特徵、預測、推播），
+數據存於固定桶數的直方圖（記憶體固定，不隨執行時間成長），
+並可輸出 Prometheus text format（檔案或 HTTP /metrics）
+
+用法：
+  from core.metrics import METRICS, timed
+  
+  with METRICS.timer('calculate_all'):
+      ...
+  
+  @timed('fetch_raw')
+  def fetch_raw(...): ...
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+import os
+
+
+# 預設直方圖桶上限（秒），涵蓋 0.1ms ~ 30s
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = "tx_"
+
+
+class Histogram:
+    """固定桶直方圖（與 Prometheus histogram 相同的累積桶語意）"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最後一格為 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            self.last = value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float:
+        """由桶分佈線性內插估計分位數（限制在實際觀測的最小 / 最大值之間）"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            lo, hi = self.min, self.max
+        if total == 0:
+            return 0.0
+        
+        rank = q * total
+        cumulative = 0
+        estimate = hi
+        for i, c in enumerate(counts):
+            if c and cumulative + c >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else hi
+                estimate = lower + (upper - lower) * (rank - cumulative) / c
+                break
+            cumulative += c
+        return min(max(estimate, lo), hi)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            count, total, last = self.count, self.sum, self.last
+        return {
+            'count': count,
+            'avg': total / count if count else 0.0,
+            'last': last,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+
+class MetricsRegistry:
+    """計時直方圖 + 計數器"""
+    
+    def __init__(self):
+        # (name, labels) → Histogram / 數值；labels 為排序後的 (key, value) tuple
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = self._key(name, labels)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram())
+        return hist
+    
+    def observe(self, name: str, seconds: float, **labels):
+        self.histogram(name, **labels).observe(seconds)
+    
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """計時區塊（例外時仍記錄耗時並累加 <name>_errors 計數）"""
+        hist = self.histogram(name, **labels)
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors", **labels)
+            raise
+        finally:
+            hist.observe(time.perf_counter() - t0)
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def get_counter(self, name: str, **labels) -> float:
+        return self._counters.get(self._key(name, labels), 0)
+    
+    def get_stats(self, name: str, **labels) -> dict:
+        """取得單一計時的統計（未曾記錄則 count 為 0）"""
+        hist = self._histograms.get(self._key(name, labels))
+        return hist.get_stats() if hist else {'count': 0}
+    
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+    
+    # =========================================================================
+    # 輸出
+    # =========================================================================
+    
+    @staticmethod
+    def _format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+        pairs = list(labels) + list(extra or ())
+        if not pairs:
+            return ""
+        body = ",".join(f'{k}="{v}"' for k, v in pairs)
+        return "{" + body + "}"
+    
+    def render_prometheus(self) -> str:
+        """輸出 Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        
+        lines = []
+        seen = set()
+        for (name, labels), hist in histograms:
+            metric = f"{METRIC_PREFIX}{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            with hist._lock:
+                counts = list(hist.counts)
+                count, total = hist.count, hist.sum
+            cumulative = 0
+            for bound, c in zip(hist.buckets + (float('inf'),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{self._format_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{self._format_labels(labels)} {count}")
+        
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._format_labels(labels)} {value:g}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def write_textfile(self, path: str):
+        """寫出 .prom 檔（先寫暫存檔再 rename，讀取端不會看到半份內容）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# 全域 registry（各模組共用）
+METRICS = MetricsRegistry()
+
+
+def timed(name: str, **labels):
+    """函式計時 decorator"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = METRICS.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """在背景執行緒提供 GET /metrics"""
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[Metrics] HTTP 端點: http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
@@ -2,16 +2,26 @@
 """
 模型載入模組
 負責載入和管理 XGBoost 模型
+
+模型組指紋：載入時對各模型檔內容與 THRESHOLDS 取 SHA-256，
+存入 DB 的預測以此標記，換模型後可只重算指紋不符的 K 棒
+
+熱更新：背景執行緒輪詢模型檔 mtime / 大小，有變動且連續兩次輪詢相同（檔案已寫完）時在背景載入新的一組，
+經 validate（例如以最近 K 棒做 canary 評分）通過後，整組（模型 + 指紋）一次替換；
+評分端以 SignalPredictor.model_set() 固定一組，替換不會讓同一輪評分混用新舊模型
 """
 
+import hashlib
+import json
+import threading
 import xgboost as xgb
 import os
 import sys
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import MODEL_FILES
+from config import MODEL_FILES, THRESHOLDS, MODEL_RELOAD_CONFIG
 
 
 class ModelLoader:
@@ -28,14 +38,30 @@ class ModelLoader:
             model_files: 模型檔案路徑字典，格式如 MODEL_FILES
         """
         self.model_files = model_files or MODEL_FILES
-        self.models: Dict[str, List[xgb.Booster]] = {
-            'long_entry': [],
-            'long_exit': [],
-            'short_entry': [],
-            'short_exit': []
-        }
+        # (模型, 指紋) 以單一 tuple 持有，整組替換為一次參照指派
+        self._active: Tuple[Dict[str, List[xgb.Booster]], Optional[str]] = (
+            {target: [] for target in self.model_files}, None)
         self.loaded = False
         self.load_errors: List[str] = []
+        self._file_state: dict = {}
+        self._pending_state: Optional[dict] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.reloads = 0
+        self.last_reload_error: Optional[str] = None
+    
+    @property
+    def models(self) -> Dict[str, List[xgb.Booster]]:
+        return self._active[0]
+    
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._active[1]
+    
+    def snapshot(self) -> Tuple[Dict[str, List[xgb.Booster]], Optional[str]]:
+        """目前使用中的 (模型, 指紋)"""
+        return self._active
     
     def load_all(self) -> bool:
         """
@@ -44,39 +70,163 @@ class ModelLoader:
         Returns:
             是否全部載入成功
         """
-        self.load_errors = []
-        success = True
+        with self._reload_lock:
+            models, fingerprint, errors, file_state = self._load_set()
+            self._swap(models, fingerprint, errors, file_state)
+        return not errors
+    
+    def _load_set(self) -> tuple:
+        """
+        載入一組新模型（不影響使用中的模型）
+        
+        每個檔案只讀一次：模型、指紋與檔案狀態都取自同一份內容，
+        讀取之後檔案才變動時，下一輪輪詢會看到狀態不同
+        """
+        models = {}
+        errors = []
+        file_state = {}
+        digest = hashlib.sha256()
         
         for target, paths in self.model_files.items():
-            self.models[target] = []
+            models[target] = []
             for path in paths:
-                model = self._load_single_model(path)
+                data, file_state[path] = self._read_file(path)
+                model = self._load_single_model(path, data)
                 if model is not None:
-                    self.models[target].append(model)
+                    models[target].append(model)
+                    digest.update(target.encode())
+                    digest.update(data)
                 else:
-                    success = False
-                    self.load_errors.append(f"無法載入: {path}")
+                    errors.append(f"無法載入: {path}")
         
-        self.loaded = success
-        return success
+        digest.update(json.dumps(THRESHOLDS, sort_keys=True).encode())
+        fingerprint = digest.hexdigest()[:16] if any(models.values()) else None
+        return models, fingerprint, errors, file_state
+    
+    def _swap(self, models, fingerprint, errors, file_state):
+        self._active = (models, fingerprint)
+        self.load_errors = errors
+        self.loaded = not errors
+        self._file_state = file_state
+    
+    # =========================================================================
+    # 熱更新
+    # =========================================================================
+    
+    @staticmethod
+    def _read_file(path: str) -> tuple:
+        """讀取模型檔內容，連同讀取當下的 (mtime, 大小)；檔案不存在時為 (None, None)"""
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                data = f.read()
+        except FileNotFoundError:
+            return None, None
+        return data, (st.st_mtime_ns, st.st_size)
+    
+    def _stat_files(self) -> dict:
+        state = {}
+        for paths in self.model_files.values():
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                    state[path] = (st.st_mtime_ns, st.st_size)
+                except FileNotFoundError:
+                    state[path] = None
+        return state
+    
+    def reload_if_changed(self, validate: Optional[Callable[[dict], List[str]]] = None) -> bool:
+        """
+        模型檔有變動時載入新的一組並驗證，通過才替換
+        
+        Args:
+            validate: 驗證函式，傳入新模型 {target: [Booster]}，回傳錯誤訊息列表（空表示通過）
+        
+        Returns:
+            是否已替換為新的一組
+        """
+        with self._reload_lock:
+            file_state = self._stat_files()
+            if file_state == self._file_state:
+                self._pending_state = None
+                return False
+            if file_state != self._pending_state:
+                # 複製中的檔案 mtime / 大小仍在變：等下一輪狀態不變才載入
+                self._pending_state = file_state
+                return False
+            self._pending_state = None
+            
+            models, fingerprint, errors, file_state = self._load_set()
+            if fingerprint == self.fingerprint:
+                # 只有 mtime 變動（內容相同）
+                self._file_state = file_state
+                return False
+            
+            # 檔案寫到一半或損毀時會少載入模型：模型數不可少於使用中的那組
+            problems = [f"{target}: 只載入 {len(boosters)}/{len(self.models.get(target, []))} 個模型"
+                        for target, boosters in models.items()
+                        if len(boosters) < len(self.models.get(target, []))]
+            if not problems and validate is not None:
+                try:
+                    problems = list(validate(models))
+                except Exception as e:
+                    problems = [f"驗證失敗: {e}"]
+            if problems:
+                # 記下這次的檔案狀態，檔案再次變動前不重試
+                self._file_state = file_state
+                self.last_reload_error = "; ".join(problems)
+                print(f"[模型] 新模型未通過驗證，沿用 {self.fingerprint}: {self.last_reload_error}")
+                return False
+            
+            old = self.fingerprint
+            self._swap(models, fingerprint, errors, file_state)
+            self.reloads += 1
+            self.last_reload_error = None
+            print(f"[模型] 熱更新完成: {old} → {fingerprint}（{sum(len(m) for m in models.values())} 個模型）")
+            return True
+    
+    def start_watcher(self, validate: Optional[Callable[[dict], List[str]]] = None,
+                      interval: Optional[float] = None):
+        """啟動背景輪詢執行緒（重複呼叫無作用）"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        interval = interval or MODEL_RELOAD_CONFIG['poll_interval']
+        self._stop_event.clear()
+        
+        def _poll():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.reload_if_changed(validate)
+                except Exception as e:
+                    print(f"[模型] 熱更新檢查失敗: {e}")
+        
+        self._watcher = threading.Thread(target=_poll, name="model-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+        self._watcher = None
     
-    def _load_single_model(self, path: str) -> Optional[xgb.Booster]:
+    def _load_single_model(self, path: str, data: Optional[bytes]) -> Optional[xgb.Booster]:
         """
         載入單一模型
         
         Args:
-            path: 模型檔案路徑
+            path: 模型檔案路徑（訊息用）
+            data: 已讀取的檔案內容，None 表示檔案不存在
         
         Returns:
             XGBoost Booster 物件，若失敗則返回 None
         """
-        if not os.path.exists(path):
+        if data is None:
             print(f"模型檔案不存在: {path}")
             return None
         
         try:
             model = xgb.Booster()
-            model.load_model(path)
+            model.load_model(bytearray(data))
             return model
         except Exception as e:
             print(f"載入模型失敗 {path}: {e}")
@@ -131,7 +281,10 @@ class ModelLoader:
             'total_models': total,
             'expected': 20,
             'by_target': counts,
-            'errors': self.load_errors
+            'errors': self.load_errors,
+            'fingerprint': self.fingerprint,
+            'reloads': self.reloads,
+            'reload_error': self.last_reload_error,
         }
 
 
@@ -154,6 +307,7 @@ if __name__ == "__main__":
     
     print(f"\n載入結果: {'成功' if success else '失敗'}")
     print(f"總模型數: {status['total_models']}/{status['expected']}")
+    print(f"模型組指紋: {status['fingerprint']}")
     print(f"各目標模型數:")
     for target, count in status['by_target'].items():
         print(f"  - {TARGET_NAMES.get(target, target)}: {count}/5")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+多商品監控模組
+每個商品一條獨立的 LivePipeline（各自的 DB 視圖、抓取器、工作資料、持單狀態），
+共用同一組已載入的模型（ModelLoader 只讀，不重複載入 20 個 booster）
+
+每根 5 分 K 收盤時，邊界時間只算一次，各商品管線（含主商品）交給執行緒池並行：
+抓取 / 輪詢為 I/O 等待，XGBoost 評分會釋放 GIL，
+因此總延遲約為最慢的單一商品，而非各商品相加；
+排程工作只負責送出，不在排程執行緒上等待
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DATABASE_PATH, MONITOR_CONFIG, LIVE_CONFIG, SYMBOL_LABELS
+from core.db_manager import DBManager
+from core.data_fetcher import DataFetcher
+from core.feature_calculator import FeatureCalculator
+from core.signal_predictor import SignalPredictor
+from core.live_pipeline import LivePipeline, SystemClock, BAR_SECONDS, get_last_bar_boundary
+
+
+class MultiSymbolMonitor:
+    """多商品 K 棒收盤管線"""
+    
+    def __init__(self, symbols: List[str], model_loader,
+                 db_path: str = DATABASE_PATH, line_notifier=None,
+                 max_workers: Optional[int] = None, config: dict = None,
+                 base_url: Optional[str] = None, clock=None,
+                 primary: Optional[LivePipeline] = None):
+        """
+        Args:
+            symbols: 商品代碼清單
+            model_loader: 已載入模型的 ModelLoader（各商品共用）
+            db_path: 資料庫路徑（各商品以 symbol 欄位區分）
+            line_notifier: 共用的 LineNotifier（去重鍵含商品代碼）
+            max_workers: 執行緒池大小上限，預設 MONITOR_CONFIG['max_workers']
+            config: 覆寫 LIVE_CONFIG；未指定 persist 時預設即時寫入 DB
+            base_url: 覆寫 API 位址（例如本機替身伺服器）
+            primary: 主商品的 LivePipeline（由 DataScheduler 存檔）；指定時與其他商品同一工作並行觸發
+        """
+        self.symbols = list(dict.fromkeys(symbols))
+        self.model_loader = model_loader
+        self.clock = clock or SystemClock()
+        config = {**LIVE_CONFIG, 'persist': True, **(config or {})}
+        self.trigger_offset = config['trigger_offset']
+        
+        self.primary = primary
+        self.pipelines: Dict[str, LivePipeline] = {}
+        for symbol in self.symbols:
+            db = DBManager(db_path, symbol)
+            self.pipelines[symbol] = LivePipeline(
+                db, DataFetcher(base_url, symbol), FeatureCalculator(),
+                SignalPredictor(model_loader), line_notifier,
+                config=config, clock=self.clock, symbol=symbol,
+            )
+        
+        workers = max_workers or MONITOR_CONFIG['max_workers']
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(self._all_pipelines()))),
+                                        thread_name_prefix='symbol')
+    
+    @staticmethod
+    def label(symbol: str) -> str:
+        return SYMBOL_LABELS.get(symbol, symbol)
+    
+    def _all_pipelines(self) -> Dict[str, LivePipeline]:
+        """主商品（若有）+ 其他商品"""
+        if self.primary is None:
+            return dict(self.pipelines)
+        return {self.primary.symbol: self.primary, **self.pipelines}
+    
+    def register(self, jobs, keep_days: Optional[int] = None):
+        """
+        註冊到 JobScheduler：收盤觸發一個工作送出全部商品（含主商品），另加其他商品每日清理
+        
+        主商品的清理由 DataScheduler 負責，這裡不重複註冊
+        """
+        jobs.add_interval('bar_close', self.trigger, BAR_SECONDS,
+                          offset=self.trigger_offset, label='5分K收盤（全商品）')
+        keep_days = keep_days or MONITOR_CONFIG['keep_days']
+        for symbol, pipeline in self.pipelines.items():
+            jobs.add_daily(f'cleanup_{symbol}',
+                           lambda db=pipeline.db: db.cleanup_by_trading_days(keep_days),
+                           5, 30, label=f'{self.label(symbol)} 清理')
+    
+    def trigger(self, boundary: Optional[datetime] = None) -> Dict[str, Future]:
+        """
+        由排程執行緒呼叫：各商品送進執行緒池後立即返回（失敗只記錄，不影響其他商品）
+        
+        Returns:
+            {symbol: on_bar_close 的 Future}
+        """
+        boundary = boundary or get_last_bar_boundary(self.clock.now())
+        futures = {}
+        for symbol, pipeline in self._all_pipelines().items():
+            future = self._pool.submit(pipeline.on_bar_close, boundary)
+            future.add_done_callback(lambda f, symbol=symbol: self._log_failure(symbol, f))
+            futures[symbol] = future
+        return futures
+    
+    def _log_failure(self, symbol: str, future: Future):
+        e = future.exception()
+        if e is not None:
+            print(f"[多商品] {self.label(symbol)} 管線失敗: {e}")
+    
+    def on_bar_close(self, boundary: Optional[datetime] = None) -> Dict[str, Optional[dict]]:
+        """
+        各商品並行處理剛收盤的 K 棒，等待全部完成
+        
+        Returns:
+            {symbol: 該商品本輪結果}；失敗的商品為 None，不影響其他商品
+        """
+        futures = self.trigger(boundary)
+        results = {}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception:
+                results[symbol] = None
+        return results
+    
+    def get_latency_stats(self) -> Dict[str, dict]:
+        return {symbol: p.get_latency_stats() for symbol, p in self._all_pipelines().items()}
+    
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
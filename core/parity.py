@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+特徵數值一致性（golden output）模組
+凍結目前 FeatureCalculator.calculate_all 的輸出，作為對齊 Excel 公式的參考答案；
+任何替代引擎（向量化、增量、編譯版）都逐特徵比對容許誤差，並回報第一個分歧點
+
+golden 檔（npz）同時保存輸入 OHLCV，比對時不依賴 CSV 或亂數產生器的版本
+"""
+
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import BASE_DIR, FEATURE_NAMES
+
+GOLDEN_DIR = os.path.join(BASE_DIR, "golden")
+HISTORY_CSV = os.path.join(BASE_DIR, "260207_history.csv")
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# 隨機串流：(名稱, 種子, 筆數)
+RANDOM_STREAMS = [
+    ('random_0', 0, 1500),
+    ('random_1', 1, 1500),
+    ('random_edge', 2, 1500),
+]
+
+# 預設容許誤差（atol, rtol）；型態類特徵為離散值，要求完全一致
+DEFAULT_TOLERANCE = (1e-9, 1e-7)
+FEATURE_TOLERANCES = {
+    'N_Pattern': (0.0, 0.0),
+    'Three_Soldiers': (1e-12, 0.0),
+    'ThreeK_Reversal': (1e-12, 0.0),
+}
+
+
+def _random_stream(seed: int, n: int, edge_cases: bool = False) -> pd.DataFrame:
+    """隨機 OHLCV；edge_cases 時混入十字線、零成交量、跳空與一字線"""
+    from core.feature_profiler import synthetic_bars
+    bars = synthetic_bars(n, seed=seed)
+    if edge_cases:
+        rng = np.random.default_rng(seed + 100)
+        idx = rng.choice(n, size=n // 10, replace=False)
+        kinds = rng.integers(0, 4, len(idx))
+        for i, kind in zip(idx, kinds):
+            if kind == 0:      # 十字線（開 = 收）
+                bars.loc[i, 'close'] = bars.loc[i, 'open']
+            elif kind == 1:    # 零成交量
+                bars.loc[i, 'volume'] = 0
+            elif kind == 2:    # 跳空
+                bars.loc[i:, ['open', 'high', 'low', 'close']] += rng.choice([-150, 150])
+            else:              # 一字線（高 = 低）
+                price = bars.loc[i, 'open']
+                bars.loc[i, ['high', 'low', 'close']] = price
+        bars['high'] = bars[['open', 'high', 'close']].max(axis=1)
+        bars['low'] = bars[['open', 'low', 'close']].min(axis=1)
+    return bars
+
+
+def golden_inputs() -> Dict[str, pd.DataFrame]:
+    """產生凍結用的輸入：歷史 CSV + 隨機串流"""
+    from import_history import read_history_csv
+    inputs = {'history': read_history_csv(HISTORY_CSV)}
+    for name, seed, n in RANDOM_STREAMS:
+        inputs[name] = _random_stream(seed, n, edge_cases=name.endswith('edge'))
+    return inputs
+
+
+def freeze(engine: Callable[[pd.DataFrame], pd.DataFrame],
+           inputs: Optional[Dict[str, pd.DataFrame]] = None,
+           golden_dir: str = GOLDEN_DIR) -> list:
+    """
+    以 engine 計算並寫出 golden 檔
+    
+    Returns:
+        寫出的檔案路徑
+    """
+    inputs = inputs or golden_inputs()
+    os.makedirs(golden_dir, exist_ok=True)
+    paths = []
+    for name, bars in inputs.items():
+        bars = bars.reset_index(drop=True)
+        output = engine(bars)
+        arrays = {f"in_{c}": bars[c].to_numpy(dtype=np.float64) for c in OHLCV_COLUMNS}
+        arrays['in_datetime'] = bars['datetime'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        arrays['in_timestamp'] = bars['timestamp'].to_numpy(dtype=np.int64)
+        for f in FEATURE_NAMES:
+            arrays[f] = output[f].to_numpy(dtype=np.float64)
+        path = os.path.join(golden_dir, f"{name}.npz")
+        np.savez_compressed(path, **arrays)
+        paths.append(path)
+        print(f"[Golden] {name}: {len(bars)} 根 → {path}")
+    return paths
+
+
+def load_golden(path: str) -> tuple:
+    """
+    讀取 golden 檔
+    
+    Returns:
+        (輸入 OHLCV DataFrame, {特徵: 參考值陣列})
+    """
+    with np.load(path) as data:
+        bars = pd.DataFrame({c: data[f"in_{c}"] for c in OHLCV_COLUMNS})
+        bars.insert(0, 'datetime', pd.to_datetime(data['in_datetime'], unit='s'))
+        bars.insert(0, 'timestamp', data['in_timestamp'])
+        reference = {f: data[f] for f in FEATURE_NAMES if f in data.files}
+    return bars, reference
+
+
+def compare_features(reference: Dict[str, np.ndarray], candidate: pd.DataFrame,
+                     datetimes: Optional[pd.Series] = None,
+                     tolerances: Optional[dict] = None) -> pd.DataFrame:
+    """
+    逐特徵比對
+    
+    規則：NaN 位置須一致；其餘 |cand - ref| <= atol + rtol * |ref|
+    
+    Returns:
+        每個特徵一列：mismatches、max_abs、max_rel、first_index、first_datetime、
+        first_reference、first_candidate
+    """
+    tolerances = {**FEATURE_TOLERANCES, **(tolerances or {})}
+    rows = []
+    for f in FEATURE_NAMES:
+        ref = reference[f]
+        if f not in candidate.columns:
+            rows.append({'feature': f, 'mismatches': len(ref), 'missing': True})
+            continue
+        cand = candidate[f].to_numpy(dtype=np.float64)
+        if len(cand) != len(ref):
+            rows.append({'feature': f, 'mismatches': abs(len(cand) - len(ref)) or len(ref),
+                         'missing': False, 'length': len(cand)})
+            continue
+        
+        atol, rtol = tolerances.get(f, DEFAULT_TOLERANCE)
+        ref_nan, cand_nan = np.isnan(ref), np.isnan(cand)
+        both = ~ref_nan & ~cand_nan
+        diff = np.where(both, np.abs(cand - ref), 0.0)
+        bad = (ref_nan != cand_nan) | (both & (diff > atol + rtol * np.abs(ref)))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel = np.where(both & (ref != 0), diff / np.abs(ref), 0.0)
+        row = {
+            'feature': f,
+            'mismatches': int(bad.sum()),
+            'missing': False,
+            'max_abs': float(diff.max()) if len(diff) else 0.0,
+            'max_rel': float(rel.max()) if len(rel) else 0.0,
+        }
+        if bad.any():
+            i = int(np.argmax(bad))
+            row.update({
+                'first_index': i,
+                'first_datetime': datetimes.iloc[i] if datetimes is not None else None,
+                'first_reference': float(ref[i]),
+                'first_candidate': float(cand[i]),
+            })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def check_engine(engine: Callable[[pd.DataFrame], pd.DataFrame],
+                 golden_dir: str = GOLDEN_DIR,
+                 tolerances: Optional[dict] = None) -> Dict[str, pd.DataFrame]:
+    """
+    以所有 golden 檔檢查 engine
+    
+    Returns:
+        {golden 名稱: compare_features 報表}
+    """
+    reports = {}
+    names = sorted(f[:-4] for f in os.listdir(golden_dir) if f.endswith('.npz'))
+    for name in names:
+        bars, reference = load_golden(os.path.join(golden_dir, f"{name}.npz"))
+        output = engine(bars.copy()).reset_index(drop=True)
+        reports[name] = compare_features(reference, output, bars['datetime'], tolerances)
+    return reports
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+回放模擬模組
+以歷史 K 棒驅動正式的即時管線（抓取 → 合併 → 特徵 → 評分 → 通知），
+不需等到開盤即可整合測試 LivePipeline / SignalPredictor / LineNotifier
+
+組成：
+  VirtualClock        離散事件虛擬時鐘；只有 sleep / advance_to 會推進時間，
+                      實際等待 = 虛擬秒 / speed，運算本身不消耗虛擬時間
+  ReplayFetcher       DataFetcher 子類，以虛擬時間向 charting API 替身取資料
+                      （ArchiveChartSource 直接呼叫，或經 HTTP 連 ChartServer）
+  ReplayLineNotifier  LineNotifier 子類，推播改為記錄訊息（佇列 / 去重流程相同）
+  ReplaySimulator     逐根觸發 on_bar_close，彙整各階段延遲並與批次回測比對
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import CHART_SERVER_CONFIG, FEATURE_NAMES, REPLAY_CONFIG, THRESHOLDS
+from core.chart_server import ArchiveChartSource, ChartServer, wall_to_epoch
+from core.data_fetcher import DataFetcher
+from core.db_manager import DBManager
+from core.feature_calculator import FeatureCalculator
+from core.line_notifier import LineNotifier
+from core.live_pipeline import BAR_SECONDS, LivePipeline
+
+
+LATENCY_STAGES = ['wait', 'features', 'scoring', 'notify', 'processing', 'total']
+
+
+class VirtualClock:
+    """離散事件虛擬時鐘（介面同 live_pipeline.SystemClock）"""
+    
+    def __init__(self, start: datetime, speed: float = 1000,
+                 idle_skip_seconds: float = 600):
+        self.speed = speed
+        self.idle_skip_seconds = idle_skip_seconds
+        self._now = start
+        self._lock = threading.Lock()
+    
+    def now(self) -> datetime:
+        with self._lock:
+            return self._now
+    
+    def time(self) -> float:
+        return self.now().timestamp()
+    
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        time.sleep(seconds / self.speed)
+        with self._lock:
+            self._now += timedelta(seconds=seconds)
+    
+    def advance_to(self, target: datetime):
+        """推進到 target；休市等長空檔直接跳過"""
+        gap = (target - self.now()).total_seconds()
+        if gap <= 0:
+            return
+        if gap > self.idle_skip_seconds:
+            with self._lock:
+                self._now = target
+        else:
+            self.sleep(gap)
+
+
+class ReplayFetcher(DataFetcher):
+    """
+    以虛擬時間查詢的 DataFetcher
+    
+    有 base_url 時走 HTTP（本機 ChartServer），否則直接呼叫 ArchiveChartSource
+    """
+    
+    def __init__(self, source: ArchiveChartSource, clock: VirtualClock,
+                 base_url: Optional[str] = None):
+        super().__init__(base_url)
+        self.source = source if base_url is None else None
+        self.clock = clock
+    
+    def fetch_raw(self, limit: Optional[int] = None,
+                  to_ts: Optional[int] = None) -> pd.DataFrame:
+        to_ts = wall_to_epoch(self.clock.now()) if to_ts is None else to_ts
+        if self.source is None:
+            return super().fetch_raw(limit, to_ts=to_ts)
+        data = self.source.history(to_ts, limit or self.limit, self.resolution)
+        return self._parse_response(data)
+
+
+class ReplayLineNotifier(LineNotifier):
+    """推播改為記錄的 LineNotifier（不連線 LINE）"""
+    
+    def __init__(self, clock: VirtualClock, **kwargs):
+        super().__init__("replay", "replay", **kwargs)
+        self.clock = clock
+        self.sent = []
+    
+    def _send(self, message: str) -> tuple:
+        self.sent.append((self.clock.now(), message))
+        return True, False
+
+
+class ReplaySimulator:
+    """以歷史 K 棒回放即時管線"""
+    
+    def __init__(self, bars: pd.DataFrame, signal_predictor,
+                 config: dict = None, live_config: dict = None,
+                 use_server: bool = False):
+        """
+        Args:
+            bars: 回放用 K 棒（OHLCV + datetime，台灣時間）
+            signal_predictor: 已載入模型的 SignalPredictor
+            config: 覆寫 REPLAY_CONFIG 的參數
+            live_config: 覆寫 LIVE_CONFIG 的參數
+            use_server: 經由本機 ChartServer (HTTP) 取資料，含連線與序列化成本
+        """
+        self.bars = bars.sort_values('datetime').reset_index(drop=True)
+        self.predictor = signal_predictor
+        self.config = {**REPLAY_CONFIG, **(config or {})}
+        self.live_config = live_config
+        self.use_server = use_server
+        self.fc = FeatureCalculator()
+        self.notifier = None
+    
+    def run(self, start: Optional[datetime] = None,
+            end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        逐根回放 [start, end] 內的 K 棒（前 warmup_bars 根保留作為歷史）
+        
+        Returns:
+            每根 K 棒的管線結果（機率、燈號、是否通知、各階段延遲）
+        """
+        cfg = self.config
+        bar_dts = self.bars['datetime'].iloc[cfg['warmup_bars']:]
+        if start is not None:
+            bar_dts = bar_dts[bar_dts >= start]
+        if end is not None:
+            bar_dts = bar_dts[bar_dts <= end]
+        if bar_dts.empty:
+            print("[回放] 無可回放的 K 棒")
+            return pd.DataFrame()
+        
+        boundaries = [dt.to_pydatetime() + timedelta(seconds=BAR_SECONDS) for dt in bar_dts]
+        clock = VirtualClock(boundaries[0] - timedelta(seconds=BAR_SECONDS),
+                             cfg['speed'], cfg['idle_skip_seconds'])
+        source = ArchiveChartSource(self.bars, cfg['publish_delay'],
+                                    CHART_SERVER_CONFIG['partial_bars'])
+        self.notifier = ReplayLineNotifier(clock)
+        server = None
+        if self.use_server:
+            server = ChartServer(source, {'port': 0})
+            server.start()
+        
+        # 使用暫存 DB，確保啟動時完全由替身 API 取得資料
+        tmp_dir = tempfile.mkdtemp(prefix="tx_replay_")
+        try:
+            db = DBManager(os.path.join(tmp_dir, "replay.db"))
+            fetcher = ReplayFetcher(source, clock, server.url if server else None)
+            pipeline = LivePipeline(db, fetcher, self.fc,
+                                    self.predictor, self.notifier,
+                                    config=self.live_config, clock=clock)
+            offset = pipeline.config['trigger_offset']
+            
+            print(f"[回放] {len(boundaries)} 根 K 棒 "
+                  f"({bar_dts.iloc[0]} ~ {bar_dts.iloc[-1]})，{cfg['speed']:g}x")
+            results = []
+            t0 = time.perf_counter()
+            for boundary in boundaries:
+                clock.advance_to(boundary + timedelta(seconds=offset))
+                result = pipeline.on_bar_close(boundary)
+                if result is not None:
+                    results.append(result)
+            self.notifier.flush(timeout=10)
+            elapsed = time.perf_counter() - t0
+            print(f"[回放] 完成 {len(results)} 根，耗時 {elapsed:.1f}s，"
+                  f"API 請求 {source.requests} 次，推播 {len(self.notifier.sent)} 則")
+        finally:
+            if server is not None:
+                server.stop()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        return pd.DataFrame(results)
+    
+    # =========================================================================
+    # 報告
+    # =========================================================================
+    
+    def latency_report(self, results: pd.DataFrame) -> pd.DataFrame:
+        """各階段延遲分佈（秒）；wait 為虛擬秒，其餘為實際耗時"""
+        rows = []
+        for stage in LATENCY_STAGES:
+            if results.empty or stage not in results:
+                continue
+            values = results[stage].to_numpy(dtype=np.float64)
+            rows.append({
+                'stage': stage,
+                'count': len(values),
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'p99': float(np.percentile(values, 99)),
+                'max': float(values.max()),
+            })
+        return pd.DataFrame(rows)
+    
+    def check_parity(self, results: pd.DataFrame) -> dict:
+        """
+        與批次回測比對：全歷史一次計算特徵 + predict_batch，
+        檢查回放機率誤差與各進場門檻的訊號是否一致
+        """
+        if results.empty:
+            return {'bars': 0, 'ok': True}
+        
+        processed = self.fc.calculate_all(self.bars)
+        features = processed[FEATURE_NAMES].to_numpy(dtype=np.float32)
+        batch = pd.DataFrame({
+            'bar': processed['datetime'],
+            'batch_long': self.predictor.predict_batch(features, 'long_entry'),
+            'batch_short': self.predictor.predict_batch(features, 'short_entry'),
+        })
+        merged = results.merge(batch, on='bar', how='left')
+        
+        tol = self.config['parity_tolerance']
+        diff_long = (merged['long_entry'] - merged['batch_long']).abs()
+        diff_short = (merged['short_entry'] - merged['batch_short']).abs()
+        report = {
+            'bars': len(merged),
+            'max_diff_long': float(diff_long.max()),
+            'max_diff_short': float(diff_short.max()),
+            'over_tolerance': int(((diff_long > tol) | (diff_short > tol)).sum()),
+            'signal_mismatches': {},
+        }
+        
+        mismatches = 0
+        for level, th in sorted(THRESHOLDS['entry'].items()):
+            n = int(((merged['long_entry'] > th) != (merged['batch_long'] > th)).sum()
+                    + ((merged['short_entry'] > th) != (merged['batch_short'] > th)).sum())
+            report['signal_mismatches'][level] = n
+            mismatches += n
+        
+        # 通知：批次機率 > 60% 的 K 棒都應推播
+        expected = int(((merged['batch_long'] > 0.60) | (merged['batch_short'] > 0.60)).sum())
+        report['expected_notifications'] = expected
+        report['notifications'] = int(merged['notified'].sum())
+        report['ok'] = (report['over_tolerance'] == 0 and mismatches == 0
+                        and expected == report['notifications'])
+        return report
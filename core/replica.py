@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+唯讀副本模組
+寫入端（排程器 / run_worker.py）獨佔主資料庫，定期發佈一致的唯讀快照給 UI：
+
+  SQLite backup API 將主檔複製到暫存檔（複製期間持有讀鎖，得到單一時間點的一致內容）
+  → os.replace 原子替換副本檔
+
+UI 以 DBManager(read_only=True) 開啟副本（mode=ro），每次查詢重新連線，
+替換後即讀到新快照；查詢不會與寫入搶鎖，也無法寫入
+"""
+
+import os
+import sqlite3
+import time
+from typing import Optional
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DATABASE_PATH, REPLICA_CONFIG
+from core.metrics import METRICS
+
+
+class ReplicaPublisher:
+    """主資料庫 → 唯讀副本的快照發佈"""
+    
+    def __init__(self, primary_path: str = DATABASE_PATH, replica_path: Optional[str] = None):
+        self.primary_path = primary_path
+        self.replica_path = replica_path or REPLICA_CONFIG['path']
+        self._last_signature = None
+        self.published = 0
+        self.last_published: Optional[float] = None
+    
+    def register(self, jobs, interval: Optional[float] = None):
+        """註冊到 JobScheduler：定期發佈（主檔未變動時略過）"""
+        jobs.add_interval('replica_publish', self.publish,
+                          interval or REPLICA_CONFIG['publish_interval'], label='唯讀副本發佈')
+    
+    def _signature(self) -> tuple:
+        """主檔（含 WAL）的修改時間與大小，用來判斷是否有新寫入"""
+        sig = []
+        for path in (self.primary_path, self.primary_path + "-wal"):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+    
+    def publish(self, force: bool = False) -> bool:
+        """
+        發佈一份快照
+        
+        Returns:
+            是否有替換副本檔（主檔未變動或替換失敗為 False）
+        """
+        signature = self._signature()
+        if not force and signature == self._last_signature and os.path.exists(self.replica_path):
+            return False
+        
+        tmp_path = self.replica_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        t0 = time.perf_counter()
+        src = sqlite3.connect(self.primary_path)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        
+        try:
+            os.replace(tmp_path, self.replica_path)
+        except PermissionError as e:
+            # Windows 上副本檔被開啟時無法替換，下一輪再試
+            print(f"[副本] 替換失敗，下次重試: {e}")
+            return False
+        
+        elapsed = time.perf_counter() - t0
+        METRICS.observe('replica_publish', elapsed)
+        self._last_signature = signature
+        self.published += 1
+        self.last_published = time.time()
+        return True
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+預測重算模組
+已存預測以模型組指紋（ModelLoader.fingerprint）標記；換模型或改門檻後指紋改變，
+背景工作只挑指紋不符（或尚未評分）的 K 棒，由新到舊分批重算：
+
+  load_stale_bars（LEFT JOIN predictions）→ predict_batch 四個目標 → save_predictions
+
+每輪有時間上限，且觸發時間落在 5 分 K 中段，不會拖慢收盤管線
+"""
+
+import time
+from typing import List, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FEATURE_NAMES, RESCORE_CONFIG
+from core.db_manager import PREDICTION_TARGETS
+from core.metrics import METRICS
+
+
+class PredictionRescorer:
+    """依模型組指紋分批重算已存 K 棒的預測"""
+    
+    def __init__(self, db_managers: List, signal_predictor, config: dict = None):
+        """
+        Args:
+            db_managers: 要維護預測的 DBManager（各商品 / 週期各一）
+            signal_predictor: 評分用的 SignalPredictor（指紋取自其 model_loader）
+        """
+        self.dbs = list(db_managers)
+        self.predictor = signal_predictor
+        self.config = {**RESCORE_CONFIG, **(config or {})}
+        self.rescored = 0
+    
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self.predictor.model_loader.fingerprint
+    
+    def register(self, jobs):
+        """註冊到 JobScheduler"""
+        jobs.add_interval('rescore', self.run, self.config['interval'],
+                          offset=self.config['offset'], label='預測重算')
+    
+    def run(self, time_budget: Optional[float] = None) -> int:
+        """
+        重算一輪（用完時間上限即停，剩下的留到下一輪）
+        
+        Returns:
+            本輪重算的 K 棒數
+        """
+        if self.fingerprint is None:
+            return 0
+        budget = self.config['time_budget'] if time_budget is None else time_budget
+        deadline = time.perf_counter() + budget
+        total = 0
+        
+        for db in self.dbs:
+            while time.perf_counter() < deadline:
+                # 每批固定一組模型：批次中途熱更新也不會以舊指紋標記新模型的結果
+                with self.predictor.model_set() as fingerprint:
+                    bars = db.load_stale_bars(fingerprint, self.config['batch_size'])
+                    if bars.empty:
+                        break
+                    features = bars[FEATURE_NAMES].to_numpy()
+                    with METRICS.timer('rescore_batch'):
+                        probs = {t: self.predictor.predict_batch(features, t) for t in PREDICTION_TARGETS}
+                db.save_predictions(bars['timestamp'], probs, fingerprint)
+                total += len(bars)
+        
+        if total:
+            self.rescored += total
+            METRICS.inc('rescored_bars', total)
+            print(f"[重算] 指紋 {self.fingerprint}: {total} 根")
+        return total
+    
+    def pending(self) -> int:
+        """尚待重算的 K 棒數"""
+        fingerprint = self.fingerprint
+        if fingerprint is None:
+            return 0
+        return sum(db.count_stale_predictions(fingerprint) for db in self.dbs)
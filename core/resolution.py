@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+多週期 K 棒彙總模組
+只向 API 抓取最細週期（預設 1 分 K），其他週期在本機彙總：
+
+  基礎 K 棒收盤 → 寫入基礎週期資料表（ohlcv_1m）
+              → 併入尾端暫存 → 各週期向量化分組（reduceat）
+              → 已收齊的 K 棒寫入各週期資料表 ohlcv_{N}m
+                （5 分為 ohlcv_5m，不寫入排程器 / 即時管線由 API 抓取的 ohlcv_data）
+              → 各週期尾端增量計算特徵並回寫
+
+分組以台灣時間整點對齊（與 core/chart_server.py 的聚合相同），
+K 棒以開始時間標示；某一分組在「出現下一組的 K 棒」、「最後一根基礎 K 棒已到」
+或「遇到收盤（13:45 / 05:00）」時視為收齊
+"""
+
+from datetime import timedelta
+from math import lcm
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DATABASE_PATH, FEATURE_NAMES, RESOLUTION_CONFIG
+from core.db_manager import DBManager
+from core.feature_calculator import FeatureCalculator
+from core.live_pipeline import SystemClock
+from core.metrics import METRICS, timed
+
+# 開盤 / 收盤時刻（當日秒數）：日盤 08:45 ~ 13:45、夜盤 15:00 ~ 05:00
+SESSION_OPEN_SECONDS = (8 * 3600 + 45 * 60, 15 * 3600)
+SESSION_CLOSE_SECONDS = (13 * 3600 + 45 * 60, 5 * 3600)
+
+
+def aggregate_bars(bars: pd.DataFrame, minutes, base_minutes=1) -> pd.DataFrame:
+    """
+    將基礎週期 K 棒彙總為 minutes 分 K
+    
+    Args:
+        bars: 依時間排序、含 timestamp / datetime / OHLCV 的基礎 K 棒
+        minutes: 目標週期（分鐘）
+        base_minutes: bars 的週期（分鐘），用來判斷分組最後一根是否已到
+    
+    Returns:
+        彙總後的 K 棒，complete 欄標示該分組是否已收齊
+    """
+    columns = ['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'complete']
+    if bars.empty:
+        return pd.DataFrame(columns=columns)
+    
+    seconds = int(minutes) * 60
+    wall = bars['datetime'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    ts = bars['timestamp'].to_numpy(dtype=np.int64)
+    keys = wall // seconds
+    
+    changed = np.ones(len(keys), dtype=bool)
+    changed[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(changed)
+    ends = np.append(starts[1:], len(keys))
+    
+    bucket_wall = keys[starts] * seconds
+    last_end = wall[ends - 1] + int(base_minutes) * 60
+    complete = (last_end >= bucket_wall + seconds) | np.isin(last_end % 86400, SESSION_CLOSE_SECONDS)
+    complete[:-1] = True
+    
+    return pd.DataFrame({
+        'timestamp': ts[starts] - (wall[starts] - bucket_wall),
+        'datetime': pd.to_datetime(bucket_wall.astype('datetime64[s]')),
+        'open': bars['open'].to_numpy(dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(bars['high'].to_numpy(dtype=np.float64), starts),
+        'low': np.minimum.reduceat(bars['low'].to_numpy(dtype=np.float64), starts),
+        'close': bars['close'].to_numpy(dtype=np.float64)[ends - 1],
+        'volume': np.add.reduceat(bars['volume'].to_numpy(dtype=np.int64), starts),
+        'complete': complete,
+    })
+
+
+class ResolutionFeed:
+    """單一基礎週期資料源 → 多週期資料表 + 特徵"""
+    
+    def __init__(self, db_path: str = DATABASE_PATH, symbol: Optional[str] = None,
+                 base: Optional[str] = None, rollups: Optional[List[str]] = None,
+                 fetcher=None, feature_calculator=None, config: dict = None,
+                 clock=None):
+        """
+        Args:
+            db_path: 資料庫路徑
+            symbol: 商品代碼，預設 API_CONFIG['symbol']
+            base: 基礎週期（分鐘），預設 RESOLUTION_CONFIG['base']
+            rollups: 彙總週期清單，須為 base 的整數倍
+            fetcher: 以基礎週期抓取的 DataFetcher（只在 poll() 使用）
+        """
+        self.config = {**RESOLUTION_CONFIG, **(config or {})}
+        self.base = str(base or self.config['base'])
+        self.rollups = [str(r) for r in (rollups or self.config['rollups']) if str(r) != self.base]
+        for r in self.rollups:
+            if int(r) % int(self.base):
+                raise ValueError(f"週期 {r} 分不是基礎週期 {self.base} 分的整數倍")
+        
+        self.base_db = DBManager(db_path, symbol, self.base)
+        self.dbs: Dict[str, DBManager] = {r: self.base_db.for_resolution(r, rollup=True) for r in self.rollups}
+        self.fetcher = fetcher
+        self.fc = feature_calculator or FeatureCalculator()
+        self.clock = clock or SystemClock()
+        
+        # 首次彙總時向前補讀各週期最小公倍數的時間，確保開頭的分組完整
+        self._span = lcm(*(int(r) for r in self.rollups)) * 60 if self.rollups else 0
+        self._tail = pd.DataFrame()
+        self._origin = None
+        self._emitted = {r: self.dbs[r].get_latest_timestamp() or 0 for r in self.rollups}
+        self._frames: Dict[str, pd.DataFrame] = {}
+    
+    def register(self, jobs):
+        """註冊到 JobScheduler：每根基礎 K 棒邊界後輪詢並彙總"""
+        jobs.add_interval('resolution_feed', self.poll, int(self.base) * 60,
+                          offset=self.config['trigger_offset'], label=f'{self.base}分K彙總')
+    
+    def poll(self) -> Dict[str, pd.DataFrame]:
+        """抓取最近的基礎 K 棒並彙總（形成中的 K 棒不處理）"""
+        bars = self.fetcher.fetch_raw(limit=self.config['poll_limit'])
+        return self.ingest(bars, now=self.clock.now())
+    
+    # =========================================================================
+    # 增量彙總
+    # =========================================================================
+    
+    @timed('resolution_ingest')
+    def ingest(self, bars: pd.DataFrame, now=None) -> Dict[str, pd.DataFrame]:
+        """
+        併入新收盤的基礎 K 棒，彙總並寫入已收齊的各週期 K 棒
+        
+        Args:
+            bars: 基礎週期 K 棒（可與先前重疊）
+            now: 目前時間；指定時排除尚未收盤的 K 棒，未指定則視為全部已收盤
+        
+        Returns:
+            {週期: 本次新收齊、含特徵的 K 棒}
+        """
+        if bars.empty:
+            return {}
+        if now is not None:
+            bar_end = bars['datetime'] + timedelta(minutes=int(self.base))
+            bars = bars[bar_end <= now]
+            if bars.empty:
+                return {}
+        bars = bars[['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume']]
+        
+        self.base_db.save_ohlcv_bulk(bars, include_features=False)
+        self._merge_tail(bars)
+        
+        results = {}
+        for r in self.rollups:
+            agg = aggregate_bars(self._tail, r, self.base)
+            closed = agg[agg['complete']
+                         & (agg['timestamp'] > self._emitted[r])
+                         & (agg['datetime'] >= self._origin)]
+            if closed.empty:
+                continue
+            closed = closed.drop(columns=['complete']).reset_index(drop=True)
+            self.dbs[r].save_ohlcv_bulk(closed, include_features=False)
+            self._emitted[r] = int(closed['timestamp'].iloc[-1])
+            results[r] = self._update_features(r, closed)
+            METRICS.inc('resolution_bars', len(closed), resolution=r)
+        self._trim_tail()
+        return results
+    
+    def _merge_tail(self, bars: pd.DataFrame):
+        """併入尾端暫存；首次使用時以 DB 內的基礎 K 棒補齊開頭未收齊的分組"""
+        if self._origin is None:
+            start = bars['datetime'].iloc[0] - timedelta(seconds=self._span)
+            history = self.base_db.load_ohlcv(start_date=start.strftime('%Y-%m-%d'))
+            frames = [f for f in (history, bars) if not f.empty]
+            combined = pd.concat(frames, ignore_index=True)
+            combined = combined[combined['datetime'] >= start]
+            # 第一根之前的資料未知：其所在分組不完整，不寫入；恰為開盤第一根則不受限
+            origin = combined['datetime'].min()
+            tod = origin.hour * 3600 + origin.minute * 60
+            self._origin = origin.floor(f'{self._span}s') if tod in SESSION_OPEN_SECONDS else origin
+        else:
+            combined = pd.concat([self._tail, bars], ignore_index=True)
+        
+        combined = combined.drop_duplicates(subset=['timestamp'], keep='last')
+        combined = combined.sort_values('timestamp').reset_index(drop=True)
+        self._tail = combined[['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume']]
+    
+    def _trim_tail(self):
+        """丟棄各週期都已寫出的分組，只保留尚未收齊的部分"""
+        if self._tail.empty:
+            return
+        keep_from = None
+        for r in self.rollups:
+            agg = aggregate_bars(self._tail, r, self.base)
+            pending = agg.loc[agg['timestamp'] > self._emitted[r], 'datetime']
+            start = pending.iloc[0] if not pending.empty else agg['datetime'].iloc[-1] + timedelta(minutes=int(r))
+            keep_from = start if keep_from is None else min(keep_from, start)
+        if keep_from is not None:
+            self._tail = self._tail[self._tail['datetime'] >= keep_from].reset_index(drop=True)
+    
+    def _update_features(self, resolution: str, closed: pd.DataFrame) -> pd.DataFrame:
+        """各週期尾端增量計算特徵，回寫新收齊的 K 棒"""
+        frame = self._frames.get(resolution)
+        if frame is None:
+            frame = self.dbs[resolution].load_ohlcv(days=5, include_features=True)
+        combined = pd.concat([frame, closed], ignore_index=True)
+        combined = combined.drop_duplicates(subset=['timestamp'], keep='last')
+        combined = combined.sort_values('timestamp').reset_index(drop=True)
+        frame = combined.tail(self.config['feature_tail_bars']).reset_index(drop=True)
+        
+        # 資料表剛開始累積時前幾根特徵為 NaN，之後歷史足夠再一併補寫
+        if all(f in frame.columns for f in FEATURE_NAMES):
+            pending = frame.loc[frame[FEATURE_NAMES].isna().any(axis=1), 'timestamp']
+        else:
+            pending = frame['timestamp']
+        processed = self.fc.calculate_all(frame[['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume']])
+        self._frames[resolution] = processed
+        
+        rows = processed[processed['timestamp'].isin(pending)]
+        if all(f in rows.columns for f in FEATURE_NAMES):
+            self.dbs[resolution].save_ohlcv_bulk(rows)
+        return processed[processed['timestamp'].isin(closed['timestamp'])].reset_index(drop=True)
+    
+    # =========================================================================
+    # 全量重建 / 查詢
+    # =========================================================================
+    
+    def rebuild(self, days: Optional[int] = None) -> Dict[str, int]:
+        """
+        由基礎週期資料表全量重建各週期資料表與特徵（匯入 / 補資料後使用）
+        
+        Returns:
+            {週期: 寫入筆數}
+        """
+        bars = self.base_db.load_ohlcv(days=days)
+        counts = {}
+        for r in self.rollups:
+            agg = aggregate_bars(bars, r, self.base)
+            agg = agg[agg['complete']].drop(columns=['complete']).reset_index(drop=True)
+            if agg.empty:
+                counts[r] = 0
+                continue
+            processed = self.fc.calculate_all(agg)
+            counts[r] = self.dbs[r].save_ohlcv_bulk(processed)
+            self._emitted[r] = max(self._emitted[r], int(agg['timestamp'].iloc[-1]))
+            self._frames.pop(r, None)
+        return counts
+    
+    def db_for(self, resolution) -> DBManager:
+        resolution = str(resolution)
+        return self.base_db if resolution == self.base else self.dbs[resolution]
+    
+    def load(self, resolution, days: Optional[int] = 5, include_features: bool = True) -> pd.DataFrame:
+        """載入某週期的 K 棒（含已計算的特徵）"""
+        return self.db_for(resolution).load_ohlcv(days=days, include_features=include_features)
+    
+    def compute_features(self, resolution, days: Optional[int] = 5) -> pd.DataFrame:
+        """重新計算某週期（含基礎週期）的特徵並回寫"""
+        db = self.db_for(resolution)
+        df = db.load_ohlcv(days=days)
+        if df.empty:
+            return df
+        processed = self.fc.calculate_all(df)
+        db.save_ohlcv_bulk(processed)
+        return processed
+    
+    def score(self, resolution, predictor, days: Optional[int] = 5) -> pd.DataFrame:
+        """
+        以 DB 內已存的特徵對某週期評分（不需另外呼叫 API）
+        
+        注意：模型以 5 分 K 訓練，其他週期的機率僅供參考
+        """
+        df = self.load(resolution, days=days).dropna(subset=FEATURE_NAMES).reset_index(drop=True)
+        features = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+        for target in ('long_entry', 'short_entry'):
+            df[f'{target}_prob'] = predictor.predict_batch(features, target)
+        return df
@@ -11,10 +11,11 @@
   06:00 → 儲存夜盤資料（夜盤已於 05:00 收盤）
   14:00 → 儲存日盤資料（日盤已於 13:45 收盤）
   啟動時 → 自動檢查是否有錯過的排程，補跑
+
+排程由 JobScheduler (heap) 驅動，睡到下一個工作時間才喚醒，
+其他工作（如每 5 分 K 收盤處理）可透過 self.jobs 註冊
 """
 
-import threading
-import time
 import json
 import pandas as pd
 from datetime import datetime, timedelta
@@ -26,7 +27,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import FEATURE_NAMES, DATABASE_DIR
 from core.db_manager import DBManager
 from core.data_fetcher import DataFetcher
+from core.async_fetcher import AsyncDataFetcher
 from core.feature_calculator import FeatureCalculator
+from core.job_scheduler import JobScheduler
 
 
 class DataScheduler:
@@ -38,6 +41,9 @@ class DataScheduler:
         (14, 0, '日盤'),   # 日盤 08:45~13:45 收盤後
     ]
     
+    # 每日 VACUUM 時間（夜盤收盤後、日盤開盤前）
+    VACUUM_TIME = (7, 0)
+    
     # 記錄檔路徑（追蹤上次執行時間，避免重複/遺漏）
     STATE_FILE = os.path.join(DATABASE_DIR, "scheduler_state.json")
     
@@ -46,8 +52,9 @@ class DataScheduler:
         self.db = db_manager
         self.fetcher = data_fetcher
         self.fc = feature_calculator
-        self._timer = None
         self._running = False
+        self.jobs = JobScheduler(name="tx-scheduler")
+        self.jobs.on_error = self._on_job_error
         self.last_run = None
         self.last_status = ""
         self.log_messages = []
@@ -184,7 +191,7 @@ class DataScheduler:
             self.last_run = datetime.now()
             self.last_status = f"成功 ({result['message']})"
             self._log(f"任務完成: {result['message']}")
-            
+        
         except Exception as e:
             result['message'] = str(e)
             self.last_status = f"失敗: {e}"
@@ -203,6 +210,43 @@ class DataScheduler:
     # 防呆：資料缺口檢查與修復
     # =========================================================================
     
+    # 各時段對應的時間範圍 (起始時, 結束時(不含))
+    SESSION_HOURS = {
+        'night_early': (0, 6),    # 00:00~04:55
+        'day_session': (8, 14),   # 08:45~13:45
+        'night_late': (15, 24),   # 15:00~23:55
+    }
+    
+    def _plan_gap_ranges(self, gaps: list) -> list:
+        """
+        將缺口清單轉為待補的時間範圍
+        
+        Returns:
+            list[tuple]: [(gap, start_dt, end_dt)]，end_dt 不含
+        """
+        plan = []
+        for gap in gaps:
+            hours = self.SESSION_HOURS.get(gap['session'])
+            if hours is None:
+                continue
+            day = pd.Timestamp(gap['date'])
+            plan.append((gap, day + pd.Timedelta(hours=hours[0]),
+                         day + pd.Timedelta(hours=hours[1])))
+        return plan
+    
+    def _extend_back(self, api_data: pd.DataFrame, earliest: pd.Timestamp) -> pd.DataFrame:
+        """缺口早於 API 單頁範圍時，以並行抓取往回補足到 earliest"""
+        first_dt = api_data['datetime'].iloc[0]
+        if earliest >= first_dt:
+            return api_data
+        first_ts = int(api_data['timestamp'].iloc[0])
+        start_ts = first_ts - int((first_dt - earliest).total_seconds())
+        self._log(f"缺口早於 API 資料起點 {first_dt}，並行往回抓取...")
+        older = AsyncDataFetcher.from_fetcher(self.fetcher).fetch_range(start_ts, first_ts)
+        if older.empty:
+            return api_data
+        return self._merge_data(older, api_data)
+    
     def validate_and_fill_gaps(self, api_data: pd.DataFrame = None) -> dict:
         """
         檢查 DB 資料缺口並嘗試從 API 資料補回。
@@ -211,6 +255,11 @@ class DataScheduler:
           - 有日盤 (08:45~13:45) → 同日必有夜盤 (15:00~隔日04:55)
           - 無日盤 (休市) → 無該日夜盤
         
+        修復流程（單次重算）：
+          1. 將所有缺口轉為時間範圍，從同一份 API 資料一次篩出補回資料
+          2. 載入 DB 一次、合併後只跑一次 calculate_all
+          3. 只寫回受影響的列：補回的列、其後 lookback 範圍內的列、原本特徵為 NULL 的列
+        
         Args:
             api_data: 已抓取的 API 資料（避免重複呼叫 API）
         
@@ -223,117 +272,91 @@ class DataScheduler:
         gaps = self.db.check_data_gaps()
         result['gaps_found'] = len(gaps)
         
-        if not gaps:
-            self._log("資料完整性檢查: 無缺口")
-            return result
-        
-        self._log(f"資料完整性檢查: 發現 {len(gaps)} 個缺口")
-        for g in gaps:
-            self._log(f"  缺口: {g['date']} {g['session']} "
-                      f"(預期~{g['expected']}筆, 實際{g['actual']}筆, {g['status']})")
+        db_data = self.db.load_ohlcv(days=5, include_features=True)
+        null_mask = (db_data[FEATURE_NAMES].isna().any(axis=1)
+                     if not db_data.empty else pd.Series(dtype=bool))
         
-        # 嘗試用 API 資料補回缺口
-        if api_data is None or api_data.empty:
-            self._log("嘗試從 API 重新抓取資料以補回缺口...")
-            api_data = self.fetcher.fetch_raw()
-        
-        if api_data.empty:
-            self._log("API 無資料，無法修復缺口")
-            result['remaining'] = len(gaps)
-            result['details'] = gaps
+        if not gaps and not null_mask.any():
+            self._log("資料完整性檢查: 無缺口")
             return result
         
-        # API 資料加上 date 欄位
-        if 'date' not in api_data.columns:
-            api_data = api_data.copy()
-            api_data['date'] = api_data['datetime'].dt.strftime('%Y-%m-%d')
+        if gaps:
+            self._log(f"資料完整性檢查: 發現 {len(gaps)} 個缺口")
+            for g in gaps:
+                self._log(f"  缺口: {g['date']} {g['session']} "
+                          f"(預期~{g['expected']}筆, 實際{g['actual']}筆, {g['status']})")
         
-        fixed_count = 0
-        remaining_gaps = []
+        # Step 1: 規劃待補時間範圍，從同一份 API 資料篩出
+        plan = self._plan_gap_ranges(gaps)
+        remaining_gaps = [g for g in gaps if g['session'] not in self.SESSION_HOURS]
+        fill_data = pd.DataFrame()
         
-        for gap in gaps:
-            gap_date = gap['date']
-            gap_session = gap['session']
+        if plan:
+            if api_data is None or api_data.empty:
+                self._log("嘗試從 API 重新抓取資料以補回缺口...")
+                api_data = self.fetcher.fetch_raw()
             
-            # 根據缺口時段過濾 API 資料
-            if gap_session == 'night_early':
-                # 00:00~04:55
-                mask = (api_data['date'] == gap_date) & (api_data['datetime'].dt.hour < 6)
-            elif gap_session == 'day_session':
-                # 08:45~13:45
-                mask = (api_data['date'] == gap_date) & \
-                       (api_data['datetime'].dt.hour >= 8) & \
-                       (api_data['datetime'].dt.hour < 14)
-            elif gap_session == 'night_late':
-                # 15:00~23:55
-                mask = (api_data['date'] == gap_date) & (api_data['datetime'].dt.hour >= 15)
+            if api_data.empty:
+                self._log("API 無資料，無法修復缺口")
+                remaining_gaps.extend(gap for gap, _, _ in plan)
+                plan = []
             else:
+                api_data = self._extend_back(api_data, min(start for _, start, _ in plan))
+        
+        fill_mask = None
+        for gap, start, end in plan:
+            mask = (api_data['datetime'] >= start) & (api_data['datetime'] < end)
+            if not mask.any():
+                self._log(f"  {gap['date']} {gap['session']}: API 中無對應資料，無法修復")
                 remaining_gaps.append(gap)
                 continue
-            
-            fill_data = api_data[mask].copy()
-            
-            if fill_data.empty:
-                self._log(f"  {gap_date} {gap_session}: API 中無對應資料，無法修復")
-                remaining_gaps.append(gap)
-                continue
-            
-            # 將補回資料與完整歷史合併，重新計算特徵後存入
-            db_data = self.db.load_ohlcv(days=5)
+            self._log(f"  {gap['date']} {gap['session']}: 補回 {int(mask.sum())} 筆")
+            result['fixed'] += 1
+            fill_mask = mask if fill_mask is None else (fill_mask | mask)
+        
+        if fill_mask is not None:
+            fill_data = api_data[fill_mask].copy()
+        
+        # Step 2: 合併後單次重算
+        if fill_data.empty and not null_mask.any():
+            processed = pd.DataFrame()
+        else:
+            if null_mask.any():
+                self._log(f"發現 {int(null_mask.sum())} 列特徵 NULL，一併重算...")
             combined = self._merge_data(db_data, fill_data) if not db_data.empty else fill_data
+            processed = self.fc.calculate_all(combined) if len(combined) >= 20 else combined
+        
+        # Step 3: 只寫回受影響的列
+        if not processed.empty:
+            ts = processed['timestamp'].astype(int)
+            affected = ts.isin(set(fill_data['timestamp'].astype(int))) if not fill_data.empty \
+                else pd.Series(False, index=processed.index)
+            # 補回列之後 lookback 範圍內的列，特徵會受影響
+            lookback = self.fc.get_lookback_bars()
+            affected = affected.astype(int).rolling(lookback + 1, min_periods=1).max().astype(bool)
+            if null_mask.any():
+                null_ts = set(db_data.loc[null_mask, 'timestamp'].astype(int))
+                affected |= ts.isin(null_ts)
             
-            if len(combined) >= 20:
-                processed = self.fc.calculate_all(combined)
-            else:
-                processed = combined
-            
-            # 只存入補回的資料（用 timestamp 過濾）
-            fill_timestamps = set(fill_data['timestamp'].astype(int).values)
-            to_save = processed[processed['timestamp'].astype(int).isin(fill_timestamps)].copy()
+            to_save = processed[affected].copy()
+            for f in FEATURE_NAMES:
+                if f in to_save.columns:
+                    to_save[f] = to_save[f].fillna(0)
             
             if not to_save.empty:
                 saved = self.db.save_ohlcv(to_save, include_features=True)
-                self._log(f"  {gap_date} {gap_session}: 補回 {saved} 筆")
-                fixed_count += 1
-            else:
-                remaining_gaps.append(gap)
+                self._log(f"修復寫回 {saved} 筆（單次重算）")
         
-        # 修復後再次檢查特徵完整性
-        feat_issues = self.db.check_feature_completeness()
-        if feat_issues:
-            self._log(f"發現 {len(feat_issues)} 個特徵 NULL，嘗試重算...")
-            self._repair_features()
-        
-        result['fixed'] = fixed_count
         result['remaining'] = len(remaining_gaps)
         result['details'] = remaining_gaps
         
         if remaining_gaps:
-            self._log(f"仍有 {len(remaining_gaps)} 個缺口無法從 API 修復（可能超出 API 範圍）")
-        else:
+            self._log(f"仍有 {len(remaining_gaps)} 個缺口無法從 API 修復（可用 backfill_history.py 分頁回補）")
+        elif gaps:
             self._log("所有缺口已修復")
         
         return result
     
-    def _repair_features(self):
-        """重新計算所有特徵（修復 NULL）"""
-        try:
-            all_data = self.db.load_ohlcv(days=5)
-            if all_data.empty or len(all_data) < 20:
-                return
-            
-            processed = self.fc.calculate_all(all_data)
-            
-            # fillna(0) 處理 warmup 期的 NaN
-            for f in FEATURE_NAMES:
-                if f in processed.columns:
-                    processed[f] = processed[f].fillna(0)
-            
-            self.db.save_ohlcv(processed, include_features=True)
-            self._log("特徵重算完成")
-        except Exception as e:
-            self._log(f"特徵重算失敗: {e}")
-    
     # =========================================================================
     # 啟動補跑邏輯
     # =========================================================================
@@ -360,33 +383,32 @@ class DataScheduler:
                 self._mark_as_run(hour, minute)
     
     # =========================================================================
-    # 定時檢查
+    # 工作註冊
     # =========================================================================
     
-    def _check_and_run(self):
-        """每分鐘檢查一次是否到排程時間"""
-        if not self._running:
-            return
-        
-        now = datetime.now()
-        
+    def _make_session_job(self, hour, minute, label):
+        """建立排程存檔工作（同日已補跑過則略過）"""
+        def _job():
+            if self._was_already_run_today(hour, minute):
+                return
+            self._log(f"到達排程時間 {hour:02d}:{minute:02d} ({label})")
+            self.run_task(session_label=label)
+            self._mark_as_run(hour, minute)
+        return _job
+    
+    def _register_jobs(self):
+        """註冊預設工作：各收盤存檔 + 每日 VACUUM"""
         for hour, minute, label in self.SCHEDULE_TIMES:
-            target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            diff = abs((now - target).total_seconds())
-            
-            # 在排程時間的前後 2 分鐘內觸發
-            if diff <= 120:
-                if not self._was_already_run_today(hour, minute):
-                    self._log(f"到達排程時間 {hour:02d}:{minute:02d} ({label})")
-                    self.run_task(session_label=label)
-                    self._mark_as_run(hour, minute)
-                    break
-        
-        # 排程下一次檢查（60秒後）
-        if self._running:
-            self._timer = threading.Timer(60, self._check_and_run)
-            self._timer.daemon = True
-            self._timer.start()
+            self.jobs.add_daily(self._session_job_name(hour, minute),
+                                self._make_session_job(hour, minute, label),
+                                hour, minute, label=label)
+        self.jobs.add_daily('vacuum', self.db.vacuum, *self.VACUUM_TIME, label='VACUUM')
+    
+    def _session_job_name(self, hour, minute):
+        return f"save_{self._get_last_run_key(hour, minute)}"
+    
+    def _on_job_error(self, job, e):
+        self._log(f"工作 {job.name} 失敗: {e}")
     
     # =========================================================================
     # 啟動 / 停止
@@ -402,21 +424,31 @@ class DataScheduler:
         # 啟動時先檢查是否有遺漏的排程需要補跑
         self._check_missed_on_startup()
         
-        # 開始定時檢查
-        self._check_and_run()
+        # 註冊工作並啟動 heap 排程執行緒
+        self._register_jobs()
+        self.jobs.start()
     
     def stop(self):
         """停止排程器"""
         self._running = False
-        if self._timer:
-            self._timer.cancel()
+        self.jobs.stop()
         self._log("排程器已停止")
     
     def is_running(self) -> bool:
         return self._running
     
+    def get_job_stats(self) -> list:
+        """取得各工作的執行耗時與延遲統計"""
+        return self.jobs.get_stats()
+    
     def get_next_run_time(self) -> str:
         """取得下一次排程時間"""
+        names = [self._session_job_name(h, m) for h, m, _ in self.SCHEDULE_TIMES]
+        job = self.jobs.get_next_job(names)
+        if job is not None:
+            next_run = datetime.fromtimestamp(job.scheduled_at)
+            return f"{next_run.strftime('%Y-%m-%d %H:%M')} ({job.label})"
+        
         now = datetime.now()
         next_times = []
         
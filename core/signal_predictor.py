@@ -4,6 +4,8 @@
 負責使用模型進行預測並生成交易訊號
 """
 
+import threading
+from contextlib import contextmanager
 import numpy as np
 import pandas as pd
 import xgboost as xgb
@@ -14,6 +16,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import THRESHOLDS, FEATURE_NAMES
 from core.model_loader import ModelLoader, TARGET_NAMES
+from core.metrics import METRICS
 
 
 # =============================================================================
@@ -63,10 +66,64 @@ class SignalPredictor:
             'long_entry_time': None,
             'short_entry_time': None,
         }
+        
+        # 各執行緒固定的 (模型, 指紋)，見 model_set()
+        self._pinned = threading.local()
     
     def load_models(self) -> bool:
         return self.model_loader.load_all()
     
+    @contextmanager
+    def model_set(self):
+        """
+        區塊內的評分固定使用同一組模型（模型熱更新替換時不會混用新舊模型）
+        
+        Yields:
+            該組模型的指紋；巢狀呼叫沿用外層固定的那組
+        """
+        outer = getattr(self._pinned, 'active', None)
+        if outer is not None:
+            yield outer[1]
+            return
+        self._pinned.active = self.model_loader.snapshot()
+        try:
+            yield self._pinned.active[1]
+        finally:
+            self._pinned.active = None
+    
+    def _get_models(self, target: str) -> list:
+        active = getattr(self._pinned, 'active', None)
+        if active is not None:
+            return active[0].get(target, [])
+        return self.model_loader.get_models(target)
+    
+    def validate_models(self, models: Dict[str, list], features: np.ndarray) -> List[str]:
+        """
+        以 canary 特徵列驗證一組新模型（供 ModelLoader.reload_if_changed 使用）
+        
+        每個模型都必須接受目前的特徵名稱，且輸出為 0~1 的有限機率
+        
+        Returns:
+            錯誤訊息列表，空表示通過
+        """
+        features = np.asarray(features, dtype=np.float32)
+        features = features[~np.isnan(features).any(axis=1)] if len(features) else features
+        if len(features) == 0:
+            return []
+        dmatrix = xgb.DMatrix(features, feature_names=self.model_feature_names)
+        problems = []
+        for target, boosters in models.items():
+            for i, model in enumerate(boosters):
+                try:
+                    probs = model.predict(dmatrix)
+                except Exception as e:
+                    problems.append(f"{target}[{i}] 評分失敗: {e}")
+                    continue
+                if len(probs) != len(features) or not np.all(np.isfinite(probs)) \
+                        or probs.min() < 0 or probs.max() > 1:
+                    problems.append(f"{target}[{i}] 輸出不是 0~1 機率")
+        return problems
+    
     def set_position(self, position_type: str, is_holding: bool, 
                      entry_time: Optional[str] = None):
         if position_type in ['long', 'short']:
@@ -87,22 +144,23 @@ class SignalPredictor:
         Returns:
             Soft Voting 後的信心分數 (0.0 ~ 1.0)
         """
-        models = self.model_loader.get_models(target)
+        models = self._get_models(target)
         
         if not models:
             return 0.0
         
-        # 使用模型訓練時的中文特徵名稱建立 DMatrix
-        dmatrix = xgb.DMatrix(features, feature_names=self.model_feature_names)
-        
-        probabilities = []
-        for model in models:
-            try:
-                prob = model.predict(dmatrix)[0]
-                probabilities.append(prob)
-            except Exception as e:
-                print(f"預測錯誤 ({target}): {e}")
-                continue
+        with METRICS.timer('predict_single', target=target):
+            # 使用模型訓練時的中文特徵名稱建立 DMatrix
+            dmatrix = xgb.DMatrix(features, feature_names=self.model_feature_names)
+            
+            probabilities = []
+            for model in models:
+                try:
+                    prob = model.predict(dmatrix)[0]
+                    probabilities.append(prob)
+                except Exception as e:
+                    print(f"預測錯誤 ({target}): {e}")
+                    continue
         
         if not probabilities:
             return 0.0
@@ -110,22 +168,71 @@ class SignalPredictor:
         avg_prob = sum(probabilities) / len(probabilities)
         return float(avg_prob)
     
+    def predict_batch(self, features: np.ndarray, target: str) -> np.ndarray:
+        """
+        批次預測（一次 DMatrix 評分所有列）
+        
+        Args:
+            features: 特徵陣列 (n, 17)
+            target: 目標名稱
+        
+        Returns:
+            各列 Soft Voting 信心分數 (n,)，含 NaN 特徵的列為 NaN
+        """
+        features = np.asarray(features, dtype=np.float32)
+        n = len(features)
+        models = self._get_models(target)
+        if not models or n == 0:
+            return np.zeros(n)
+        
+        with METRICS.timer('predict_batch', target=target):
+            dmatrix = xgb.DMatrix(features, feature_names=self.model_feature_names)
+            total = np.zeros(n)
+            count = 0
+            for model in models:
+                try:
+                    total += model.predict(dmatrix)
+                    count += 1
+                except Exception as e:
+                    print(f"批次預測錯誤 ({target}): {e}")
+        
+        if count == 0:
+            return np.zeros(n)
+        
+        probs = total / count
+        probs[np.isnan(features).any(axis=1)] = np.nan
+        return probs
+    
+    def predict_compact(self, bars, targets: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        以 CompactBars 的 float32 特徵陣列批次評分（直接交給 DMatrix，不轉型複製）
+        
+        Returns:
+            {target: 機率陣列}，含 NaN 特徵的列為 NaN
+        """
+        if bars.features is None:
+            raise ValueError("CompactBars 未載入特徵")
+        targets = targets or list(TARGET_NAMES)
+        with self.model_set():
+            return {target: self.predict_batch(bars.features, target) for target in targets}
+    
     def predict_all(self, features: np.ndarray) -> Dict[str, float]:
         """對所有目標進行預測"""
         results = {}
         
-        results['long_entry'] = self.predict_single(features, 'long_entry')
-        results['short_entry'] = self.predict_single(features, 'short_entry')
-        
-        if self.position_state['long']:
-            results['long_exit'] = self.predict_single(features, 'long_exit')
-        else:
-            results['long_exit'] = 0.0
-        
-        if self.position_state['short']:
-            results['short_exit'] = self.predict_single(features, 'short_exit')
-        else:
-            results['short_exit'] = 0.0
+        with self.model_set():
+            results['long_entry'] = self.predict_single(features, 'long_entry')
+            results['short_entry'] = self.predict_single(features, 'short_entry')
+            
+            if self.position_state['long']:
+                results['long_exit'] = self.predict_single(features, 'long_exit')
+            else:
+                results['long_exit'] = 0.0
+            
+            if self.position_state['short']:
+                results['short_exit'] = self.predict_single(features, 'short_exit')
+            else:
+                results['short_exit'] = 0.0
         
         return results
     
@@ -183,39 +290,40 @@ class SignalPredictor:
             result[f'{target}_prob'] = 0.0
             result[f'{target}_signal'] = ''
         
-        for idx in range(len(result)):
-            try:
-                if pd.isna(result[self.feature_names].iloc[idx]).any():
-                    continue
-                
-                features = result[self.feature_names].iloc[idx].values.reshape(1, -1)
-                
-                for target in ['long_entry', 'short_entry']:
-                    prob = self.predict_single(features, target)
-                    result.loc[result.index[idx], f'{target}_prob'] = prob
+        with self.model_set():
+            for idx in range(len(result)):
+                try:
+                    if pd.isna(result[self.feature_names].iloc[idx]).any():
+                        continue
                     
-                    if prob > self.thresholds['entry']['level_3']:
-                        result.loc[result.index[idx], f'{target}_signal'] = '強烈'
-                    elif prob > self.thresholds['entry']['level_2']:
-                        result.loc[result.index[idx], f'{target}_signal'] = '中等'
-                    elif prob > self.thresholds['entry']['level_1']:
-                        result.loc[result.index[idx], f'{target}_signal'] = '一般'
-                
-                if self.position_state['long']:
-                    prob = self.predict_single(features, 'long_exit')
-                    result.loc[result.index[idx], 'long_exit_prob'] = prob
-                    if prob > self.thresholds['exit']['level_1']:
-                        result.loc[result.index[idx], 'long_exit_signal'] = '出場'
-                
-                if self.position_state['short']:
-                    prob = self.predict_single(features, 'short_exit')
-                    result.loc[result.index[idx], 'short_exit_prob'] = prob
-                    if prob > self.thresholds['exit']['level_1']:
-                        result.loc[result.index[idx], 'short_exit_signal'] = '出場'
+                    features = result[self.feature_names].iloc[idx].values.reshape(1, -1)
+                    
+                    for target in ['long_entry', 'short_entry']:
+                        prob = self.predict_single(features, target)
+                        result.loc[result.index[idx], f'{target}_prob'] = prob
                         
-            except Exception as e:
-                print(f"預測第 {idx} 列時發生錯誤: {e}")
-                continue
+                        if prob > self.thresholds['entry']['level_3']:
+                            result.loc[result.index[idx], f'{target}_signal'] = '強烈'
+                        elif prob > self.thresholds['entry']['level_2']:
+                            result.loc[result.index[idx], f'{target}_signal'] = '中等'
+                        elif prob > self.thresholds['entry']['level_1']:
+                            result.loc[result.index[idx], f'{target}_signal'] = '一般'
+                    
+                    if self.position_state['long']:
+                        prob = self.predict_single(features, 'long_exit')
+                        result.loc[result.index[idx], 'long_exit_prob'] = prob
+                        if prob > self.thresholds['exit']['level_1']:
+                            result.loc[result.index[idx], 'long_exit_signal'] = '出場'
+                    
+                    if self.position_state['short']:
+                        prob = self.predict_single(features, 'short_exit')
+                        result.loc[result.index[idx], 'short_exit_prob'] = prob
+                        if prob > self.thresholds['exit']['level_1']:
+                            result.loc[result.index[idx], 'short_exit_signal'] = '出場'
+                
+                except Exception as e:
+                    print(f"預測第 {idx} 列時發生錯誤: {e}")
+                    continue
         
         return result
     
@@ -253,11 +361,71 @@ class SignalPredictor:
             
             summary['active_signals'] = active_signals
             return summary
-            
+        
         except Exception as e:
             return {'error': str(e)}
 
 
+# 指示燈閾值設定 (A-F 個別指標)
+INDICATOR_CHECKS = [
+    ('Engulfing_Strength', 1.3, 'both'),   # A
+    ('Kbar_Power', 0.17, 'both'),           # B
+    ('N_Pattern', 0, 'sign'),               # C: >0 red, <0 green
+    ('Three_Soldiers', 3.3, 'red'),         # D: red only
+    ('Shadow_Reversal', 3.5, 'both'),       # E
+    ('ThreeK_Reversal', 1.5, 'both'),       # F
+]
+
+
+def _count_signals(features_dict, multiplier=1.0):
+    """計算指定閾值倍率下的多空觸發數"""
+    bull, bear = 0, 0
+    for feat, th, mode in INDICATOR_CHECKS:
+        val = features_dict.get(feat, 0)
+        if val is None or (isinstance(val, float) and (np.isnan(val) or pd.isna(val))):
+            val = 0
+        scaled = th * multiplier
+        if mode == 'sign':
+            if val > 0: bull += 1
+            elif val < 0: bear += 1
+        elif mode == 'red':
+            if val >= max(scaled, 0.01): bull += 1
+        else:
+            if val >= max(scaled, 0.001): bull += 1
+            if val <= -max(scaled, 0.001): bear += 1
+    return bull, bear
+
+
+def calc_row_lights(features_dict):
+    """
+    計算每列4個指示燈顏色（多空分離）
+    燈1: 多單個別訊號 — A-F 任一觸發多單（全閾值）→ 紅燈
+    燈2: 空單個別訊號 — A-F 任一觸發空單（全閾值）→ 綠燈
+    燈3: 綜合多單 — H/I/J 任一達標 → 紅燈
+    燈4: 綜合空單 — H/I/J 任一達標 → 綠燈
+    """
+    # 個別指標 (full threshold)
+    b1, g1 = _count_signals(features_dict, 1.0)
+    
+    # 綜合訊號：任一層級達標即亮燈
+    # H: 2項以上 ×0.6 | I: 3項以上 ×0.3 | J: 4項以上 ×0.2
+    composite_bull = False
+    composite_bear = False
+    for mult, min_n in [(0.6, 2), (0.3, 3), (0.2, 4)]:
+        bc, gc = _count_signals(features_dict, mult)
+        if bc >= min_n:
+            composite_bull = True
+        if gc >= min_n:
+            composite_bear = True
+    
+    return [
+        'red' if b1 > 0 else 'gray',           # 燈1: 多單個別
+        'green' if g1 > 0 else 'gray',          # 燈2: 空單個別
+        'red' if composite_bull else 'gray',     # 燈3: 綜合多單
+        'green' if composite_bear else 'gray',   # 燈4: 綜合空單
+    ]
+
+
 SIGNAL_COLORS = {
     'long_entry': {'強烈': '#FF0000', '中等': '#FF6600', '一般': '#FFCC00'},
     'long_exit': {'出場': '#00AA00'},
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+寫入端服務組裝
+排程器、LINE 通知、K 棒收盤管線、多商品監控、多週期彙總、Metrics 輸出與唯讀副本發佈，
+app.py（單一進程模式）與 run_worker.py（獨立寫入進程）共用同一套組裝；
+模型熱更新（start_model_watcher）則兩種模式的 UI / 寫入進程都會啟動
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import LINE_CONFIG, LIVE_CONFIG, METRICS_CONFIG, MONITOR_CONFIG, RESOLUTION_CONFIG, REPLICA_CONFIG, \
+    RESCORE_CONFIG, MODEL_RELOAD_CONFIG, FEATURE_NAMES
+from core.data_fetcher import DataFetcher
+from core.scheduler import DataScheduler
+from core.line_notifier import LineNotifier
+from core.live_pipeline import LivePipeline
+from core.multi_symbol import MultiSymbolMonitor
+from core.resolution import ResolutionFeed
+from core.replica import ReplicaPublisher
+from core.rescorer import PredictionRescorer
+from core.metrics import METRICS, start_http_server
+
+
+def start_services(db_manager, data_fetcher, feature_calculator, model_loader, signal_predictor) -> dict:
+    """
+    啟動排程器並註冊所有寫入端工作
+    
+    Returns:
+        {'scheduler', 'line_notifier', 'live_pipeline', 'multi_monitor', 'rescorer',
+         'resolution_feed', 'replica'}
+    """
+    scheduler = DataScheduler(db_manager, data_fetcher, feature_calculator)
+    scheduler.start()
+    
+    # LINE 通知
+    line_notifier = None
+    if LINE_CONFIG.get('enabled'):
+        line_notifier = LineNotifier(
+            channel_id=LINE_CONFIG['channel_id'],
+            channel_secret=LINE_CONFIG['channel_secret'],
+            queue_size=LINE_CONFIG.get('queue_size', 100),
+            max_retries=LINE_CONFIG.get('max_retries', 3),
+            retry_backoff=LINE_CONFIG.get('retry_backoff', 1.0),
+            db_manager=db_manager,
+            dedup_ttl=LINE_CONFIG.get('dedup_ttl', 2 * 86400),
+            dedup_cache_size=LINE_CONFIG.get('dedup_cache_size', 500),
+        )
+    
+    # 伺服器端 K 棒收盤管線（無人開網頁也會推播）
+    live_pipeline = None
+    if LIVE_CONFIG.get('enabled'):
+        live_pipeline = LivePipeline(
+            db_manager, data_fetcher, feature_calculator,
+            signal_predictor, line_notifier,
+        )
+    
+    # 其他商品（小台 / 近遠月）：各自管線，共用已載入的模型與 LINE 佇列；
+    # 主商品與其他商品由同一個收盤工作一起送進執行緒池並行
+    multi_monitor = None
+    extra_symbols = [s for s in MONITOR_CONFIG.get('symbols', [])[1:] if s != data_fetcher.symbol]
+    if live_pipeline and extra_symbols:
+        multi_monitor = MultiSymbolMonitor(
+            extra_symbols, model_loader, line_notifier=line_notifier,
+            max_workers=MONITOR_CONFIG.get('max_workers'), primary=live_pipeline,
+        )
+        multi_monitor.register(scheduler.jobs, keep_days=MONITOR_CONFIG.get('keep_days'))
+    elif live_pipeline:
+        live_pipeline.register(scheduler.jobs)
+    
+    # 模型組指紋變更後背景重算已存預測（主商品 + 其他商品）
+    rescorer = None
+    if RESCORE_CONFIG.get('enabled'):
+        dbs = [db_manager] + ([p.db for p in multi_monitor.pipelines.values()] if multi_monitor else [])
+        rescorer = PredictionRescorer(dbs, signal_predictor)
+        rescorer.register(scheduler.jobs)
+    
+    # 多週期彙總：另抓 1 分 K，5 / 15 / 60 分在本機彙總並計算特徵，寫入各自的 ohlcv_{N}m；
+    # 收盤管線與推播仍以 API 5 分 K（ohlcv_data）為準，兩者不共用資料表
+    resolution_feed = None
+    if RESOLUTION_CONFIG.get('enabled'):
+        resolution_feed = ResolutionFeed(
+            fetcher=DataFetcher(resolution=RESOLUTION_CONFIG['base']),
+            feature_calculator=feature_calculator,
+        )
+        resolution_feed.register(scheduler.jobs)
+    
+    # 效能量測輸出（Prometheus textfile / HTTP）
+    if METRICS_CONFIG.get('enabled'):
+        if METRICS_CONFIG.get('textfile'):
+            scheduler.jobs.add_interval(
+                'metrics', lambda: METRICS.write_textfile(METRICS_CONFIG['textfile']),
+                METRICS_CONFIG['write_interval'], label='Metrics 輸出')
+        if METRICS_CONFIG.get('http_port'):
+            start_http_server(METRICS_CONFIG['http_port'])
+    
+    # 唯讀副本：UI 進程只讀這份快照
+    replica = None
+    if REPLICA_CONFIG.get('enabled'):
+        replica = ReplicaPublisher(db_manager.db_path, REPLICA_CONFIG['path'])
+        replica.publish(force=True)
+        replica.register(scheduler.jobs)
+    
+    return {
+        'scheduler': scheduler,
+        'line_notifier': line_notifier,
+        'live_pipeline': live_pipeline,
+        'multi_monitor': multi_monitor,
+        'rescorer': rescorer,
+        'resolution_feed': resolution_feed,
+        'replica': replica,
+    }
+
+
+def startup_integrity_check(db_manager, scheduler):
+    """
+    應用啟動時的資料完整性防呆檢查。
+    
+    檢查項目：
+      1. 資料缺口（時段缺失）：有日盤→必有夜盤
+      2. 特徵完整性（NULL 特徵）
+    若發現問題，嘗試從 API 補回。
+    """
+    try:
+        # 檢查資料缺口
+        gaps = db_manager.check_data_gaps()
+        feat_issues = db_manager.check_feature_completeness()
+        
+        if gaps or feat_issues:
+            print(f"[啟動檢查] 發現 {len(gaps)} 個資料缺口, {len(feat_issues)} 個特徵問題")
+            # 觸發排程器的修復流程
+            scheduler.validate_and_fill_gaps()
+        else:
+            print("[啟動檢查] 資料完整性OK")
+    except Exception as e:
+        print(f"[啟動檢查] 發生錯誤: {e}")
+
+
+def start_model_watcher(model_loader, signal_predictor, db_manager):
+    """
+    啟動模型熱更新：模型檔變動時在背景載入，
+    以最近 MODEL_RELOAD_CONFIG['canary_rows'] 根已存特徵試算通過後才整組替換
+    """
+    if not MODEL_RELOAD_CONFIG.get('enabled'):
+        return
+    
+    def _validate(models):
+        bars = db_manager.load_ohlcv(days=1, include_features=True)
+        if bars.empty or not all(f in bars.columns for f in FEATURE_NAMES):
+            return []
+        canary = bars[FEATURE_NAMES].dropna().tail(MODEL_RELOAD_CONFIG['canary_rows'])
+        return signal_predictor.validate_models(models, canary.to_numpy())
+    
+    model_loader.start_watcher(_validate)
@@ -1,115 +1,219 @@
 # -*- coding: utf-8 -*-
 """
 歷史資料匯入腳本
-讀取 CSV 歷史交易資料，計算17個特徵後存入資料庫
-保留最近5個交易日
+分批串流讀取 CSV 歷史交易資料，計算17個特徵後存入資料庫
+預設保留最近5個交易日
+
+串流做法（多年份匯出檔也維持固定記憶體）：
+  1. 讀檔頭數 KB 判斷編碼，不再整檔重讀嘗試
+  2. 以明確 dtype 分批 read_csv，datetime 由日期（只解析不重複值）+ 時間差向量化組成
+  3. 批次間保留前一批尾端 lookback × warmup_multiplier 根作暖機，特徵與整檔計算一致
+  4. 每批以 save_ohlcv_bulk 單一交易寫入
+
+用法:
+  python import_history.py                           # 260207_history.csv
+  python import_history.py data/2024_full.csv --keep-days 0 --chunksize 100000
+  python import_history.py exports/ --keep-days 0          # 目錄下全部 CSV（多檔模式）
+  python import_history.py "exports/2025*.csv" --workers 4
+
+多檔模式：各檔在 process pool 平行解析，依時間合併、重疊時間以較後面的檔案為準，
+合併後的連續序列只計算一次特徵，並以單一交易寫入
 """
 
-import pandas as pd
-import numpy as np
+import argparse
+import codecs
+import glob
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+import pandas as pd
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from config import FEATURE_NAMES
+from config import FEATURE_NAMES, IMPORT_CONFIG
 from core.db_manager import DBManager
 from core.feature_calculator import FeatureCalculator
 
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "260207_history.csv")
 
-def import_csv(csv_path: str):
-    """匯入 CSV 歷史資料"""
-    print(f"[1/5] 讀取 CSV: {csv_path}")
-    
-    # 嘗試不同編碼
-    for enc in ['big5', 'cp950', 'utf-8', 'utf-8-sig']:
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+EXPECTED_ZH = ['日期', '時間', '開盤價', '最高價', '最低價', '收盤價', '成交量']
+EXPECTED_EN = ['date', 'time', 'open', 'high', 'low', 'close', 'volume']
+
+# 依序嘗試的編碼（utf-8 最嚴格，放最前面避免被 big5 誤判）
+CANDIDATE_ENCODINGS = ['utf-8', 'big5', 'cp950']
+
+
+def sniff_encoding(csv_path: str, nbytes: int = None) -> Optional[str]:
+    """讀取檔頭判斷編碼，無法判斷回傳 None"""
+    with open(csv_path, 'rb') as f:
+        head = f.read(nbytes or IMPORT_CONFIG['sniff_bytes'])
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for enc in CANDIDATE_ENCODINGS:
         try:
-            df = pd.read_csv(csv_path, encoding=enc)
-            break
-        except:
+            # final=False：檔頭截斷在多位元組字元中間時不視為錯誤
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
             continue
-    else:
-        print("ERROR: 無法讀取 CSV，請確認編碼格式")
-        return
-    
-    print(f"  原始欄位: {list(df.columns)}")
-    print(f"  資料筆數: {len(df)}")
-    
-    # 欄位名稱標準化（支援中英文）
+    return None
+
+
+def map_columns(columns: list) -> dict:
+    """原始欄名 → date/time/open/high/low/close/volume（支援中英文，無法辨識時依位置）"""
     col_map = {}
-    cols = list(df.columns)
-    
-    # 嘗試依序對應
-    expected_zh = ['日期', '時間', '開盤價', '最高價', '最低價', '收盤價', '成交量']
-    expected_en = ['date', 'time', 'open', 'high', 'low', 'close', 'volume']
-    
-    if len(cols) >= 7:
-        for i, col in enumerate(cols[:7]):
-            col_lower = col.strip().lower()
-            if any(zh in col for zh in expected_zh):
-                col_map[col] = expected_en[expected_zh.index(next(zh for zh in expected_zh if zh in col))]
-            else:
-                col_map[col] = expected_en[i]
+    if len(columns) >= 7:
+        for i, col in enumerate(columns[:7]):
+            zh = next((zh for zh in EXPECTED_ZH if zh in col), None)
+            col_map[col] = EXPECTED_EN[EXPECTED_ZH.index(zh)] if zh else EXPECTED_EN[i]
+    return col_map
+
+
+def _date_format(sample: str) -> str:
+    """由第一筆日期判斷格式（2026/1/30、2026-01-30、20260130）"""
+    sample = sample.strip()
+    if '/' in sample:
+        return '%Y/%m/%d'
+    if '-' in sample:
+        return '%Y-%m-%d'
+    return '%Y%m%d'
+
+
+def build_datetime(dates: pd.Series, times: pd.Series, date_format: str) -> pd.Series:
+    """日期 + 時間 → datetime（日期、時間各只解析不重複值，再以索引向量化相加）"""
+    date_codes, date_uniques = pd.factorize(dates.str.strip())
+    time_codes, time_uniques = pd.factorize(times.str.strip())
+    days = pd.to_datetime(pd.Series(date_uniques), format=date_format).to_numpy()
+    # 部分匯出檔時間只到分（08:45），補成 HH:MM:SS 才能解析為 timedelta
+    time_uniques = pd.Series(time_uniques)
+    time_uniques = time_uniques.where(time_uniques.str.count(':') == 2, time_uniques + ':00')
+    offsets = pd.to_timedelta(time_uniques).to_numpy()
+    return pd.Series(days[date_codes] + offsets[time_codes], index=dates.index)
+
+
+def iter_history_chunks(csv_path: str, chunksize: int = None,
+                        encoding: str = None, verbose: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    分批讀取 CSV，每批回傳依時間排序的 OHLCV + datetime/timestamp
     
-    if col_map:
-        df = df.rename(columns=col_map)
+    數值欄位以 float64 解析；無法解析的列（含空值）會被捨棄
+    """
+    encoding = encoding or sniff_encoding(csv_path)
+    if encoding is None:
+        print("ERROR: 無法讀取 CSV，請確認編碼格式")
+        return
     
-    print(f"  對應後欄位: {list(df.columns)}")
+    header = pd.read_csv(csv_path, encoding=encoding, nrows=0)
+    col_map = map_columns(list(header.columns))
+    if verbose:
+        print(f"  編碼: {encoding}")
+        print(f"  原始欄位: {list(header.columns)}")
+        print(f"  對應後欄位: {[col_map.get(c, c) for c in header.columns]}")
     
-    # 建立 datetime
-    print("[2/5] 轉換時間格式...")
-    df['datetime'] = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+    src = {v: k for k, v in col_map.items()}
+    dtype = {src['date']: str, src['time']: str}
+    dtype.update({src[c]: 'float64' for c in OHLCV_COLUMNS})
     
-    # 建立 timestamp（秒級）
-    df['timestamp'] = (df['datetime'].astype(np.int64) // 10**9).astype(int)
+    date_format = None
+    reader = pd.read_csv(csv_path, encoding=encoding, usecols=list(col_map),
+                         dtype=dtype, chunksize=chunksize or IMPORT_CONFIG['chunksize'])
+    for chunk in reader:
+        chunk = chunk.rename(columns=col_map).dropna(subset=['date', 'time'] + OHLCV_COLUMNS)
+        if chunk.empty:
+            continue
+        if date_format is None:
+            date_format = _date_format(chunk['date'].iloc[0])
+        
+        chunk['datetime'] = build_datetime(chunk['date'], chunk['time'], date_format)
+        # 建立 timestamp（秒級；以時間差換算，不受 datetime64 解析度 ns / us 影響）
+        chunk['timestamp'] = ((chunk['datetime'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype(int)
+        yield chunk.sort_values('timestamp').reset_index(drop=True)
+
+
+def read_history_csv(csv_path: str) -> pd.DataFrame:
+    """讀取 CSV 歷史資料，回傳依時間排序的 OHLCV + datetime/timestamp"""
+    chunks = list(iter_history_chunks(csv_path))
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    print(f"  資料筆數: {len(df)}")
+    return df.sort_values('timestamp').reset_index(drop=True)
+
+
+def import_csv(csv_path: str, db: DBManager = None, chunksize: int = None,
+               keep_days: int = 5):
+    """
+    串流匯入 CSV 歷史資料
     
-    # 確保數值欄位
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    Args:
+        csv_path: CSV 路徑（需依時間遞增排列）
+        db: 目標資料庫（預設 config.DATABASE_PATH）
+        chunksize: 每批列數
+        keep_days: 匯入後保留的交易日數，0 表示不清理
+    """
+    db = db or DBManager()
+    fc = FeatureCalculator()
+    warmup = fc.get_lookback_bars() * IMPORT_CONFIG['warmup_multiplier']
     
-    df = df.dropna(subset=['open', 'high', 'low', 'close', 'volume'])
-    df = df.sort_values('timestamp').reset_index(drop=True)
+    print(f"[1/4] 讀取 CSV: {csv_path}")
+    tail = pd.DataFrame()
+    daily_counts = pd.Series(dtype='int64')
+    total = saved = 0
+    first_dt = last_row = None
+    t0 = time.perf_counter()
     
-    print(f"  有效資料: {len(df)} 筆")
-    print(f"  日期範圍: {df['datetime'].min()} ~ {df['datetime'].max()}")
+    print("[2/4] 分批計算17個特徵並寫入資料庫...")
+    for i, chunk in enumerate(iter_history_chunks(csv_path, chunksize)):
+        chunk = chunk.drop_duplicates('timestamp', keep='last')
+        if not tail.empty:
+            last_ts = tail['timestamp'].iloc[-1]
+            if chunk['timestamp'].iloc[0] < last_ts:
+                print(f"  WARNING: 第 {i + 1} 批時間早於前一批，CSV 未依時間排序，特徵可能不連續")
+            chunk = chunk[chunk['timestamp'] > last_ts]
+            if chunk.empty:
+                continue
+        
+        combined = pd.concat([tail, chunk], ignore_index=True) if not tail.empty else chunk
+        processed = fc.calculate_all(combined).iloc[len(tail):]
+        saved += db.save_ohlcv_bulk(processed, include_features=True)
+        tail = combined[['timestamp', 'datetime'] + OHLCV_COLUMNS].tail(warmup).reset_index(drop=True)
+        
+        total += len(chunk)
+        first_dt = first_dt if first_dt is not None else chunk['datetime'].iloc[0]
+        last_row = processed.iloc[-1]
+        daily_counts = daily_counts.add(chunk['datetime'].dt.strftime('%Y-%m-%d').value_counts(),
+                                        fill_value=0)
+        elapsed = time.perf_counter() - t0
+        print(f"  第 {i + 1} 批: {len(chunk)} 筆，累計 {total} 筆（{total / elapsed:,.0f} 筆/秒）")
     
-    # 顯示交易日
-    df['date_str'] = df['datetime'].dt.strftime('%Y-%m-%d')
-    trading_dates = sorted(df['date_str'].unique())
-    print(f"  交易日數: {len(trading_dates)}")
-    for d in trading_dates:
-        count = len(df[df['date_str'] == d])
-        print(f"    {d}: {count} 筆")
+    if total == 0:
+        print("  無有效資料")
+        return
     
-    # 計算17個特徵
-    print("[3/5] 計算17個特徵...")
-    fc = FeatureCalculator()
-    processed = fc.calculate_all(df)
+    print("[3/4] 匯入摘要")
+    print(f"  有效資料: {total} 筆，已存入 {saved} 筆")
+    print(f"  日期範圍: {first_dt} ~ {last_row['datetime']}")
+    print(f"  交易日數: {len(daily_counts)}")
+    for d, count in daily_counts.sort_index().items():
+        print(f"    {d}: {int(count)} 筆")
     
-    # 確認特徵
-    missing = [f for f in FEATURE_NAMES if f not in processed.columns]
+    missing = [f for f in FEATURE_NAMES if f not in last_row.index]
     if missing:
         print(f"  WARNING: 缺少特徵: {missing}")
     else:
-        print(f"  17個特徵計算完成")
-    
-    # 顯示最後幾筆特徵值
-    print("  最新一筆特徵值:")
-    last = processed.iloc[-1]
-    for f in FEATURE_NAMES:
-        if f in processed.columns:
-            print(f"    {f}: {last[f]:.6f}")
-    
-    # 存入資料庫
-    print("[4/5] 存入資料庫...")
-    db = DBManager()
-    count = db.save_ohlcv(processed, include_features=True)
-    print(f"  已存入 {count} 筆資料")
-    
-    # 清理舊資料（保留5個交易日）
-    print("[5/5] 清理舊資料（保留5個交易日）...")
-    deleted = db.cleanup_by_trading_days(keep_days=5)
-    print(f"  已清理 {deleted} 筆舊資料")
+        print("  最新一筆特徵值:")
+        for f in FEATURE_NAMES:
+            print(f"    {f}: {last_row[f]:.6f}")
+    
+    if keep_days:
+        print(f"[4/4] 清理舊資料（保留{keep_days}個交易日）...")
+        deleted = db.cleanup_by_trading_days(keep_days=keep_days)
+        print(f"  已清理 {deleted} 筆舊資料")
+    else:
+        print("[4/4] 保留全部資料（不清理）")
     
     # 最終統計
     stats = db.get_data_stats()
@@ -122,11 +226,97 @@ def import_csv(csv_path: str):
     print("\n匯入完成!")
 
 
+def expand_sources(source: str) -> List[str]:
+    """路徑 / 目錄 / glob → 排序後的 CSV 清單"""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.csv")))
+    if os.path.exists(source):
+        return [source]
+    return sorted(glob.glob(source))
+
+
+def _parse_file(csv_path: str) -> pd.DataFrame:
+    """worker：解析單一檔案（不輸出欄位資訊）"""
+    chunks = list(iter_history_chunks(csv_path, verbose=False))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def import_many(paths: List[str], db: DBManager = None, workers: int = None,
+                keep_days: int = 5):
+    """
+    多檔匯入
+    
+    Args:
+        paths: CSV 路徑（重疊時間以清單中較後的檔案為準）
+        db: 目標資料庫（預設 config.DATABASE_PATH）
+        workers: 解析用 process 數（預設 CPU 數）
+        keep_days: 匯入後保留的交易日數，0 表示不清理
+    """
+    db = db or DBManager()
+    t0 = time.perf_counter()
+    
+    print(f"[1/4] 平行解析 {len(paths)} 個檔案...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(_parse_file, paths))
+    for path, frame in zip(paths, frames):
+        print(f"  {os.path.basename(path)}: {len(frame)} 筆")
+    frames = [f.assign(_order=i) for i, f in enumerate(frames) if not f.empty]
+    if not frames:
+        print("  無有效資料")
+        return
+    raw = sum(len(f) for f in frames)
+    t_parse = time.perf_counter() - t0
+    print(f"  解析 {raw} 筆，{t_parse:.2f}s（{raw / t_parse:,.0f} 筆/秒）")
+    
+    print("[2/4] 合併並計算17個特徵...")
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.sort_values(['timestamp', '_order'], kind='mergesort')
+    merged = merged.drop_duplicates('timestamp', keep='last').drop(columns='_order')
+    merged = merged.reset_index(drop=True)
+    print(f"  合併後 {len(merged)} 筆（重疊去除 {raw - len(merged)} 筆）")
+    print(f"  日期範圍: {merged['datetime'].iloc[0]} ~ {merged['datetime'].iloc[-1]}")
+    
+    t1 = time.perf_counter()
+    processed = FeatureCalculator().calculate_all(merged)
+    t_feat = time.perf_counter() - t1
+    print(f"  特徵 {t_feat:.2f}s（{len(merged) / t_feat:,.0f} 筆/秒）")
+    
+    print("[3/4] 單一交易寫入資料庫...")
+    t2 = time.perf_counter()
+    saved = db.save_ohlcv_bulk(processed, include_features=True)
+    t_write = time.perf_counter() - t2
+    print(f"  已存入 {saved} 筆，{t_write:.2f}s（{saved / t_write:,.0f} 筆/秒）")
+    
+    if keep_days:
+        print(f"[4/4] 清理舊資料（保留{keep_days}個交易日）...")
+        deleted = db.cleanup_by_trading_days(keep_days=keep_days)
+        print(f"  已清理 {deleted} 筆舊資料")
+    else:
+        print("[4/4] 保留全部資料（不清理）")
+    
+    elapsed = time.perf_counter() - t0
+    print(f"\n匯入完成! 共 {len(merged)} 筆，{elapsed:.2f}s（{len(merged) / elapsed:,.0f} 筆/秒）")
+
+
 if __name__ == "__main__":
-    csv_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "260207_history.csv")
+    parser = argparse.ArgumentParser(description="歷史 CSV 串流匯入")
+    parser.add_argument('csv', nargs='?', default=DEFAULT_CSV, help="CSV 路徑、目錄或 glob")
+    parser.add_argument('--db', default=None, help="資料庫路徑（預設 config.DATABASE_PATH）")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"單檔模式每批列數（預設 {IMPORT_CONFIG['chunksize']}）")
+    parser.add_argument('--workers', type=int, default=None, help="多檔模式解析 process 數")
+    parser.add_argument('--keep-days', type=int, default=5, help="保留交易日數，0 表示不清理")
+    args = parser.parse_args()
     
-    if not os.path.exists(csv_file):
-        print(f"找不到檔案: {csv_file}")
+    paths = expand_sources(args.csv)
+    if not paths:
+        print(f"找不到檔案: {args.csv}")
         sys.exit(1)
     
-    import_csv(csv_file)
+    db = DBManager(args.db) if args.db else None
+    if len(paths) == 1 and not os.path.isdir(args.csv):
+        import_csv(paths[0], db, args.chunksize, args.keep_days)
+    else:
+        import_many(paths, db, args.workers, args.keep_days)
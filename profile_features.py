@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+特徵計算剖析腳本
+依輸入筆數列出各 _calc_* 方法的耗時與記憶體配置，找出隨 K 棒數成長的瓶頸
+
+用法:
+  python profile_features.py                              # 260207_history.csv，300 / 全部
+  python profile_features.py --sizes 300,1100,5000 --synthetic
+  python profile_features.py --sort peak_kb --no-memory
+  python profile_features.py --pstats features.pstats     # 另輸出 cProfile
+"""
+
+import argparse
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.feature_profiler import FeatureProfiler, synthetic_bars
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "260207_history.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FeatureCalculator 逐方法剖析")
+    parser.add_argument('--csv', default=DEFAULT_CSV, help="歷史 CSV 路徑")
+    parser.add_argument('--synthetic', action='store_true', help="改用隨機漫步 K 棒（可超過 CSV 筆數）")
+    parser.add_argument('--sizes', default=None, help="輸入筆數，逗號分隔（預設 300,全部）")
+    parser.add_argument('--repeat', type=int, default=3, help="計時輪數")
+    parser.add_argument('--sort', default='wall', help="排序欄位 (wall/share/peak_kb/net_kb/wall_per_bar_us)")
+    parser.add_argument('--no-memory', action='store_true', help="不跑 tracemalloc")
+    parser.add_argument('--pstats', default=None, help="以最大筆數跑 cProfile 並輸出 .pstats")
+    parser.add_argument('--output', default=None, help="報表輸出 CSV 路徑")
+    args = parser.parse_args()
+    
+    sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else None
+    if args.synthetic:
+        bars = synthetic_bars(max(sizes) if sizes else 1100)
+    else:
+        from import_history import read_history_csv
+        bars = read_history_csv(args.csv)
+    if bars.empty:
+        print("無資料")
+        sys.exit(1)
+    if sizes is None:
+        sizes = sorted({min(300, len(bars)), len(bars)})
+    if max(sizes) > len(bars):
+        print(f"資料只有 {len(bars)} 根，超過的筆數以全部資料計算（可加 --synthetic）")
+    
+    profiler = FeatureProfiler()
+    profiler.profile(bars, sizes, repeat=args.repeat, trace_memory=not args.no_memory)
+    report = profiler.report(sort_by=args.sort)
+    
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_rows', 200)
+    for size, part in report.groupby('size', sort=True):
+        print(f"\n=== {size} 根 ===")
+        print(part.drop(columns='size').to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    
+    if len(set(report['size'])) > 1:
+        print("\n=== 耗時隨筆數變化（秒）===")
+        print(profiler.scaling().to_string(float_format=lambda v: f"{v:.4f}"))
+    
+    if args.output:
+        report.to_csv(args.output, index=False)
+        print(f"\n已輸出: {args.output}")
+    
+    if args.pstats:
+        print()
+        profiler.cprofile(bars.tail(max(sizes)).reset_index(drop=True), args.pstats)
+
+
+if __name__ == "__main__":
+    main()
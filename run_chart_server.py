@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+鉅亨網 charting API 本機替身伺服器
+以歷史 K 棒提供相同格式的 API，供離線回放 / 壓力測試
+
+用法:
+  python run_chart_server.py                         # 以 260207_history.csv 啟動
+  python run_chart_server.py --latency 0.05 --jitter 0.1 --error-rate 0.02
+  python run_chart_server.py --load-test 5000 --concurrency 16   # 啟動後自我壓測
+  
+  另一個終端：
+  TX_API_BASE_URL=http://127.0.0.1:8765/ws/api/v1/charting/history streamlit run app.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import CHART_SERVER_CONFIG
+from core.chart_server import ArchiveChartSource, ChartServer
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "260207_history.csv")
+
+
+def load_test(server: ChartServer, total: int, concurrency: int):
+    """以多執行緒連續請求，輸出吞吐量與延遲分佈"""
+    t_min, t_max = int(server.source.t[0]), int(server.source.t[-1]) + server.source.bar_seconds
+    rng = np.random.default_rng(0)
+    targets = rng.integers(t_min, t_max, size=total)
+    
+    def _worker(chunk):
+        session = requests.Session()
+        latencies, failures = [], 0
+        for to in chunk:
+            t0 = time.perf_counter()
+            try:
+                res = session.get(server.url, params={
+                    'symbol': 'TWF:TXF:FUTURES', 'resolution': '5',
+                    'to': int(to), 'limit': 5}, timeout=10)
+                if res.status_code != 200:
+                    failures += 1
+            except requests.exceptions.RequestException:
+                failures += 1
+            latencies.append(time.perf_counter() - t0)
+        return latencies, failures
+    
+    print(f"壓測: {total} 次請求，{concurrency} 個連線")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        parts = list(pool.map(_worker, np.array_split(targets, concurrency)))
+    elapsed = time.perf_counter() - t0
+    
+    latencies = np.concatenate([np.asarray(p[0]) for p in parts]) * 1000
+    failures = sum(p[1] for p in parts)
+    print(f"  吞吐量: {total / elapsed:.0f} req/s（{elapsed:.2f}s）")
+    print(f"  延遲: p50 {np.percentile(latencies, 50):.2f}ms / "
+          f"p95 {np.percentile(latencies, 95):.2f}ms / p99 {np.percentile(latencies, 99):.2f}ms")
+    print(f"  非 200 回應: {failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="charting API 本機替身伺服器")
+    parser.add_argument('--csv', default=DEFAULT_CSV, help="歷史 CSV 路徑")
+    parser.add_argument('--db', action='store_true', help="改用 DB 中的歷史資料")
+    parser.add_argument('--host', default=CHART_SERVER_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=CHART_SERVER_CONFIG['port'])
+    parser.add_argument('--latency', type=float, default=CHART_SERVER_CONFIG['latency'], help="固定延遲（秒）")
+    parser.add_argument('--jitter', type=float, default=CHART_SERVER_CONFIG['jitter'], help="隨機延遲上限（秒）")
+    parser.add_argument('--error-rate', type=float, default=CHART_SERVER_CONFIG['error_rate'], help="錯誤回應比例")
+    parser.add_argument('--publish-delay', type=float, default=1.0, help="K 棒開始後幾秒出現")
+    parser.add_argument('--no-partial', action='store_true', help="形成中 K 棒直接提供完整量價")
+    parser.add_argument('--load-test', type=int, default=0, help="啟動後自我壓測的請求數")
+    parser.add_argument('--concurrency', type=int, default=8, help="壓測連線數")
+    args = parser.parse_args()
+    
+    if args.db:
+        from core.db_manager import DBManager
+        bars = DBManager().load_ohlcv(include_features=False)
+    else:
+        from import_history import read_history_csv
+        bars = read_history_csv(args.csv)
+    if bars.empty:
+        print("無歷史資料")
+        sys.exit(1)
+    
+    source = ArchiveChartSource(bars, args.publish_delay, not args.no_partial)
+    server = ChartServer(source, {
+        'host': args.host, 'port': args.port,
+        'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+    })
+    server.start()
+    print(f"  資料: {len(bars)} 根 ({bars['datetime'].min()} ~ {bars['datetime'].max()})")
+    
+    try:
+        if args.load_test:
+            load_test(server, args.load_test, args.concurrency)
+            return
+        print("  Ctrl+C 停止")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+即時管線回放腳本
+以 CSV 或 DB 中的歷史 K 棒，透過虛擬時鐘回放正式的即時管線
+（替身 API → 合併 → 特徵 → 評分 → 替身 LINE），
+輸出各階段延遲分佈，並與批次回測的訊號比對
+
+用法:
+  python run_replay.py                              # 回放 260207_history.csv
+  python run_replay.py --speed 200 --start "2026-02-05 08:45"
+  python run_replay.py --db --output replay.csv     # 回放 DB 中的資料
+  python run_replay.py --server                     # 經由本機 HTTP 替身 API
+"""
+
+import argparse
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import REPLAY_CONFIG
+from core.model_loader import ModelLoader
+from core.signal_predictor import SignalPredictor
+from core.replay import ReplaySimulator
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "260207_history.csv")
+
+
+def load_bars(args) -> pd.DataFrame:
+    """讀取回放用 K 棒"""
+    if args.db:
+        from core.db_manager import DBManager
+        return DBManager().load_ohlcv(include_features=False)
+    
+    from import_history import read_history_csv
+    return read_history_csv(args.csv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="即時管線回放")
+    parser.add_argument('--csv', default=DEFAULT_CSV, help="歷史 CSV 路徑")
+    parser.add_argument('--db', action='store_true', help="改用 DB 中的歷史資料")
+    parser.add_argument('--start', default=None, help="回放起點 (YYYY-MM-DD HH:MM)")
+    parser.add_argument('--end', default=None, help="回放終點 (YYYY-MM-DD HH:MM)")
+    parser.add_argument('--speed', type=float, default=REPLAY_CONFIG['speed'], help="虛擬時鐘倍速")
+    parser.add_argument('--server', action='store_true', help="經由本機 HTTP 替身 API 取資料")
+    parser.add_argument('--output', default=None, help="逐根結果輸出 CSV 路徑")
+    args = parser.parse_args()
+    
+    bars = load_bars(args)
+    if bars.empty:
+        print("無歷史資料")
+        sys.exit(1)
+    
+    loader = ModelLoader()
+    loader.load_all()
+    sim = ReplaySimulator(bars, SignalPredictor(loader), config={'speed': args.speed},
+                          use_server=args.server)
+    
+    results = sim.run(
+        start=pd.Timestamp(args.start) if args.start else None,
+        end=pd.Timestamp(args.end) if args.end else None,
+    )
+    if results.empty:
+        sys.exit(1)
+    
+    print("\n=== 各階段延遲（秒，wait 為虛擬秒）===")
+    print(sim.latency_report(results).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    
+    parity = sim.check_parity(results)
+    print("\n=== 與批次回測比對 ===")
+    print(f"  K 棒數: {parity['bars']}")
+    print(f"  機率最大誤差: 多 {parity['max_diff_long']:.2e} / 空 {parity['max_diff_short']:.2e}")
+    print(f"  超出容許誤差: {parity['over_tolerance']} 根")
+    for level, n in parity['signal_mismatches'].items():
+        print(f"  {level} 訊號不一致: {n}")
+    print(f"  推播: {parity['notifications']} / 預期 {parity['expected_notifications']}")
+    print(f"  結果: {'一致' if parity['ok'] else '不一致'}")
+    
+    if args.output:
+        results.drop(columns=['lights']).to_csv(args.output, index=False)
+        print(f"\n已輸出: {args.output}")
+    
+    sys.exit(0 if parity['ok'] else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+獨立寫入進程
+獨佔主資料庫：排程抓取 / 補洞 / 清理、K 棒收盤管線與 LINE 推播，
+並定期把主資料庫發佈為唯讀副本（core/replica.py）
+
+用法（config.REPLICA_CONFIG['enabled'] = True）:
+  python run_worker.py
+  另一個終端：streamlit run app.py          # UI 只讀副本，不寫入、不推播
+  
+  python run_worker.py --interval 10        # 發佈間隔改為 10 秒
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import REPLICA_CONFIG
+from core.db_manager import DBManager
+from core.data_fetcher import DataFetcher
+from core.feature_calculator import FeatureCalculator
+from core.model_loader import ModelLoader
+from core.signal_predictor import SignalPredictor
+from core.worker import start_services, startup_integrity_check, start_model_watcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排程 / 推播 / 唯讀副本發佈的寫入進程")
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f"副本發佈間隔秒數（預設 {REPLICA_CONFIG['publish_interval']}）")
+    parser.add_argument('--no-check', action='store_true', help="略過啟動時的資料完整性檢查")
+    args = parser.parse_args()
+    
+    if args.interval:
+        REPLICA_CONFIG['publish_interval'] = args.interval
+    if not REPLICA_CONFIG.get('enabled'):
+        print("REPLICA_CONFIG['enabled'] 未開啟：仍會發佈副本，但 UI 會繼續直接讀寫主資料庫")
+        REPLICA_CONFIG['enabled'] = True
+    
+    db_manager = DBManager()
+    data_fetcher = DataFetcher()
+    feature_calculator = FeatureCalculator()
+    model_loader = ModelLoader()
+    model_loader.load_all()
+    signal_predictor = SignalPredictor(model_loader)
+    
+    services = start_services(db_manager, data_fetcher, feature_calculator,
+                              model_loader, signal_predictor)
+    start_model_watcher(model_loader, signal_predictor, db_manager)
+    if not args.no_check:
+        startup_integrity_check(db_manager, services['scheduler'])
+    print(f"  副本: {REPLICA_CONFIG['path']}（每 {REPLICA_CONFIG['publish_interval']}s）")
+    
+    try:
+        print("  Ctrl+C 停止")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        model_loader.stop_watcher()
+        services['scheduler'].stop()
+        if services['live_pipeline']:
+            services['live_pipeline'].shutdown()
+        if services['multi_monitor']:
+            services['multi_monitor'].shutdown()
+
+
+if __name__ == "__main__":
+    main()
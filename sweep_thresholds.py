@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+門檻掃描工具
+在快取的機率陣列上，平行評估進場 / 出場門檻網格，輸出依勝率排序的門檻組合
+
+做法：
+  1. 以 Backtester 批次評分一次，機率存成 npz 快取（之後掃描不需重新評分）
+  2. 價格 / 盤尾 / 機會標記 / 機率打包進一塊 SharedMemory，
+     worker 只附加同一塊記憶體，不對每個任務 pickle 陣列
+  3. 網格切成區塊分給 ProcessPoolExecutor，每個任務只傳門檻數值
+
+用法:
+  python sweep_thresholds.py                 # 使用 DB 全部資料
+  python sweep_thresholds.py --workers 8 --min-trades 20
+  python sweep_thresholds.py --compact       # 精簡模式讀取長期資料
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import DATABASE_DIR, FEATURE_NAMES, COMPACT_CONFIG
+from core.backtester import Backtester, DIRECTIONS, simulate, summarize
+from core.compact import CompactBars
+
+PROBS_CACHE = os.path.join(DATABASE_DIR, "backtest_probs.npz")
+
+# 共享陣列的欄位順序
+SHARED_COLUMNS = ['close', 'session_end', 'long_opportunity', 'short_opportunity',
+                  'long_entry', 'long_exit', 'short_entry', 'short_exit']
+
+# worker 端附加的共享記憶體
+_shm = None
+_arrays = {}
+_config = {}
+
+
+# 快取中的比對欄位（其餘為各目標機率）
+CACHE_KEYS = ('timestamp', 'fingerprint', 'feature_digest')
+
+
+def load_or_score(bt: Backtester, df, cache_path: str = PROBS_CACHE) -> dict:
+    """
+    讀取機率快取，否則批次評分並寫入快取
+    
+    時間戳、模型組指紋與特徵矩陣摘要都相符才使用快取：
+    換模型或重算特徵（時間戳不變）後會重新評分
+    """
+    timestamps = np.asarray(df['timestamp'], dtype=np.int64)
+    features = np.ascontiguousarray(bt.feature_matrix(df))
+    feature_digest = hashlib.sha256(features.tobytes()).hexdigest()
+    fingerprint = bt.predictor.model_loader.fingerprint or ''
+    if cache_path and os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if (all(k in cached.files for k in CACHE_KEYS)
+                and np.array_equal(cached['timestamp'], timestamps)
+                and str(cached['fingerprint']) == fingerprint
+                and str(cached['feature_digest']) == feature_digest):
+            print(f"使用機率快取: {cache_path}")
+            return {k: cached[k] for k in cached.files if k not in CACHE_KEYS}
+    
+    print("批次評分中...")
+    with bt.predictor.model_set() as fingerprint:
+        probs = bt.score(df)
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.savez(cache_path, timestamp=timestamps, fingerprint=np.array(fingerprint or ''),
+                 feature_digest=np.array(feature_digest), **probs)
+    return probs
+
+
+def _attach(shm_name: str, n: int, config: dict):
+    """worker 初始化：附加共享記憶體並建立零複製視圖"""
+    global _shm, _arrays, _config
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(SHARED_COLUMNS), n), dtype=np.float64, buffer=_shm.buf)
+    _arrays = {name: block[i] for i, name in enumerate(SHARED_COLUMNS)}
+    _arrays['session_end'] = _arrays['session_end'].astype(np.int64)
+    for name in DIRECTIONS:
+        _arrays[f'{name}_opportunity'] = _arrays[f'{name}_opportunity'] > 0
+    _config = config
+
+
+def _evaluate_cells(cells: list) -> list:
+    """評估一批網格 (方向, 進場門檻, 出場門檻)"""
+    rows = []
+    for name, entry_th, exit_th in cells:
+        entry_t, exit_t, sign = DIRECTIONS[name]
+        trades = simulate(
+            _arrays['close'], _arrays['session_end'],
+            _arrays[entry_t], _arrays[exit_t], sign,
+            entry_th, exit_th, _config['max_hold_bars'], _config['cost_points'])
+        entry_sig = np.nan_to_num(_arrays[entry_t], nan=0.0) > entry_th
+        stats = summarize(trades['pnl'], entry_sig, _arrays[f'{name}_opportunity'])
+        rows.append({'direction': name, 'entry_th': entry_th, 'exit_th': exit_th, **stats})
+    return rows
+
+
+def sweep(bt: Backtester, df, probs: dict,
+          entry_grid: np.ndarray, exit_grid: np.ndarray,
+          workers: int = None, chunk_size: int = 8) -> pd.DataFrame:
+    """
+    平行掃描門檻網格
+    
+    Returns:
+        每個 (方向, 進場門檻, 出場門檻) 的績效表
+    """
+    if not isinstance(df, CompactBars):
+        df = df.reset_index(drop=True)
+    market = bt.prepare_market(df)
+    n = len(df)
+    
+    shm = shared_memory.SharedMemory(create=True, size=max(len(SHARED_COLUMNS) * n * 8, 1))
+    block = np.ndarray((len(SHARED_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    try:
+        for i, name in enumerate(SHARED_COLUMNS):
+            block[i] = market[name] if name in market else probs[name]
+        
+        cells = [(name, round(float(e), 4), round(float(x), 4))
+                 for name in DIRECTIONS for e in entry_grid for x in exit_grid]
+        chunks = [cells[i:i + chunk_size] for i in range(0, len(cells), chunk_size)]
+        
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, n, bt.config)) as pool:
+            for part in pool.map(_evaluate_cells, chunks):
+                rows.extend(part)
+    finally:
+        del block
+        shm.close()
+        shm.unlink()
+    
+    return pd.DataFrame(rows)
+
+
+def rank(results: pd.DataFrame, min_trades: int = 10) -> pd.DataFrame:
+    """依勝率、RECALL 排序（排除交易數過少的組合）"""
+    ranked = results[results['trades'] >= min_trades]
+    return ranked.sort_values(['win_rate', 'recall', 'total_pnl'],
+                              ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="進出場門檻平行掃描")
+    parser.add_argument('--workers', type=int, default=None, help="process 數（預設 CPU 數）")
+    parser.add_argument('--min-trades', type=int, default=10, help="最少交易數")
+    parser.add_argument('--top', type=int, default=20, help="每個方向顯示前 N 名")
+    parser.add_argument('--entry', default="0.50,0.95,0.05", help="進場門檻 起,迄,間隔")
+    parser.add_argument('--exit', default="0.50,0.95,0.05", help="出場門檻 起,迄,間隔")
+    parser.add_argument('--output', default=None, help="輸出 CSV 路徑")
+    parser.add_argument('--no-cache', action='store_true', help="不使用機率快取")
+    parser.add_argument('--compact', action='store_true',
+                        help="以 CompactBars 讀取（int32 價格 + float32 特徵，省記憶體）")
+    args = parser.parse_args()
+    
+    from core.db_manager import DBManager
+    from core.model_loader import ModelLoader
+    from core.signal_predictor import SignalPredictor
+    
+    db = DBManager()
+    if args.compact or COMPACT_CONFIG['enabled']:
+        data = db.load_compact().dropna_features()
+        print(f"資料: {len(data)} 筆（精簡模式 {data.nbytes / 1024 ** 2:.1f} MB）")
+    else:
+        data = db.load_ohlcv(include_features=True).dropna(subset=FEATURE_NAMES).reset_index(drop=True)
+        print(f"資料: {len(data)} 筆")
+    if data.empty:
+        return
+    
+    loader = ModelLoader()
+    loader.load_all()
+    bt = Backtester(SignalPredictor(loader))
+    probs = load_or_score(bt, data, None if args.no_cache else PROBS_CACHE)
+    
+    def _grid(spec):
+        start, stop, step = (float(v) for v in spec.split(','))
+        return np.arange(start, stop + step / 2, step)
+    
+    entry_grid, exit_grid = _grid(args.entry), _grid(args.exit)
+    t0 = time.time()
+    results = sweep(bt, data, probs, entry_grid, exit_grid, workers=args.workers)
+    elapsed = time.time() - t0
+    print(f"掃描 {len(results)} 組門檻，耗時 {elapsed:.2f}s")
+    
+    ranked = rank(results, args.min_trades)
+    pd.set_option('display.width', 200)
+    for name in DIRECTIONS:
+        print(f"\n=== {name} ===")
+        print(ranked[ranked['direction'] == name].head(args.top).to_string(
+            index=False, float_format=lambda v: f"{v:.3f}"))
+    
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"\n已輸出: {args.output}")
+
+
+if __name__ == "__main__":
+    main()